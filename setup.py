@@ -16,7 +16,6 @@ setup(
         "pyyaml",
         "requests>=2.28.1",
         "requests_oauthlib",
-        "bs4",
         "yaspin>=2.2.0",
     ],
     include_package_data=True,
@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+Startup and command latency benchmarks for todocli.
+
+Runs the entry points in fresh processes against a local stand-in for
+the Graph API, so timings include interpreter startup, imports and every
+HTTP round trip a command makes, but no network latency.
+
+    python3 tests/benchmark.py -o results.json
+    python3 tests/benchmark.py --compare baseline.json
+
+With --compare, exits with status 1 if any benchmark got slower or uses
+more memory than the baseline by more than --threshold, or if a command
+sends more requests.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs the `todocli` console script
+TODOCLI = "import sys; from todocli.cli import main; sys.exit(main())"
+# `tod0` starts a full screen application, only its startup is measured
+TOD0 = "import todocli.interface"
+
+# In-process benchmarks, each prints {"seconds": ..., "peak_kib": ...}
+MICRO_TEMPLATE = """
+import json, time, tracemalloc
+{setup}
+
+def run():
+{run}
+
+start = time.perf_counter()
+result = run()
+seconds = time.perf_counter() - start
+del result
+tracemalloc.start()
+result = run()
+peak_kib = tracemalloc.get_traced_memory()[1] // 1024
+print(json.dumps({{"seconds": seconds, "peak_kib": peak_kib}}))
+"""
+TASK_PAYLOAD = {
+    "id": "AAMkADAwATM3ZmYAZS0xNjg2LTQ3MTktODAwOS1mNTkyZWUzMmUyZGEARgAAA",
+    "title": "Task",
+    "importance": "normal",
+    "status": "notStarted",
+    "isReminderOn": False,
+    "createdDateTime": "2024-01-25T10:00:00.1234567Z",
+    "lastModifiedDateTime": "2024-01-25T10:00:00.1234567Z",
+    "dueDateTime": {"dateTime": "2024-01-31T00:00:00.0000000", "timeZone": "UTC"},
+}
+MICRO_BENCHMARKS = {
+    # Holding and listing many tasks, as `lst` and the TUI do
+    "micro.tasks.100k": MICRO_TEMPLATE.format(
+        setup="from todocli.models.todotask import Task\n"
+        f"payloads = [dict({TASK_PAYLOAD!r}) for _ in range(100_000)]",
+        run="    tasks = [Task(x) for x in payloads]\n"
+        "    titles = [t.title for t in tasks]\n"
+        "    return tasks",
+    ),
+    # Decoding a column of distinct timestamps
+    "micro.timestamps.100k": MICRO_TEMPLATE.format(
+        setup="from datetime import datetime, timedelta\n"
+        "from todocli.utils.datetime_util import api_timestamps_to_datetimes\n"
+        "start = datetime(2024, 1, 1)\n"
+        "values = [(start + timedelta(minutes=i)).strftime('%Y-%m-%dT%H:%M:%S.%f')"
+        " + '0Z' for i in range(100_000)]",
+        run="    return api_timestamps_to_datetimes(values)",
+    ),
+    # Filtering, sorting and counting a large collection
+    "micro.tasktable.100k": MICRO_TEMPLATE.format(
+        setup="import time\n"
+        "from todocli.models.tasktable import TaskTable\n"
+        f"payloads = [dict({TASK_PAYLOAD!r}, id=str(i)) for i in range(100_000)]",
+        run="    table = TaskTable.from_payloads(payloads, 'list')\n"
+        "    table.overdue(time.time())\n"
+        "    table.high_importance()\n"
+        "    table.order('-importance', 'when')\n"
+        "    return table.counts('status')",
+    ),
+    # Reading the titles of a large snapshot from disk
+    "micro.snapshot.100k": MICRO_TEMPLATE.format(
+        setup="import os, tempfile\n"
+        "from todocli.models import snapshot\n"
+        f"payloads = [dict({TASK_PAYLOAD!r}, id=str(i)) for i in range(100_000)]\n"
+        "path = os.path.join(tempfile.mkdtemp(), 'tasks.snap')\n"
+        "snapshot.write(path, snapshot.build(snapshot.TASKS, payloads))",
+        run="    with snapshot.open_snapshot(path) as tasks:\n"
+        "        return tasks.titles()",
+    ),
+}
+
+LIST_NAME = "Tasks"
+NUM_LISTS = 10
+NUM_TASKS = 50
+
+# A regression must exceed both to fail the comparison
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_MIN_DELTA_MS = 5.0
+
+
+class FakeGraph:
+    """In-memory stand-in for the To Do endpoints of the Graph API"""
+
+    def __init__(self, num_lists=NUM_LISTS, num_tasks=NUM_TASKS):
+        self.lists = {}
+        self.tasks = {}
+        self.num_requests = 0
+        self._lock = threading.Lock()
+        for i in range(num_lists):
+            name = LIST_NAME if i == 0 else f"List {i}"
+            list_id = self.add_list(name)
+            for j in range(num_tasks):
+                self.add_task(list_id, {"title": f"{name} task {j}"})
+        self.server = None
+
+    def add_list(self, name):
+        list_id = uuid.uuid4().hex
+        self.lists[list_id] = {
+            "id": list_id,
+            "displayName": name,
+            "isOwner": True,
+            "isShared": False,
+            "wellknownListName": "defaultList" if name == LIST_NAME else "none",
+        }
+        self.tasks[list_id] = {}
+        return list_id
+
+    def add_task(self, list_id, body):
+        task_id = uuid.uuid4().hex
+        now = graph_timestamp(datetime.utcnow()) + "Z"
+        task = {
+            "id": task_id,
+            "importance": "normal",
+            "isReminderOn": False,
+            "status": "notStarted",
+            "createdDateTime": now,
+            "lastModifiedDateTime": now,
+        }
+        self.tasks[list_id][task_id] = task
+        return self.update_task(task, body)
+
+    def update_task(self, task, body):
+        for name, value in body.items():
+            if isinstance(value, dict) and "dateTime" in value:
+                # Graph answers with 7 fractional digits
+                dt = datetime.fromisoformat(value["dateTime"].rstrip("Z"))
+                value = dict(value, dateTime=graph_timestamp(dt))
+            if value is not None:
+                task[name] = value
+        return task
+
+    def start(self):
+        """Serve in a background thread, returns the base url of the API"""
+        graph = self
+
+        class Handler(GraphHandler):
+            pass
+
+        Handler.graph = graph
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/v1.0"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, method, url, body):
+        """Returns (status, body) for one request"""
+        parts = urlsplit(url)
+        path = parts.path
+        if path.startswith("/v1.0"):
+            path = path[len("/v1.0") :]
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+
+        with self._lock:
+            if path == "/$batch" and method == "POST":
+                return 200, {
+                    "responses": [self.handle_batch(r) for r in body["requests"]]
+                }
+            return self.route(method, path, query, body)
+
+    def handle_batch(self, request):
+        parts = urlsplit(request["url"])
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        status, body = self.route(
+            request["method"], parts.path, query, request.get("body")
+        )
+        if isinstance(body, dict) and "@odata.nextLink" in body:
+            body["@odata.nextLink"] = parts.path + body["@odata.nextLink"]
+        return {"id": request["id"], "status": status, "headers": {}, "body": body}
+
+    def route(self, method, path, query, body):
+        match = re.fullmatch(
+            r"/me/todo/lists(?:/([^/]+))?(?:/tasks(?:/([^/]+))?)?", path
+        )
+        if match is None:
+            return 404, error("Resource not found")
+        list_id, task_id = match.groups()
+        is_task = "/tasks" in path
+
+        if list_id is None:
+            if method == "GET":
+                return 200, page(list(self.lists.values()), query)
+            if method == "POST":
+                return 201, self.lists[self.add_list(body["displayName"])]
+        elif list_id not in self.lists:
+            return 404, error("List not found")
+        elif not is_task:
+            if method == "PATCH":
+                self.lists[list_id].update(body)
+                return 200, self.lists[list_id]
+        elif task_id is None:
+            if method == "GET":
+                tasks = list(self.tasks[list_id].values())
+                return 200, page(apply_filter(tasks, query.get("$filter")), query)
+            if method == "POST":
+                return 201, self.add_task(list_id, body)
+        elif task_id not in self.tasks[list_id]:
+            return 404, error("Task not found")
+        elif method == "GET":
+            return 200, self.tasks[list_id][task_id]
+        elif method == "PATCH":
+            return 200, self.update_task(self.tasks[list_id][task_id], body)
+        elif method == "DELETE":
+            del self.tasks[list_id][task_id]
+            return 204, None
+        return 405, error("Method not allowed")
+
+
+def graph_timestamp(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%f") + "0"
+
+
+def error(message):
+    return {"error": {"code": "BadRequest", "message": message}}
+
+
+def apply_filter(items, expression):
+    """Supports the "<property> eq|ne '<value>'" filters sent by todocli"""
+    if expression is None:
+        return items
+    match = re.fullmatch(r"(\w+) (eq|ne) '(.*)'", expression)
+    if match is None:
+        raise ValueError(f"Unsupported filter: {expression}")
+    name, operator, value = match.groups()
+    if operator == "eq":
+        return [x for x in items if x.get(name) == value]
+    return [x for x in items if x.get(name) != value]
+
+
+def page(items, query):
+    """One page of a collection, projected to the $select properties"""
+    if "$select" in query:
+        fields = query["$select"].split(",")
+        items = [{k: x[k] for k in fields if k in x} for x in items]
+    skip = int(query.get("$skip", 0))
+    top = int(query.get("$top", 100))
+    result = {"value": items[skip : skip + top]}
+    if skip + top < len(items):
+        # Relative links are enough for this stand-in, see GraphHandler
+        next_query = dict(query, **{"$skip": str(skip + top)})
+        result["@odata.nextLink"] = "?" + "&".join(
+            f"{k}={v}" for k, v in next_query.items()
+        )
+    return result
+
+
+class GraphHandler(BaseHTTPRequestHandler):
+    graph = None
+    protocol_version = "HTTP/1.1"
+
+    def do_request(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        self.graph.num_requests += 1
+        status, result = self.graph.handle(self.command, self.path, body)
+
+        if isinstance(result, dict) and "@odata.nextLink" in result:
+            base = f"http://{self.headers['Host']}{self.path.split('?')[0]}"
+            result["@odata.nextLink"] = base + result["@odata.nextLink"]
+        if self.path.endswith("/$batch"):
+            # Links in batched responses are relative to the API root
+            base = f"http://{self.headers['Host']}/v1.0"
+            for body in [r["body"] for r in result["responses"]]:
+                if isinstance(body, dict) and "@odata.nextLink" in body:
+                    body["@odata.nextLink"] = base + body["@odata.nextLink"]
+        data = b"" if result is None else json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_request
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_home(base_dir):
+    """HOME with api keys, a valid token and no update check due"""
+    config_dir = os.path.join(base_dir, ".config", "tod0")
+    os.makedirs(config_dir)
+    state = {
+        "version": 1,
+        "keys": {"client_id": "benchmark", "client_secret": "benchmark"},
+        "token": {
+            "access_token": "benchmark",
+            "refresh_token": "benchmark",
+            "token_type": "Bearer",
+            "expires_in": 86400,
+            "expires_at": time.time() + 86400,
+        },
+        "update_check": {"last_update_check": datetime.now().strftime("%Y%m%d")},
+    }
+    with open(os.path.join(config_dir, "state.json"), "w") as f:
+        json.dump(state, f)
+    return config_dir
+
+
+class Runner:
+    """Runs entry points in fresh processes against a FakeGraph"""
+
+    def __init__(self, base_dir, graph):
+        self.graph = graph
+        self.home = os.path.join(base_dir, "home")
+        self.config_dir = make_home(self.home)
+        self.pycache = os.path.join(base_dir, "pycache")
+        self.cold_pycache = os.path.join(base_dir, "cold-pycache")
+        self.env = dict(
+            os.environ,
+            HOME=self.home,
+            PYTHONPATH=ROOT_DIR,
+            PYTHONPYCACHEPREFIX=self.pycache,
+            TOD0_GRAPH_URL=graph.start(),
+            TOD0_NO_DAEMON="1",
+            # The stand-in speaks plain http
+            OAUTHLIB_INSECURE_TRANSPORT="1",
+        )
+        # Warm runs use the bytecode compiled by earlier runs
+        self.env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    def clear_cache(self):
+        path = os.path.join(self.config_dir, "replica.json")
+        if os.path.exists(path):
+            os.remove(path)
+        shutil.rmtree(os.path.join(self.config_dir, "snapshots"), ignore_errors=True)
+
+    def run(self, code, args=(), cold=False, cached=False):
+        """Returns (seconds, number of requests) of one run"""
+        env = self.env
+        if cold:
+            # No compiled bytecode, as after installing or upgrading
+            shutil.rmtree(self.cold_pycache, ignore_errors=True)
+            env = dict(env, PYTHONPYCACHEPREFIX=self.cold_pycache)
+        if not cached:
+            self.clear_cache()
+        self.graph.num_requests = 0
+
+        start = time.perf_counter()
+        self.execute(code, args, env)
+        return time.perf_counter() - start, self.graph.num_requests
+
+    def run_micro(self, code):
+        """Returns (seconds, peak KiB) reported by a micro benchmark"""
+        report = json.loads(self.execute(code).splitlines()[-1])
+        return report["seconds"], report["peak_kib"]
+
+    def execute(self, code, args=(), env=None):
+        result = subprocess.run(
+            [sys.executable, "-c", code, *args],
+            env=env or self.env,
+            cwd=self.home,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                "{} failed ({}):\n{}{}".format(
+                    " ".join(args) or code,
+                    result.returncode,
+                    result.stdout,
+                    result.stderr,
+                )
+            )
+        return result.stdout
+
+
+def summarize(samples):
+    times = [t * 1000 for t, _ in samples]
+    return {
+        "median_ms": round(statistics.median(times), 2),
+        "min_ms": round(min(times), 2),
+        "max_ms": round(max(times), 2),
+        "requests": max(n for _, n in samples),
+        "runs": len(samples),
+    }
+
+
+def summarize_micro(samples):
+    summary = summarize([(t, 0) for t, _ in samples])
+    summary["peak_kib"] = max(peak for _, peak in samples)
+    return summary
+
+
+def run_benchmarks(iterations=5, only=None):
+    """Returns {benchmark name: summary}"""
+    graph = FakeGraph()
+    samples = {}
+    micro_samples = {}
+
+    def record(name, code, args=(), cold=False, cached=False):
+        if only is None or re.search(only, name):
+            samples.setdefault(name, []).append(runner.run(code, args, cold, cached))
+
+    def record_micro(name, code):
+        if only is None or re.search(only, name):
+            micro_samples.setdefault(name, []).append(runner.run_micro(code))
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        runner = Runner(base_dir, graph)
+        try:
+            # Compile the bytecode used by the warm runs
+            runner.run(TOD0)
+            runner.run(TODOCLI, ["ls"])
+            for i in range(iterations):
+                for entry_point, code in (("todocli", TODOCLI), ("tod0", TOD0)):
+                    record(f"startup.{entry_point}.cold", code, cold=True)
+                    record(f"startup.{entry_point}.warm", code)
+
+                task = f"{LIST_NAME}/benchmark {i}"
+                record("command.ls", TODOCLI, ["ls"])
+                record("command.lst", TODOCLI, ["lst", LIST_NAME])
+                # Served from the snapshots written by the previous run
+                record("command.lst.cached", TODOCLI, ["lst", LIST_NAME], cached=True)
+                record("command.lst.all", TODOCLI, ["lst", "--all"])
+                record("command.new", TODOCLI, ["new", task])
+                record("command.complete", TODOCLI, ["complete", task])
+                record("command.rm", TODOCLI, ["rm", task])
+
+                for name, code in MICRO_BENCHMARKS.items():
+                    record_micro(name, code)
+        finally:
+            graph.stop()
+
+    results = {name: summarize(s) for name, s in samples.items()}
+    results.update({name: summarize_micro(s) for name, s in micro_samples.items()})
+    return results
+
+
+def compare(
+    baseline, results, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS
+):
+    """Returns a list of regressions, empty if there are none"""
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        delta = current["median_ms"] - base["median_ms"]
+        if delta > min_delta_ms and delta > base["median_ms"] * threshold:
+            regressions.append(
+                "{}: {:.1f} ms -> {:.1f} ms (+{:.0%})".format(
+                    name,
+                    base["median_ms"],
+                    current["median_ms"],
+                    delta / base["median_ms"],
+                )
+            )
+        if current.get("peak_kib", 0) > base.get("peak_kib", 0) * (1 + threshold):
+            regressions.append(
+                "{}: {} KiB -> {} KiB peak memory".format(
+                    name, base["peak_kib"], current["peak_kib"]
+                )
+            )
+        if current["requests"] > base["requests"]:
+            regressions.append(
+                "{}: {} -> {} requests".format(
+                    name, base["requests"], current["requests"]
+                )
+            )
+    return regressions
+
+
+def print_results(results, baseline=None):
+    for name, result in sorted(results.items()):
+        line = "{:<24} {:>8.1f} ms  {:>3} requests".format(
+            name, result["median_ms"], result["requests"]
+        )
+        if "peak_kib" in result:
+            line += "  {:>7} KiB peak".format(result["peak_kib"])
+        if baseline is not None and name in baseline:
+            line += "  (baseline {:.1f} ms)".format(baseline[name]["median_ms"])
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-n", "--iterations", type=int, default=5, help="Runs of each benchmark"
+    )
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument(
+        "-k", "--only", help="Only run benchmarks whose name matches this regex"
+    )
+    parser.add_argument(
+        "--compare", metavar="BASELINE", help="Fail on regressions against this file"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown as a fraction of the baseline (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=DEFAULT_MIN_DELTA_MS,
+        help="Slowdowns below this are treated as noise (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.iterations, args.only)
+    output = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold, args.min_delta_ms)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print("  " + regression)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
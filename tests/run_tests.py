@@ -22,6 +22,22 @@ if __name__ == "__main__":
     suite.addTests(loader.loadTestsFromName("tests.test_cli_commands"))
     suite.addTests(loader.loadTestsFromName("tests.test_models"))
     suite.addTests(loader.loadTestsFromName("tests.test_wrapper"))
+    suite.addTests(loader.loadTestsFromName("tests.test_oauth"))
+    suite.addTests(loader.loadTestsFromName("tests.test_sync"))
+    suite.addTests(loader.loadTestsFromName("tests.test_cache"))
+    suite.addTests(loader.loadTestsFromName("tests.test_aio"))
+    suite.addTests(loader.loadTestsFromName("tests.test_throttle"))
+    suite.addTests(loader.loadTestsFromName("tests.test_json_stream"))
+    suite.addTests(loader.loadTestsFromName("tests.test_startup"))
+    suite.addTests(loader.loadTestsFromName("tests.test_update_checker"))
+    suite.addTests(loader.loadTestsFromName("tests.test_daemon"))
+    suite.addTests(loader.loadTestsFromName("tests.test_state"))
+    suite.addTests(loader.loadTestsFromName("tests.test_benchmark"))
+    suite.addTests(loader.loadTestsFromName("tests.test_tasktable"))
+    suite.addTests(loader.loadTestsFromName("tests.test_snapshot"))
+    suite.addTests(loader.loadTestsFromName("tests.test_batch"))
+    suite.addTests(loader.loadTestsFromName("tests.test_repl"))
+    suite.addTests(loader.loadTestsFromName("tests.test_atomic_file"))
 
     runner = unittest.TextTestRunner(verbosity=2)
     result = runner.run(suite)
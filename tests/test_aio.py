@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Unit tests for the coroutine versions of the wrapper functions"""
+
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+import todocli.graphapi.aio as aio
+import todocli.graphapi.wrapper as wrapper
+
+
+class TestAsyncWrapper(unittest.TestCase):
+    """Test the asyncio counterparts of wrapper"""
+
+    def test_get_tasks_of_lists_runs_concurrently(self):
+        """Test requests for several lists are in flight at the same time"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def get_tasks(list_name, list_id, num_tasks, page_size, fields):
+            # Only returns once all three requests are running
+            barrier.wait()
+            return [list_id, fields]
+
+        with patch.object(wrapper, "get_tasks", side_effect=get_tasks):
+            result = asyncio.run(aio.get_tasks_of_lists(["a", "b", "c"], "titles"))
+
+        self.assertEqual(result, [["a", "titles"], ["b", "titles"], ["c", "titles"]])
+
+    def test_iter_tasks_yields_items(self):
+        """Test the async iterator yields every item of the blocking one"""
+
+        async def collect():
+            return [x async for x in aio.iter_tasks(list_id="L")]
+
+        with patch.object(
+            wrapper, "iter_tasks", return_value=iter([1, 2, 3])
+        ) as iter_tasks:
+            self.assertEqual(asyncio.run(collect()), [1, 2, 3])
+        self.assertEqual(iter_tasks.call_args.kwargs["fields"], "full")
+
+    def test_errors_are_raised_in_the_coroutine(self):
+        """Test exceptions from the wrapper reach the awaiting coroutine"""
+        with patch.object(
+            wrapper, "create_list", side_effect=wrapper.ListNotFound("x")
+        ):
+            with self.assertRaises(wrapper.ListNotFound):
+                asyncio.run(aio.create_list("x"))
+
+
+if __name__ == "__main__":
+    unittest.main()
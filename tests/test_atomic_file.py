@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Unit tests for files replaced as a whole"""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from todocli.utils.atomic_file import write_atomic
+
+
+class TestWriteAtomic(unittest.TestCase):
+    """Test writing through a temporary file renamed over the target"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dir = tmp_dir.name
+        self.path = os.path.join(self.dir, "sub", "file.json")
+
+    def test_text_and_bytes(self):
+        """Test both kinds of data are written, creating missing directories"""
+        write_atomic(self.path, "text")
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "text")
+
+        write_atomic(self.path, b"\x00bytes")
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), b"\x00bytes")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["file.json"])
+
+    @unittest.skipUnless(os.name == "posix", "permissions are POSIX only")
+    def test_mode(self):
+        """Test the new file gets the given permissions"""
+        write_atomic(self.path, "secret", mode=0o600)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_concurrent_writers(self):
+        """Test concurrent writers leave one complete file and no temporary files"""
+        payloads = [json.dumps({"writer": i, "data": "x" * 100_000}) for i in range(8)]
+
+        def write(payload):
+            for _ in range(10):
+                write_atomic(self.path, payload)
+
+        threads = [threading.Thread(target=write, args=(p,)) for p in payloads]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with open(self.path) as f:
+            self.assertIn(f.read(), payloads)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["file.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Unit tests for running scripts of commands as batched requests"""
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import todocli.graphapi.wrapper as wrapper
+from todocli import batch
+from todocli.cli import setup_parser
+
+LIST_IDS = {"Tasks": "L1", "Groceries": "L2"}
+TASKS = {"L1": [{"id": "T1", "title": "milk"}, {"id": "T2", "title": "eggs"}]}
+
+
+class TestBatch(unittest.TestCase):
+    """Test resolving, batching and reporting the lines of a script"""
+
+    def setUp(self):
+        self.batches = []
+        self.listings = []
+        self.statuses = {}
+
+        def execute_batch(requests):
+            self.batches.append(requests)
+            return [
+                {"id": str(i), "status": self.statuses.get(r["url"], 201)}
+                for i, r in enumerate(requests)
+            ]
+
+        def iter_values(endpoint):
+            self.listings.append(endpoint)
+            list_id = endpoint.split("/lists/")[1].split("/")[0]
+            return iter(TASKS.get(list_id, []))
+
+        for name, value in [
+            ("execute_batch", execute_batch),
+            ("iter_values", iter_values),
+            ("load_list_ids", lambda: dict(LIST_IDS)),
+            (
+                "get_task_id_by_index",
+                lambda list_name, index, list_id: TASKS[list_id][index]["id"],
+            ),
+            ("invalidate_list_ids", lambda: None),
+        ]:
+            patcher = patch.object(wrapper, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(batch.cache, "invalidate")
+        self.invalidate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_script(self, script):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "script")
+            with open(path, "w") as f:
+                f.write(script)
+            output = io.StringIO()
+            with redirect_stdout(output):
+                result = batch.run(path, setup_parser())
+        return result, [x.split("\t") for x in output.getvalue().splitlines()]
+
+    def test_writes_are_sent_in_one_batch(self):
+        """Test every line becomes one request of the same $batch"""
+        script = "\n".join(
+            [
+                "# provisioning",
+                "new 'Groceries/buy bread'",
+                "new -l Tasks -d 2030-01-01 'call mom'",
+                "complete milk",
+                "",
+                "rm Tasks/1",
+            ]
+        )
+        result, output = self.run_script(script)
+
+        self.assertEqual(result, (0, 4))
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(
+            [(r["method"], r["url"]) for r in self.batches[0]],
+            [
+                ("POST", "/me/todo/lists/L2/tasks"),
+                ("POST", "/me/todo/lists/L1/tasks"),
+                ("PATCH", "/me/todo/lists/L1/tasks/T1"),
+                ("DELETE", "/me/todo/lists/L1/tasks/T2"),
+            ],
+        )
+        self.assertEqual(self.batches[0][0]["body"]["title"], "buy bread")
+        # Tasks of a list are listed once for all lines using it
+        self.assertEqual(len(self.listings), 1)
+        self.assertEqual(
+            [x[:2] for x in output], [[str(n), "ok"] for n in (2, 3, 4, 6)]
+        )
+
+    def test_many_targets_on_one_line(self):
+        """Test a complete line with several tasks and a pattern"""
+        result, output = self.run_script("complete eggs --match 'mil*'\n")
+
+        self.assertEqual(result, (0, 1))
+        self.assertEqual(
+            [r["url"] for r in self.batches[0]],
+            ["/me/todo/lists/L1/tasks/T2", "/me/todo/lists/L1/tasks/T1"],
+        )
+
+    def test_lists_are_created_first(self):
+        """Test newl lines are sent before the tasks that may use them"""
+        result, _ = self.run_script("new 'Tasks/a'\nnewl Work\n")
+
+        self.assertEqual(result, (0, 2))
+        self.assertEqual(
+            [[r["url"] for r in b] for b in self.batches],
+            [["/me/todo/lists"], ["/me/todo/lists/L1/tasks"]],
+        )
+        self.assertEqual(self.batches[0][0]["body"], {"displayName": "Work"})
+
+    def test_failed_lines_are_reported(self):
+        """Test invalid lines and failed requests are reported by line"""
+        self.statuses["/me/todo/lists/L1/tasks/T2"] = 404
+        script = "\n".join(
+            [
+                "complete eggs",
+                "rm missing",
+                "rm Nowhere/milk",
+                "ls",
+                "new",
+                "new 'unterminated",
+                "new fine",
+            ]
+        )
+        result, output = self.run_script(script)
+
+        self.assertEqual(result, (6, 7))
+        self.assertEqual([x[1] for x in output], ["failed"] * 6 + ["ok"])
+        self.assertIn("could not be found", output[1][3])
+        self.assertIn("'Nowhere'", output[2][3])
+        self.assertIn("the following arguments are required", output[4][3])
+
+    def test_caches_of_written_lists_are_invalidated(self):
+        """Test the cached tasks of every list written to are dropped"""
+        self.run_script("new Groceries/a\ncomplete milk\n")
+
+        self.assertEqual(
+            sorted(x.args[0] for x in self.invalidate.call_args_list),
+            ["tasks:L1", "tasks:L2"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
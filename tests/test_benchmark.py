@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Unit tests for the benchmark stand-in for Graph and the regression gate"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import benchmark  # noqa: E402
+
+
+def result(median_ms, requests=1):
+    return {"median_ms": median_ms, "requests": requests}
+
+
+class TestCompare(unittest.TestCase):
+    """Test detecting regressions against a baseline"""
+
+    def test_slowdown_above_threshold_fails(self):
+        """Test a command 50% slower than the baseline is reported"""
+        regressions = benchmark.compare(
+            {"command.ls": result(100)}, {"command.ls": result(150)}, threshold=0.2
+        )
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("command.ls", regressions[0])
+
+    def test_noise_is_ignored(self):
+        """Test slowdowns within the threshold or below min_delta_ms pass"""
+        self.assertEqual(
+            benchmark.compare(
+                {"command.ls": result(100), "startup.todocli.warm": result(10)},
+                {"command.ls": result(110), "startup.todocli.warm": result(14)},
+                threshold=0.2,
+                min_delta_ms=5,
+            ),
+            [],
+        )
+
+    def test_extra_request_fails(self):
+        """Test an extra round trip is reported even if it is fast"""
+        regressions = benchmark.compare(
+            {"command.new": result(100, requests=2)},
+            {"command.new": result(100, requests=3)},
+        )
+        self.assertEqual(regressions, ["command.new: 2 -> 3 requests"])
+
+    def test_memory_growth_fails(self):
+        """Test a micro benchmark using much more memory is reported"""
+        base = dict(result(100, requests=0), peak_kib=1000)
+        current = dict(result(100, requests=0), peak_kib=2000)
+        regressions = benchmark.compare({"micro.x": base}, {"micro.x": current})
+        self.assertEqual(regressions, ["micro.x: 1000 KiB -> 2000 KiB peak memory"])
+
+
+class TestFakeGraph(unittest.TestCase):
+    """Test the local stand-in answers like the Graph API"""
+
+    def setUp(self):
+        self.graph = benchmark.FakeGraph(num_lists=2, num_tasks=3)
+        self.list_id = next(iter(self.graph.lists))
+
+    def test_paging_and_select(self):
+        """Test $top pages carry a nextLink and $select projects properties"""
+        status, body = self.graph.handle(
+            "GET", f"/v1.0/me/todo/lists/{self.list_id}/tasks?$top=2&$select=id", None
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual([set(x) for x in body["value"]], [{"id"}, {"id"}])
+        self.assertIn("$skip=2", body["@odata.nextLink"])
+
+    def test_filter_by_title(self):
+        """Test the title filter used to resolve task names"""
+        url = f"/v1.0/me/todo/lists/{self.list_id}/tasks?$filter=title%20eq%20'Tasks%20task%201'"
+        _, body = self.graph.handle("GET", url, None)
+        self.assertEqual([x["title"] for x in body["value"]], ["Tasks task 1"])
+
+    def test_batch(self):
+        """Test $batch runs every request and answers by id"""
+        task_id = next(iter(self.graph.tasks[self.list_id]))
+        requests = [
+            {
+                "id": "1",
+                "method": "DELETE",
+                "url": f"/me/todo/lists/{self.list_id}/tasks/{task_id}",
+            },
+            {"id": "2", "method": "GET", "url": "/me/todo/lists/missing/tasks"},
+        ]
+        status, body = self.graph.handle("POST", "/v1.0/$batch", {"requests": requests})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            [(r["id"], r["status"]) for r in body["responses"]],
+            [("1", 204), ("2", 404)],
+        )
+        self.assertNotIn(task_id, self.graph.tasks[self.list_id])
+
+    def test_cli_runs_against_stand_in(self):
+        """Test a cli command completes against the stand-in"""
+        with tempfile.TemporaryDirectory() as base_dir:
+            runner = benchmark.Runner(base_dir, self.graph)
+            try:
+                _, num_requests = runner.run(benchmark.TODOCLI, ["ls"])
+            finally:
+                self.graph.stop()
+        self.assertEqual(num_requests, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Unit tests for the on-disk collection cache"""
+
+import mmap
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import todocli.graphapi.cache as cache
+import todocli.graphapi.wrapper as wrapper
+from todocli.models import snapshot
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patcher = patch.object(
+            cache, "SNAPSHOT_DIR", os.path.join(tmp_dir.name, "snapshots")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cached_titles(self, key):
+        tasks = cache.open_snapshot(key, snapshot.TASKS)
+        if tasks is None:
+            return None
+        with tasks:
+            return tasks.titles()
+
+
+class TestCache(CacheTestCase):
+    """Test stale-while-revalidate behaviour"""
+
+    def test_missing_entry_is_fetched_and_stored(self):
+        """Test a cache miss calls fetch and stores the result"""
+        fetch = MagicMock(return_value=[{"id": "a", "title": "milk"}])
+
+        with cache.get_snapshot("key", fetch, snapshot.TASKS) as tasks:
+            self.assertEqual(tasks.titles(), ["milk"])
+        self.assertEqual(self.cached_titles("key"), ["milk"])
+        fetch.assert_called_once()
+
+    def test_fresh_entry_is_not_revalidated(self):
+        """Test a recently stored entry is served without fetching"""
+        cache.store_snapshot("key", snapshot.TASKS, [{"id": "a", "title": "milk"}])
+        fetch = MagicMock(return_value=[{"id": "b", "title": "eggs"}])
+
+        with cache.get_snapshot("key", fetch, snapshot.TASKS) as tasks:
+            self.assertEqual(tasks.titles(), ["milk"])
+        fetch.assert_not_called()
+
+    def test_stale_entry_is_served_then_revalidated(self):
+        """Test a stale entry is returned and refreshed in the background"""
+        cache.store_snapshot("key", snapshot.TASKS, [{"id": "a", "title": "milk"}])
+        fetch = MagicMock(return_value=[{"id": "b", "title": "eggs"}])
+
+        with patch.object(cache.time, "time", return_value=time.time() + 60):
+            with cache.get_snapshot("key", fetch, snapshot.TASKS) as tasks:
+                self.assertEqual(tasks.titles(), ["milk"])
+            for thread in threading.enumerate():
+                if thread.name == "revalidate-key":
+                    thread.join()
+
+        fetch.assert_called_once()
+        self.assertEqual(self.cached_titles("key"), ["eggs"])
+
+    def test_expired_entry_is_refetched(self):
+        """Test an entry older than the maximum age is fetched synchronously"""
+        cache.store_snapshot("key", snapshot.TASKS, [{"id": "a", "title": "milk"}])
+        fetch = MagicMock(return_value=[{"id": "b", "title": "eggs"}])
+        later = time.time() + cache.MAX_AGE_SECONDS + 1
+
+        with patch.object(cache.time, "time", return_value=later):
+            with cache.get_snapshot("key", fetch, snapshot.TASKS) as tasks:
+                self.assertEqual(tasks.titles(), ["eggs"])
+
+    def test_invalidate(self):
+        """Test invalidate removes the entry"""
+        cache.store_snapshot("key", snapshot.TASKS, [])
+        cache.invalidate("key")
+        self.assertIsNone(self.cached_titles("key"))
+
+
+class TestSnapshots(CacheTestCase):
+    """Test entries served as memory-mapped snapshots"""
+
+    def test_snapshot_is_written_and_mapped(self):
+        """Test a miss writes a snapshot that the next call maps from disk"""
+        fetch = MagicMock(return_value=[{"id": "a", "title": "milk"}])
+
+        with cache.get_snapshot("key", fetch, snapshot.TASKS) as tasks:
+            self.assertEqual(tasks.titles(), ["milk"])
+        with cache.get_snapshot("key", fetch, snapshot.TASKS) as tasks:
+            self.assertEqual(tasks.titles(), ["milk"])
+            self.assertIsInstance(tasks.buffer, mmap.mmap)
+        fetch.assert_called_once()
+
+    def test_invalidate_removes_nested_snapshots(self):
+        """Test invalidating a list's tasks removes the snapshot of each field set"""
+        for key in [cache.tasks_key("L1", "titles"), cache.tasks_key("L10", "titles")]:
+            cache.store_snapshot(key, snapshot.TASKS, [])
+
+        cache.invalidate(cache.tasks_key("L1"))
+
+        self.assertFalse(os.path.exists(cache.snapshot_path("tasks:L1:titles")))
+        self.assertTrue(os.path.exists(cache.snapshot_path("tasks:L10:titles")))
+
+    def test_invalidated_key_is_not_stored_by_running_revalidation(self):
+        """Test a fetch that started before another process invalidated is not stored"""
+        key = cache.tasks_key("L1", "titles")
+        cache.store_snapshot(
+            key, snapshot.TASKS, [{"id": "a", "title": "milk"}], time.time() - 20
+        )
+        fetching = threading.Event()
+        invalidated = threading.Event()
+
+        def fetch():
+            fetching.set()
+            invalidated.wait(5)
+            return [{"id": "a", "title": "milk"}]
+
+        with cache.get_snapshot(key, fetch, snapshot.TASKS) as tasks:
+            self.assertEqual(tasks.titles(), ["milk"])
+        fetching.wait(5)
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys; from todocli.graphapi import cache; "
+                "cache.SNAPSHOT_DIR = sys.argv[1]; cache.invalidate(sys.argv[2])",
+                cache.SNAPSHOT_DIR,
+                cache.tasks_key("L1"),
+            ],
+            env=dict(os.environ, PYTHONPATH=ROOT_DIR),
+            check=True,
+        )
+        invalidated.set()
+        for thread in threading.enumerate():
+            if thread.name == f"revalidate-{key}":
+                thread.join()
+
+        self.assertIsNone(self.cached_titles(key))
+
+        # Fetches that start after the invalidation are stored again
+        with cache.get_snapshot(key, fetch, snapshot.TASKS):
+            pass
+        self.assertEqual(self.cached_titles(key), ["milk"])
+
+    def test_exit_waits_only_briefly_for_revalidation(self):
+        """Test a slow refresh of a served snapshot does not hold up the command"""
+        key = "key"
+        cache.store_snapshot(key, snapshot.TASKS, [], time.time() - 20)
+        release = threading.Event()
+        # Let it finish before the snapshot directory is removed
+        self.addCleanup(cache.wait_for_revalidation, 5)
+        self.addCleanup(release.set)
+
+        with cache.get_snapshot(key, lambda: release.wait(5) and [], snapshot.TASKS):
+            pass
+        started = time.monotonic()
+        cache.wait_for_revalidation(0.1)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(any(t.daemon for t in cache._threads if t.is_alive()))
+
+    def test_snapshot_is_dated_from_the_start_of_its_fetch(self):
+        """Test a fetched snapshot is not younger than the data it holds"""
+        started = time.time()
+
+        def fetch():
+            time.sleep(0.05)
+            return []
+
+        with cache.get_snapshot("key", fetch, snapshot.TASKS) as tasks:
+            self.assertLess(tasks.updated_at - started, 0.05)
+
+    def test_corrupt_snapshot_is_rebuilt(self):
+        """Test a damaged snapshot file is replaced by fetching again"""
+        os.makedirs(cache.SNAPSHOT_DIR)
+        with open(cache.snapshot_path("key"), "wb") as f:
+            f.write(b"garbage")
+        fetch = MagicMock(return_value=[{"id": "a", "title": "milk"}])
+
+        with cache.get_snapshot("key", fetch, snapshot.TASKS) as tasks:
+            self.assertEqual(tasks.ids(), ["a"])
+        fetch.assert_called_once()
+
+    def test_many_keys_are_fetched_together(self):
+        """Test missing entries of several keys are fetched in one call"""
+        cache.store_snapshot("a", snapshot.TASKS, [{"id": "a1", "title": "cached"}])
+        fetch_many = MagicMock(
+            side_effect=lambda keys: {key: [{"id": key, "title": key}] for key in keys}
+        )
+
+        tasks = cache.get_snapshots(["a", "b", "c"], fetch_many, snapshot.TASKS)
+
+        self.assertEqual([x.titles() for x in tasks], [["cached"], ["b"], ["c"]])
+        fetch_many.assert_called_once_with(["b", "c"])
+        for x in tasks:
+            x.close()
+
+
+class TestTaskListing(CacheTestCase):
+    """Test task numbers resolved from the output of the last `lst`"""
+
+    TASKS = [{"id": "T1", "title": "milk"}, {"id": "T2", "title": "eggs"}]
+
+    def save_listing(self, tasks=TASKS):
+        wrapper.save_task_listing(
+            "L1", snapshot.Snapshot(snapshot.build(snapshot.TASKS, tasks))
+        )
+
+    def test_index_is_resolved_locally(self):
+        """Test a task number maps to the task shown at that position"""
+        self.save_listing()
+
+        self.assertEqual(wrapper.get_task_id_by_index("Tasks", 1, "L1"), "T2")
+        with self.assertRaises(wrapper.TaskNotFoundByIndex):
+            wrapper.get_task_id_by_index("Tasks", 2, "L1")
+
+    def test_listing_is_outdated_by_writes(self):
+        """Test writing to the list drops the listing"""
+        self.save_listing()
+        cache.invalidate(cache.tasks_key("L1"))
+
+        with self.assertRaises(wrapper.TaskListingOutdated):
+            wrapper.get_task_id_by_index("Tasks", 0, "L1")
+
+    def test_listing_expires(self):
+        """Test a listing older than LISTING_MAX_AGE is not used"""
+        self.save_listing()
+        later = time.time() + wrapper.LISTING_MAX_AGE + 1
+
+        with patch.object(wrapper.time, "time", return_value=later):
+            with self.assertRaises(wrapper.TaskListingOutdated):
+                wrapper.get_task_id_by_index("Tasks", 0, "L1")
+
+    def test_listing_is_outdated_by_changes_found_on_refresh(self):
+        """Test a later refresh of the list that found other tasks drops it"""
+        self.save_listing()
+        key = cache.tasks_key("L1", "titles")
+        # Same tasks, the numbers are still valid
+        cache.store_snapshot(key, snapshot.TASKS, self.TASKS)
+        self.assertEqual(wrapper.get_task_id_by_index("Tasks", 0, "L1"), "T1")
+
+        cache.store_snapshot(key, snapshot.TASKS, self.TASKS[1:])
+        with self.assertRaises(wrapper.TaskListingOutdated):
+            wrapper.get_task_id_by_index("Tasks", 0, "L1")
+
+
+class TestWriteInvalidation(CacheTestCase):
+    """Test that writes through the wrapper invalidate cached tasks"""
+
+    def test_create_task_invalidates_list_tasks(self):
+        """Test create_task drops the cached tasks of its list"""
+        cache.store_snapshot(cache.tasks_key("L1", "titles"), snapshot.TASKS, [])
+        cache.store_snapshot(cache.tasks_key("L2", "titles"), snapshot.TASKS, [])
+        session = MagicMock()
+
+        with patch.object(wrapper, "get_oauth_session", return_value=session):
+            wrapper.create_task("milk", list_id="L1")
+
+        self.assertIsNone(self.cached_titles(cache.tasks_key("L1", "titles")))
+        self.assertIsNotNone(self.cached_titles(cache.tasks_key("L2", "titles")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,22 @@
 #!/usr/bin/env python3
 """Unit tests for CLI command parsing and argument handling"""
 
+import io
 import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import todocli.graphapi.wrapper as wrapper
+from todocli.models import snapshot
 from todocli.cli import (
     setup_parser,
     parse_task_path,
     try_parse_as_int,
     InvalidTaskPath,
+    NoTaskSpecified,
+    complete,
+    lst,
+    rm,
 )
 
 
@@ -125,26 +135,42 @@ class TestCLIArgumentParsing(unittest.TestCase):
     def test_complete_command_basic(self):
         """Test 'complete' command"""
         args = self.parser.parse_args(["complete", "task"])
-        self.assertEqual(args.task_name, "task")
+        self.assertEqual(args.task_name, ["task"])
         self.assertIsNone(getattr(args, "list", None))
 
     def test_complete_command_with_list(self):
         """Test 'complete' command with --list flag"""
         args = self.parser.parse_args(["complete", "--list", "personal", "task"])
-        self.assertEqual(args.task_name, "task")
+        self.assertEqual(args.task_name, ["task"])
         self.assertEqual(args.list, "personal")
 
     def test_rm_command_basic(self):
         """Test 'rm' command"""
         args = self.parser.parse_args(["rm", "task"])
-        self.assertEqual(args.task_name, "task")
+        self.assertEqual(args.task_name, ["task"])
 
     def test_rm_command_with_list(self):
         """Test 'rm' command with -l flag"""
         args = self.parser.parse_args(["rm", "-l", "work", "task"])
-        self.assertEqual(args.task_name, "task")
+        self.assertEqual(args.task_name, ["task"])
         self.assertEqual(args.list, "work")
 
+    def test_complete_command_many_targets(self):
+        """Test 'complete' with several tasks and patterns"""
+        args = self.parser.parse_args(
+            ["complete", "a", "Work/b", "--match", "milk*", "--match-regex", "^x"]
+        )
+        self.assertEqual(args.task_name, ["a", "Work/b"])
+        self.assertTrue(args.match[0].search("milk shake"))
+        self.assertFalse(args.match[0].search("buy milk"))
+        self.assertTrue(args.match_regex[0].search("xyz"))
+
+    def test_invalid_regex_is_rejected(self):
+        """Test an invalid --match-regex is reported by argparse"""
+        with self.assertRaises(SystemExit):
+            with patch("sys.stderr"):
+                self.parser.parse_args(["rm", "--match-regex", "("])
+
     def test_interactive_flag(self):
         """Test -i/--interactive flag"""
         args = self.parser.parse_args(["-i", "ls"])
@@ -154,6 +180,171 @@ class TestCLIArgumentParsing(unittest.TestCase):
         self.assertTrue(args.interactive)
 
 
+class TestBulkCommands(unittest.TestCase):
+    """Test complete/rm with several targets and patterns"""
+
+    TASKS = {
+        "L1": [
+            {"id": "T1", "title": "milk"},
+            {"id": "T2", "title": "milk shake"},
+            {"id": "T3", "title": "eggs"},
+        ],
+        "L2": [{"id": "T4", "title": "report"}],
+    }
+
+    def setUp(self):
+        self.parser = setup_parser()
+        self.calls = []
+        self.listings = []
+
+        def get_task_titles(list_id):
+            self.listings.append(list_id)
+            return self.TASKS[list_id]
+
+        def get_task_id_by_index(list_name, task_index, list_id):
+            # As listed by the last `lst`
+            return self.TASKS[list_id][task_index]["id"]
+
+        for name, value in [
+            ("get_cached_list_id", {"Tasks": "L1", "Work": "L2"}.get),
+            ("get_task_titles", get_task_titles),
+            ("get_task_id_by_index", get_task_id_by_index),
+            ("complete_tasks", lambda *args: self.calls.append(("complete", *args))),
+            ("remove_tasks", lambda *args: self.calls.append(("rm", *args))),
+            ("complete_task", lambda **kwargs: self.calls.append(kwargs)),
+            ("remove_task", lambda **kwargs: self.calls.append(kwargs)),
+        ]:
+            patcher = patch.object(wrapper, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_command(self, func, argv):
+        func(self.parser.parse_args(argv))
+
+    def test_targets_are_batched_per_list(self):
+        """Test targets of several lists are resolved with one listing each"""
+        self.run_command(complete, ["complete", "milk", "2", "Work/report", "eggs"])
+
+        self.assertEqual(
+            self.calls,
+            [("complete", "L1", ["T3", "T1"]), {"list_id": "L2", "task_id": "T4"}],
+        )
+        self.assertEqual(self.listings, ["L1", "L2"])
+
+    def test_task_numbers_need_no_listing(self):
+        """Test tasks given by number are resolved without fetching the list"""
+        self.run_command(complete, ["complete", "Work/0"])
+        self.run_command(rm, ["rm", "1", "2"])
+
+        self.assertEqual(
+            self.calls,
+            [{"list_id": "L2", "task_id": "T4"}, ("rm", "L1", ["T2", "T3"])],
+        )
+        self.assertEqual(self.listings, [])
+
+    def test_match_selects_titles_locally(self):
+        """Test --match and --match-regex select from one fetch of the list"""
+        self.run_command(rm, ["rm", "--match", "milk*"])
+        self.run_command(rm, ["rm", "-l", "Work", "--match-regex", "rep"])
+
+        self.assertEqual(
+            self.calls,
+            [("rm", "L1", ["T1", "T2"]), {"list_id": "L2", "task_id": "T4"}],
+        )
+
+    def test_single_task_by_name(self):
+        """Test one task given by name is still completed with one lookup"""
+        self.run_command(complete, ["complete", "milk"])
+
+        self.assertEqual(self.calls, [{"list_name": "Tasks", "task_name": "milk"}])
+        self.assertEqual(self.listings, [])
+
+    def test_errors(self):
+        """Test missing targets and patterns without matches are reported"""
+        with self.assertRaises(NoTaskSpecified):
+            self.run_command(rm, ["rm"])
+        with self.assertRaises(wrapper.NoTasksMatch):
+            self.run_command(rm, ["rm", "--match", "bread*"])
+        self.assertEqual(self.calls, [])
+
+
+class TestListAll(unittest.TestCase):
+    """Test lst --all"""
+
+    LISTS = [
+        ("L1", "Tasks", [{"id": "T1", "title": "milk"}]),
+        ("L2", "Work", []),
+        (
+            "L3",
+            "Home",
+            [
+                {"id": "T2", "title": "paint", "dueDateTime": None},
+                {
+                    "id": "T3",
+                    "title": "rent",
+                    "dueDateTime": {
+                        "dateTime": "2024-03-01T12:00:00.0000000",
+                        "timeZone": "UTC",
+                    },
+                },
+            ],
+        ),
+    ]
+
+    def setUp(self):
+        self.parser = setup_parser()
+        self.listings = []
+
+        def get_all_tasks_snapshots(fields):
+            return [
+                (
+                    list_id,
+                    name,
+                    snapshot.Snapshot(snapshot.build(snapshot.TASKS, tasks)),
+                )
+                for list_id, name, tasks in self.LISTS
+            ]
+
+        for name, value in [
+            ("get_all_tasks_snapshots", get_all_tasks_snapshots),
+            (
+                "save_task_listing",
+                lambda list_id, tasks: self.listings.append(list_id),
+            ),
+        ]:
+            patcher = patch.object(wrapper, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_lst(self, argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            lst(self.parser.parse_args(argv))
+        return output.getvalue()
+
+    def test_grouped_by_list(self):
+        """Test tasks are grouped by list in the order of the lists"""
+        output = self.run_lst(["lst", "--all"])
+
+        self.assertEqual(
+            output,
+            "Tasks\n[0]\tmilk\n\nWork\n\nHome\n[0]\tpaint\n[1]\trent\n",
+        )
+        # Task numbers can be used with complete and rm
+        self.assertEqual(self.listings, ["L1", "L2", "L3"])
+
+    def test_merged_by_due_date(self):
+        """Test --by-due merges all lists, tasks without due date last"""
+        output = self.run_lst(["lst", "-a", "--by-due"]).splitlines()
+
+        self.assertEqual(output[0].split("\t")[1], "Home/rent")
+        self.assertEqual(
+            [x.split("\t") for x in output[1:]],
+            [["", "Tasks/milk"], ["", "Home/paint"]],
+        )
+        self.assertEqual(self.listings, [])
+
+
 class TestParseTaskPath(unittest.TestCase):
     """Test parse_task_path function"""
 
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Unit tests for forwarding commands to the background daemon"""
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import patch
+
+from todocli import daemon
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Daemon whose commands echo their arguments instead of calling the API
+SERVER_SCRIPT = """
+import sys
+from todocli import daemon
+
+def run_command(argv):
+    if argv == ["fail"]:
+        print("Something went wrong")
+        return True
+    if argv == ["usage"]:
+        print("usage: todocli", file=sys.stderr)
+        raise SystemExit(2)
+    print("ran " + " ".join(argv))
+    return False
+
+daemon.serve(run_command, sys.argv[1], warm=False)
+"""
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "Unix sockets are not available")
+class TestDaemon(unittest.TestCase):
+    """Test running commands through a daemon on a temporary socket"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, "daemon.sock")
+
+    def start_daemon(self, stderr=None):
+        env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+        process = subprocess.Popen(
+            [sys.executable, "-c", SERVER_SCRIPT, self.path],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr,
+        )
+        self.addCleanup(process.wait, 5)
+        self.addCleanup(daemon.stop, self.path)
+
+        deadline = time.monotonic() + 10
+        while True:
+            sock = daemon.connect(self.path) if os.path.exists(self.path) else None
+            if sock is not None:
+                sock.close()
+                break
+            self.assertIsNone(process.poll())
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.02)
+        return process
+
+    def forward(self, argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            code = daemon.forward(argv, self.path)
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    def test_output_is_forwarded(self):
+        """Test the command output and exit code reach the client"""
+        self.start_daemon()
+
+        self.assertEqual(self.forward(["ls"]), (0, "ran ls\n", ""))
+        self.assertEqual(self.forward(["fail"]), (1, "Something went wrong\n", ""))
+        self.assertEqual(self.forward(["usage"]), (2, "", "usage: todocli\n"))
+
+    def test_concurrent_clients(self):
+        """Test output of concurrent commands does not get mixed up"""
+        self.start_daemon()
+        results = {}
+
+        def run(name):
+            code = daemon.forward(["lst", name], self.path)
+            results[name] = code
+
+        with redirect_stdout(io.StringIO()) as stdout:
+            threads = [threading.Thread(target=run, args=(str(i),)) for i in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(results, {str(i): 0 for i in range(5)})
+        self.assertEqual(
+            sorted(stdout.getvalue().splitlines()),
+            ["ran lst {}".format(i) for i in range(5)],
+        )
+
+    def test_stop(self):
+        """Test stopping the daemon removes its socket"""
+        process = self.start_daemon()
+
+        self.assertTrue(daemon.stop(self.path))
+        process.wait(5)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(daemon.stop(self.path))
+
+    def test_probes_and_bad_requests_are_ignored(self):
+        """Test connections without a valid request are closed quietly"""
+        process = self.start_daemon(stderr=subprocess.PIPE)
+        sock = daemon.connect(self.path)
+        with sock:
+            sock.sendall(b"not json\n")
+
+        self.assertEqual(self.forward(["ls"]), (0, "ran ls\n", ""))
+        # No access for other users
+        self.assertEqual(os.stat(self.path).st_mode & 0o077, 0)
+        daemon.stop(self.path)
+        self.assertEqual(process.communicate(timeout=5)[1], b"")
+
+    def test_second_daemon_is_refused(self):
+        """Test a daemon does not take over the socket of a running one"""
+        self.start_daemon()
+
+        with self.assertRaises(daemon.DaemonAlreadyRunning):
+            daemon.serve(print, self.path, warm=False)
+
+    def test_no_daemon(self):
+        """Test commands run directly when no daemon is listening"""
+        self.assertIsNone(daemon.forward(["ls"], self.path))
+        self.assertFalse(daemon.should_forward(["ls"], self.path))
+
+        # Socket left behind by a daemon that was killed
+        open(self.path, "w").close()
+        self.assertIsNone(daemon.forward(["ls"], self.path))
+
+    def test_should_forward(self):
+        """Test which command lines are sent to the daemon"""
+        open(self.path, "w").close()
+
+        self.assertTrue(daemon.should_forward(["ls"], self.path))
+        self.assertFalse(daemon.should_forward(["-i"], self.path))
+        self.assertFalse(daemon.should_forward(["daemon", "--stop"], self.path))
+        self.assertFalse(daemon.should_forward(["batch"], self.path))
+        with patch.dict(os.environ, {"TOD0_NO_DAEMON": "1"}):
+            self.assertFalse(daemon.should_forward(["ls"], self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,18 @@
+import contextlib
+import io
 import unittest
 import todocli
 
 from unittest.mock import Mock, patch
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
+from todocli.utils import datetime_util
 from todocli.utils.datetime_util import (
     parse_datetime,
     add_day_if_past,
+    api_timestamp_to_datetime,
+    api_timestamps_to_datetimes,
+    parse_fixed_timestamp,
     ErrorParsingTime,
     TimeExpressionNotRecognized,
 )
@@ -106,5 +112,106 @@ class TestDatetimeParser(unittest.TestCase):
                     raise
 
 
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestApiTimestamps(unittest.TestCase):
+    """Test converting timestamps returned by the Graph API"""
+
+    def test_string_timestamp(self):
+        """Test the 7 digit format is parsed as UTC and converted to local time"""
+        dt = api_timestamp_to_datetime("2024-01-25T10:00:00.1234567Z")
+
+        self.assertEqual(dt, utc(2024, 1, 25, 10, 0, 0, 123456))
+        self.assertEqual(dt.utcoffset(), dt.astimezone(tz=None).utcoffset())
+
+    def test_date_time_time_zone(self):
+        """Test dateTimeTimeZone values honor their timeZone"""
+        cases = [
+            ("UTC", utc(2024, 1, 31, 23, 59)),
+            ("Europe/Berlin", utc(2024, 1, 31, 22, 59)),
+            ("Pacific Standard Time", utc(2024, 2, 1, 7, 59)),
+            ("Singapore Standard Time", utc(2024, 1, 31, 15, 59)),
+            ("Central European Standard Time", utc(2024, 1, 31, 22, 59)),
+        ]
+        for time_zone, expected in cases:
+            with self.subTest(time_zone):
+                dt = api_timestamp_to_datetime(
+                    {"dateTime": "2024-01-31T23:59:00.0000000", "timeZone": time_zone}
+                )
+                self.assertEqual(dt, expected)
+
+    def test_windows_zones_are_known(self):
+        """Test every Windows zone name maps to an IANA zone"""
+        from zoneinfo import ZoneInfo
+
+        for windows_name, iana_name in datetime_util.WINDOWS_ZONES.items():
+            with self.subTest(windows_name):
+                ZoneInfo(iana_name)
+
+    def test_unknown_time_zone(self):
+        """Test unknown zones are treated as UTC with a warning printed once"""
+        datetime_util.api_timezone.cache_clear()
+        self.addCleanup(datetime_util.api_timezone.cache_clear)
+        value = {"dateTime": "2024-01-31T23:59:00.0000000", "timeZone": "Not A Zone"}
+
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            dt = api_timestamp_to_datetime(value)
+            api_timestamp_to_datetime(value)
+
+        self.assertEqual(dt, utc(2024, 1, 31, 23, 59))
+        self.assertEqual(stderr.getvalue().count("Not A Zone"), 1)
+
+    def test_fixed_format_fallback(self):
+        """Test the parser used where fromisoformat rejects 7 digits"""
+        self.assertEqual(
+            parse_fixed_timestamp("2024-01-25T10:00:00.1234567Z"),
+            utc(2024, 1, 25, 10, 0, 0, 123456),
+        )
+        self.assertEqual(
+            parse_fixed_timestamp("2024-01-25T10:00:00"), datetime(2024, 1, 25, 10)
+        )
+        with self.assertRaises(ValueError):
+            parse_fixed_timestamp("25.01.2024 10:00")
+
+    def test_matches_system_conversion(self):
+        """Test the cached local timezone gives the same result as astimezone()"""
+        start = utc(2024, 1, 1)
+        for hours in range(0, 366 * 24, 7):
+            instant = start + timedelta(hours=hours, minutes=30)
+            value = instant.strftime("%Y-%m-%dT%H:%M:%S.%f") + "0Z"
+            expected = instant.astimezone(tz=None)
+            dt = api_timestamp_to_datetime(value)
+            self.assertEqual(
+                (dt, dt.utcoffset(), dt.tzname()),
+                (expected, expected.utcoffset(), expected.tzname()),
+            )
+
+    def test_local_timezone_is_cached(self):
+        """Test the system timezone is looked up once per hour of timestamps"""
+        with patch.object(datetime_util, "_local_timezones", {}), patch.object(
+            datetime_util.time, "localtime", wraps=datetime_util.time.localtime
+        ) as localtime:
+            for minute in range(60):
+                api_timestamp_to_datetime(f"2024-01-25T10:{minute:02}:00.0000000Z")
+
+        # Start and end of the hour
+        self.assertEqual(localtime.call_count, 2)
+
+    def test_batch(self):
+        """Test converting a column gives the same values as one at a time"""
+        values = [
+            "2024-01-25T10:00:00.1234567Z",
+            None,
+            {"dateTime": "2024-01-31T23:59:00.0000000", "timeZone": "Europe/Berlin"},
+            "2024-01-25T10:00:00.1234567Z",
+        ]
+        self.assertEqual(
+            api_timestamps_to_datetimes(values),
+            [None if v is None else api_timestamp_to_datetime(v) for v in values],
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Unit tests for the incremental JSON page parser"""
+
+import json
+import unittest
+
+from todocli.utils.json_stream import ValueStream
+
+
+def chunked(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+class TestValueStream(unittest.TestCase):
+    """Test parsing the 'value' array from chunked input"""
+
+    def parse(self, document, size=1):
+        data = json.dumps(document).encode()
+        stream = ValueStream(chunked(data, size))
+        return list(stream), stream.members
+
+    def test_items_and_members(self):
+        """Test items are yielded and other members collected"""
+        document = {
+            "@odata.context": "ctx",
+            "value": [{"id": "a", "n": 1}, {"id": "b", "n": [1, 2]}],
+            "@odata.nextLink": "https://next",
+        }
+        for size in (1, 3, 1024):
+            with self.subTest(size=size):
+                items, members = self.parse(document, size)
+                self.assertEqual(items, document["value"])
+                self.assertEqual(
+                    members,
+                    {"@odata.context": "ctx", "@odata.nextLink": "https://next"},
+                )
+
+    def test_multibyte_characters_split_across_chunks(self):
+        """Test UTF-8 sequences split between chunks are decoded"""
+        data = '{"value": [{"title": "Café ☕ 日本"}]}'.encode()
+        items = list(ValueStream(chunked(data, 1)))
+        self.assertEqual(items[0]["title"], "Café ☕ 日本")
+
+    def test_numbers_split_across_chunks(self):
+        """Test numbers are not cut at a chunk boundary"""
+        data = b'{"@odata.count": 12345, "value": [678, 9]}'
+        stream = ValueStream(chunked(data, 2))
+        self.assertEqual(list(stream), [678, 9])
+        self.assertEqual(stream.members["@odata.count"], 12345)
+
+    def test_empty_collections(self):
+        """Test empty objects and arrays"""
+        self.assertEqual(self.parse({}), ([], {}))
+        self.assertEqual(self.parse({"value": []}), ([], {}))
+
+    def test_items_are_yielded_before_the_end(self):
+        """Test the first item is available before all data is read"""
+        chunks = iter([b'{"value": [{"id": 1}, ', b'{"id": 2}]}'])
+        stream = iter(ValueStream(chunks))
+
+        self.assertEqual(next(stream), {"id": 1})
+        self.assertIsNotNone(next(chunks, None))
+
+    def test_truncated_document(self):
+        """Test truncated input raises a decode error"""
+        with self.assertRaises(json.JSONDecodeError):
+            list(ValueStream([b'{"value": [{"id": 1}']))
+
+
+if __name__ == "__main__":
+    unittest.main()
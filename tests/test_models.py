@@ -3,6 +3,8 @@
 
 import unittest
 from datetime import datetime, timezone
+from unittest.mock import patch
+from todocli.models import todotask
 from todocli.models.todolist import TodoList
 from todocli.models.todotask import Task, TaskStatus, TaskImportance
 
@@ -88,6 +90,14 @@ class TestTodoListModel(unittest.TestCase):
         self.assertFalse(todo_list.is_owner)
         self.assertTrue(todo_list.is_shared)
 
+    def test_partial_list(self):
+        """Test a list projected to id and displayName"""
+        todo_list = TodoList({"id": "list123", "displayName": "Personal"})
+
+        self.assertEqual(todo_list.display_name, "Personal")
+        self.assertIsNone(todo_list.is_owner)
+        self.assertIsNone(todo_list.well_known_list_name)
+
 
 class TestTaskModel(unittest.TestCase):
     """Test Task model initialization and properties"""
@@ -230,6 +240,62 @@ class TestTaskModel(unittest.TestCase):
 
         self.assertIsNotNone(task.body_last_modified_datetime)
 
+    def test_partial_task(self):
+        """Test a task projected to id and title"""
+        task = Task({"id": "task123", "title": "Buy milk"})
+
+        self.assertEqual(task.title, "Buy milk")
+        self.assertIsNone(task.status)
+        self.assertIsNone(task.importance)
+        self.assertIsNone(task.created_datetime)
+        self.assertIsNone(task.is_reminder_on)
+
+    def test_timestamps_are_decoded_lazily(self):
+        """Test timestamps are parsed on first access and only once"""
+        api_response = {
+            "id": "task123",
+            "title": "Buy milk",
+            "createdDateTime": "2024-01-25T10:00:00.0000000Z",
+            "dueDateTime": {
+                "dateTime": "2024-01-31T23:59:00.0000000",
+                "timeZone": "UTC",
+            },
+        }
+        with patch.object(
+            todotask,
+            "api_timestamp_to_datetime",
+            wraps=todotask.api_timestamp_to_datetime,
+        ) as parse:
+            task = Task(api_response)
+            parse.assert_not_called()
+
+            created = task.created_datetime
+            self.assertIsInstance(created, datetime)
+            self.assertIs(task.created_datetime, created)
+            self.assertEqual(parse.call_count, 1)
+
+            self.assertEqual(
+                task.due_datetime.astimezone(timezone.utc),
+                datetime(2024, 1, 31, 23, 59, tzinfo=timezone.utc),
+            )
+            self.assertEqual(parse.call_count, 2)
+
+    def test_task_is_slotted(self):
+        """Test tasks have no per-instance __dict__"""
+        task = Task({"id": "task123", "title": "Buy milk"})
+
+        self.assertFalse(hasattr(task, "__dict__"))
+        with self.assertRaises(AttributeError):
+            task.unknown = 1
+
+    def test_raw_payload(self):
+        """Test the raw payload is only kept when asked for"""
+        api_response = {"id": "task123", "title": "Buy milk"}
+
+        self.assertIsNone(Task(api_response).raw)
+        self.assertIs(Task(api_response, keep_raw=True).raw, api_response)
+        self.assertIs(TodoList(api_response, keep_raw=True).raw, api_response)
+
 
 if __name__ == "__main__":
     unittest.main()
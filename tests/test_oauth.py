@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Unit tests for the shared OAuth token and session"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import todocli.graphapi.oauth as oauth
+from todocli.utils import state
+from todocli.utils.file_lock import FileLock
+
+
+def make_token(expires_in=3600, access_token="access"):
+    return {
+        "access_token": access_token,
+        "refresh_token": "refresh",
+        "token_type": "Bearer",
+        "expires_at": time.time() + expires_in,
+    }
+
+
+class OAuthTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patches = [(oauth, "token_lock_path")]
+        patches += [
+            (state, name)
+            for name in (
+                "config_dir",
+                "state_path",
+                "state_lock_path",
+                "legacy_keys_path",
+                "legacy_token_path",
+                "legacy_data_path",
+            )
+        ]
+        for target, name in patches:
+            patcher = patch.object(target, name, os.path.join(tmp_dir.name, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for name in ("_stat", "_state"):
+            patcher = patch.object(state, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        state.update("keys", {"client_id": "id", "client_secret": "secret"})
+        oauth._token = None
+        oauth._session = None
+
+    def tearDown(self):
+        oauth._token = None
+        oauth._session = None
+
+
+class TestSharedSession(OAuthTestCase):
+    """Test that one session and token are reused across calls"""
+
+    def test_session_is_reused(self):
+        """Test get_oauth_session returns the same session every time"""
+        oauth._token = make_token()
+        first = oauth.get_oauth_session()
+        second = oauth.get_oauth_session()
+
+        self.assertIs(first, second)
+        self.assertEqual(first.token["access_token"], "access")
+
+    def test_valid_token_is_not_stored_again(self):
+        """Test a valid in-memory token does not touch the disk"""
+        token = make_token()
+        oauth._token = token
+
+        with patch.object(oauth, "store_token") as store, patch(
+            "builtins.open"
+        ) as mock_open:
+            self.assertIs(oauth.get_token(), token)
+            store.assert_not_called()
+            mock_open.assert_not_called()
+
+    def test_refreshed_token_updates_session(self):
+        """Test a refreshed token is stored and swapped into the session"""
+        oauth._token = make_token()
+        session = oauth.get_oauth_session()
+        oauth._token = make_token(expires_in=60)
+
+        new_token = make_token(access_token="refreshed")
+        with patch.object(oauth, "refresh_token", return_value=new_token):
+            self.assertIs(oauth.get_oauth_session(), session)
+
+        self.assertEqual(session.token["access_token"], "refreshed")
+        self.assertEqual(oauth.load_token()["access_token"], "refreshed")
+
+
+class TestTokenRefresh(OAuthTestCase):
+    """Test refreshing the token across threads and processes"""
+
+    def test_token_refreshed_by_other_process_is_used(self):
+        """Test a newer token on disk is picked up instead of refreshing"""
+        oauth._token = make_token(expires_in=60)
+        oauth.store_token(make_token(access_token="from disk"))
+
+        with patch.object(oauth, "refresh_token") as refresh:
+            token = oauth.get_token()
+
+        refresh.assert_not_called()
+        self.assertEqual(token["access_token"], "from disk")
+
+    def test_concurrent_callers_refresh_once(self):
+        """Test threads needing a refresh at the same time refresh only once"""
+        oauth._token = make_token(expires_in=60)
+        calls = []
+
+        def refresh(token):
+            calls.append(token)
+            time.sleep(0.05)
+            return make_token(access_token="refreshed")
+
+        with patch.object(oauth, "refresh_token", side_effect=refresh):
+            threads = [threading.Thread(target=oauth.get_token) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(oauth._token["access_token"], "refreshed")
+
+    def test_background_refresh_does_not_authorize(self):
+        """Test a failed background refresh raises instead of prompting"""
+        oauth._token = make_token(expires_in=400)
+
+        with patch.object(
+            oauth, "refresh_token", side_effect=RuntimeError
+        ), patch.object(oauth, "authorize") as authorize:
+            with self.assertRaises(oauth.AuthorizationRequired):
+                oauth.get_token(margin=oauth.BACKGROUND_MARGIN, interactive=False)
+
+        authorize.assert_not_called()
+
+    def test_no_authorization_without_a_terminal(self):
+        """Test commands served by the daemon report an expired sign-in"""
+        oauth._token = make_token(expires_in=0)
+
+        with patch.object(oauth, "interactive_auth", False), patch.object(
+            oauth, "refresh_token", side_effect=RuntimeError("invalid_grant")
+        ), patch.object(oauth, "authorize") as authorize:
+            with self.assertRaises(oauth.AuthorizationRequired) as raised:
+                oauth.get_token()
+
+        authorize.assert_not_called()
+        self.assertIn("invalid_grant", raised.exception.message)
+
+    def test_file_lock_is_exclusive(self):
+        """Test a second holder waits for the file lock"""
+        events = []
+
+        def hold():
+            with FileLock(oauth.token_lock_path):
+                events.append("second")
+
+        with FileLock(oauth.token_lock_path):
+            thread = threading.Thread(target=hold)
+            thread.start()
+            thread.join(0.1)
+            events.append("first")
+        thread.join()
+
+        self.assertEqual(events, ["first", "second"])
+
+
+if __name__ == "__main__":
+    unittest.main()
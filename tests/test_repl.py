@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Unit tests for the interactive session"""
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import MagicMock, patch
+
+import requests
+from prompt_toolkit.document import Document
+
+import todocli.graphapi.cache as cache
+import todocli.graphapi.wrapper as wrapper
+from todocli import repl
+from todocli.cli import setup_parser
+from todocli.models import snapshot
+
+
+class FakeSession:
+    """Answers prompts with the given lines, then signals end of input"""
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+
+    def prompt(self, message):
+        if not self.lines:
+            raise EOFError()
+        line = self.lines.pop(0)
+        if isinstance(line, BaseException):
+            raise line
+        return line
+
+
+class TestRepl(unittest.TestCase):
+    """Test the command loop"""
+
+    def setUp(self):
+        self.parser = setup_parser()
+        self.commands = []
+
+    def run_command(self, parser, argv):
+        self.assertIs(parser, self.parser)
+        self.commands.append(argv)
+        if argv[0] == "fail":
+            parser.parse_args(argv)
+        if argv[0] == "offline":
+            raise requests.ConnectionError("Connection refused")
+        if argv[0] == "bug":
+            raise ValueError("unexpected")
+
+    def run_session(self, lines):
+        output = io.StringIO()
+        with redirect_stdout(output), patch("sys.stderr"):
+            repl.run(
+                self.parser, self.run_command, session=FakeSession(lines), warm=False
+            )
+        return output.getvalue()
+
+    def test_commands_run_with_one_parser(self):
+        """Test every line runs in this process until exit"""
+        self.run_session(["ls", "", "lst 'My list'", "exit", "ls"])
+        self.assertEqual(self.commands, [["ls"], ["lst", "My list"]])
+
+    def test_errors_do_not_end_the_session(self):
+        """Test interrupts, parse errors and bad quoting keep the session going"""
+        output = self.run_session(
+            [KeyboardInterrupt(), "fail", "new 'unterminated", "ls"]
+        )
+        self.assertEqual(self.commands, [["fail"], ["ls"]])
+        self.assertIn("No closing quotation", output)
+
+    def test_failed_commands_do_not_end_the_session(self):
+        """Test request errors and other exceptions are reported and the session goes on"""
+        with patch("traceback.print_exc") as print_exc:
+            output = self.run_session(["offline", "bug", "ls"])
+
+        self.assertEqual(self.commands, [["offline"], ["bug"], ["ls"]])
+        self.assertIn("Connection refused", output)
+        print_exc.assert_called_once()
+
+
+class TestPrefetch(unittest.TestCase):
+    """Test what is refreshed between commands"""
+
+    def test_resolved_names_are_not_reloaded(self):
+        """Test list names are only fetched when the resolved ones expired"""
+        for name, value in [
+            ("get_lists_snapshot", MagicMock()),
+            ("get_tasks_snapshot", MagicMock()),
+            ("list_ids", wrapper.IdCache(wrapper.RESOLVER_TTL)),
+        ]:
+            patcher = patch.object(wrapper, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        with patch.object(wrapper, "load_list_ids") as load_list_ids:
+            repl.prefetch()
+            load_list_ids.assert_called_once()
+
+            wrapper.list_ids.set("names", {"Tasks": "L1"})
+            repl.prefetch()
+            load_list_ids.assert_called_once()
+
+
+class TestCompletion(unittest.TestCase):
+    """Test completion from the cached lists and tasks"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patcher = patch.object(
+            cache, "SNAPSHOT_DIR", os.path.join(tmp_dir.name, "snapshots")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        cache.store_snapshot(
+            cache.LISTS_KEY,
+            snapshot.LISTS,
+            [
+                {"id": "L1", "displayName": "Tasks"},
+                {"id": "L2", "displayName": "Work"},
+            ],
+        )
+        for list_id, titles in [("L1", ["buy milk", "bake"]), ("L2", ["report"])]:
+            cache.store_snapshot(
+                cache.tasks_key(list_id, "titles"),
+                snapshot.TASKS,
+                [{"id": t, "title": t} for t in titles],
+            )
+        self.completer = repl.CommandCompleter(repl.command_names(setup_parser()))
+
+    def complete(self, text):
+        return [c.text for c in self.completer.get_completions(Document(text), None)]
+
+    def test_commands(self):
+        """Test the first word completes to a command"""
+        self.assertEqual(self.complete("ne"), ["new", "newl"])
+        self.assertIn("exit", self.complete(""))
+
+    def test_list_names(self):
+        """Test lst and --list complete list names"""
+        self.assertEqual(self.complete("lst W"), ["Work"])
+        self.assertEqual(self.complete("new -l "), ["Tasks", "Work"])
+
+    def test_task_titles(self):
+        """Test complete and rm complete quoted titles of the cached tasks"""
+        self.assertEqual(self.complete("complete b"), ["'buy milk'", "bake"])
+        self.assertEqual(self.complete("rm W"), ["Work/"])
+        self.assertEqual(self.complete("rm Work/"), ["Work/report"])
+        self.assertEqual(self.complete("rm -l Work r"), ["report"])
+        self.assertEqual(self.complete("rm 'bu"), ["'buy milk'"])
+
+    def test_nothing_cached(self):
+        """Test completion stays silent when nothing is cached"""
+        cache.invalidate(cache.LISTS_KEY)
+        self.assertEqual(self.complete("complete b"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
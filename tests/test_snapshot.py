@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Unit tests for the binary snapshot format"""
+
+import os
+import tempfile
+import unittest
+
+from todocli.models import snapshot
+from todocli.models.tasktable import TaskTable
+from todocli.models.todolist import TodoList
+from todocli.models.todotask import Task, TaskImportance
+
+TASKS = [
+    {
+        "id": "a",
+        "title": "Buy milk ✓",
+        "importance": "high",
+        "status": "notStarted",
+        "createdDateTime": "2024-01-01T08:00:00.0000000Z",
+        "dueDateTime": {
+            "dateTime": "2024-01-02T00:00:00.0000000",
+            "timeZone": "UTC",
+        },
+    },
+    {"id": "b"},
+]
+
+LISTS = [
+    {
+        "id": "L1",
+        "displayName": "Tasks",
+        "isOwner": True,
+        "isShared": False,
+        "wellknownListName": "defaultList",
+    },
+    {"id": "L2", "displayName": "Groceries"},
+]
+
+
+class TestSnapshot(unittest.TestCase):
+    """Test writing snapshots and reading them back"""
+
+    def test_tasks_round_trip(self):
+        """Test titles, ids and tasks read back from a snapshot file"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "snapshots", "tasks.snap")
+            snapshot.write(path, snapshot.build(snapshot.TASKS, TASKS))
+
+            with snapshot.open_snapshot(path, snapshot.TASKS) as tasks:
+                self.assertEqual(len(tasks), 2)
+                self.assertEqual(tasks.titles(), ["Buy milk ✓", None])
+                self.assertEqual(tasks.ids(), ["a", "b"])
+                self.assertEqual(tasks.payload(0), TASKS[0])
+                self.assertEqual(tasks.task(0).importance, TaskImportance.HIGH)
+                self.assertEqual(
+                    tasks.task(0).due_datetime, Task(TASKS[0]).due_datetime
+                )
+
+    def test_table_from_records(self):
+        """Test the TaskTable of a snapshot matches one built from payloads"""
+        tasks = snapshot.Snapshot(snapshot.build(snapshot.TASKS, TASKS))
+        table = tasks.table("L1")
+
+        self.assertEqual(table.row(0), TaskTable.from_payloads(TASKS, "L1").row(0))
+        self.assertEqual(table.order("when"), [0, 1])
+
+    def test_lists_and_models(self):
+        """Test a snapshot built from TodoList objects kept with their payload"""
+        models = [TodoList(x, keep_raw=True) for x in LISTS]
+        lists = snapshot.Snapshot(snapshot.build(snapshot.LISTS, models))
+
+        self.assertEqual(lists.id_of("Groceries"), "L2")
+        self.assertIsNone(lists.id_of("Missing"))
+        self.assertEqual(
+            [x.well_known_list_name for x in lists.lists()],
+            [TodoList.WellKnownListName.DefaultList, None],
+        )
+        with self.assertRaises(ValueError):
+            snapshot.build(snapshot.LISTS, [TodoList(LISTS[0])])
+
+    def test_invalid_data_is_refused(self):
+        """Test truncated data, other versions and other kinds are refused"""
+        data = snapshot.build(snapshot.TASKS, TASKS)
+        newer = bytearray(data)
+        newer[4] = snapshot.SNAPSHOT_VERSION + 1
+
+        for buffer, kind in [
+            (data[:-1], None),
+            (bytes(newer), None),
+            (data, snapshot.LISTS),
+            (b"", None),
+        ]:
+            with self.assertRaises(snapshot.InvalidSnapshot):
+                snapshot.Snapshot(buffer, kind)
+
+    def test_empty(self):
+        """Test a snapshot without items"""
+        tasks = snapshot.Snapshot(snapshot.build(snapshot.TASKS, []))
+        self.assertEqual(tasks.titles(), [])
+        self.assertEqual(len(tasks.table()), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
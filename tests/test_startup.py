@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Startup cost and side-effect tests for the todocli and tod0 modules"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed for todocli.cli, in milliseconds
+STARTUP_BUDGET_MS = int(os.environ.get("TOD0_STARTUP_BUDGET_MS", "100"))
+
+# Modules that must only be imported once a command needs them
+DEFERRED_MODULES = [
+    "requests",
+    "requests_oauthlib",
+    "oauthlib",
+    "yaml",
+    "bs4",
+    "concurrent.futures",
+    "numpy",
+]
+
+
+def run_python(*args, home=None):
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    if home is not None:
+        env["HOME"] = home
+    return subprocess.run(
+        [sys.executable, *args], env=env, capture_output=True, text=True
+    )
+
+
+def import_times(module):
+    """Return the cumulative import time of each module, in microseconds"""
+    result = run_python("-X", "importtime", "-c", f"import {module}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestStartup(unittest.TestCase):
+    """Test that starting the cli is cheap and side-effect free"""
+
+    def test_heavy_modules_are_deferred(self):
+        """Test importing the cli does not import network or config libraries"""
+        for module in ("todocli.cli", "todocli.graphapi.wrapper"):
+            with self.subTest(module=module):
+                imported = import_times(module)
+                self.assertIn(module, imported)
+                self.assertEqual([m for m in DEFERRED_MODULES if m in imported], [])
+
+    def test_import_time_budget(self):
+        """Test importing the cli stays within the startup budget"""
+        # Best of three, to ignore a cold disk cache
+        best = min(import_times("todocli.cli")["todocli.cli"] for _ in range(3))
+        self.assertLess(best / 1000, STARTUP_BUDGET_MS)
+
+    def test_help_has_no_side_effects(self):
+        """Test --help works without keys and does not create the config dir"""
+        with tempfile.TemporaryDirectory() as home:
+            result = run_python(
+                "-c",
+                "import sys; from todocli.cli import main;"
+                "sys.argv = ['todocli', '--help']; main()",
+                home=home,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("usage", result.stdout)
+            self.assertFalse(os.path.exists(os.path.join(home, ".config")))
+
+
+if __name__ == "__main__":
+    unittest.main()
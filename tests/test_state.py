@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Unit tests for the persistent state store"""
+
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from todocli.utils import state
+
+
+class TestState(unittest.TestCase):
+    """Test loading, caching and updating state.json"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dir = tmp_dir.name
+        patches = [(state, "_stat", None), (state, "_state", None)]
+        patches += [
+            (state, "config_dir", self.dir),
+            (state, "state_path", os.path.join(self.dir, "state.json")),
+            (state, "state_lock_path", os.path.join(self.dir, "state.lock")),
+            (state, "legacy_keys_path", os.path.join(self.dir, "keys.yml")),
+            (state, "legacy_token_path", os.path.join(self.dir, "token.pkl")),
+            (state, "legacy_data_path", os.path.join(self.dir, "data.yml")),
+        ]
+        for target, name, value in patches:
+            patcher = patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def read_file(self):
+        with open(state.state_path) as f:
+            return json.load(f)
+
+    def test_update_keeps_other_sections(self):
+        """Test updating one section leaves the others and records the version"""
+        state.update("keys", {"client_id": "id"})
+        state.update("token", {"access_token": "access"})
+
+        self.assertEqual(
+            self.read_file(),
+            {
+                "version": state.STATE_VERSION,
+                "keys": {"client_id": "id"},
+                "token": {"access_token": "access"},
+            },
+        )
+        self.assertEqual(state.get("keys"), {"client_id": "id"})
+        self.assertIsNone(state.get("missing"))
+
+    def test_file_is_read_once(self):
+        """Test the file is only parsed again after it changed"""
+        state.update("token", {"access_token": "access"})
+        state._stat = None
+
+        with patch.object(state, "read", wraps=state.read) as read:
+            state.get("token")
+            state.get("token")
+            self.assertEqual(read.call_count, 1)
+
+            # Written by another process
+            with open(state.state_path, "w") as f:
+                json.dump({"version": 1, "token": {"access_token": "other"}}, f)
+            self.assertEqual(state.get("token"), {"access_token": "other"})
+            self.assertEqual(read.call_count, 2)
+
+    def test_update_merges_changes_of_other_processes(self):
+        """Test an update does not drop a section written by another process"""
+        state.update("keys", {"client_id": "id"})
+        with open(state.state_path, "w") as f:
+            json.dump({"version": 1, "keys": {"client_id": "id"}, "token": {}}, f)
+
+        state.update("update_check", {"latest_version": "1.0.0"})
+
+        self.assertIn("token", self.read_file())
+
+    def test_newer_version_is_refused(self):
+        """Test a state file from a newer release is not overwritten"""
+        with open(state.state_path, "w") as f:
+            json.dump({"version": state.STATE_VERSION + 1}, f)
+
+        with self.assertRaises(state.UnsupportedStateVersion):
+            state.get("keys")
+
+    def test_legacy_files_are_imported(self):
+        """Test keys.yml, token.pkl and data.yml are imported once"""
+        with open(state.legacy_keys_path, "w") as f:
+            f.write("client_id: id\nclient_secret: secret\n")
+        with open(state.legacy_token_path, "wb") as f:
+            pickle.dump({"access_token": "access"}, f)
+        with open(state.legacy_data_path, "w") as f:
+            f.write("latest_version: 1.0.0\n")
+
+        self.assertEqual(state.get("token"), {"access_token": "access"})
+        self.assertEqual(
+            self.read_file(),
+            {
+                "version": state.STATE_VERSION,
+                "keys": {"client_id": "id", "client_secret": "secret"},
+                "token": {"access_token": "access"},
+                "update_check": {"latest_version": "1.0.0"},
+            },
+        )
+        self.assertFalse(os.path.exists(state.legacy_token_path))
+        self.assertFalse(os.path.exists(state.legacy_data_path))
+        # Written by the user, left in place
+        self.assertTrue(os.path.exists(state.legacy_keys_path))
+
+    def test_nothing_to_import(self):
+        """Test no file is written until something is stored"""
+        self.assertEqual(state.load(), {"version": state.STATE_VERSION})
+        self.assertFalse(os.path.exists(state.state_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Unit tests for delta synchronization into the local replica"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from requests import HTTPError
+
+import todocli.graphapi.sync as delta_sync
+import todocli.graphapi.wrapper as wrapper
+
+
+def make_list(list_id, name):
+    return {
+        "id": list_id,
+        "displayName": name,
+        "isOwner": True,
+        "isShared": False,
+        "wellknownListName": "none",
+    }
+
+
+def make_task(task_id, title, status="notStarted"):
+    return {
+        "id": task_id,
+        "title": title,
+        "importance": "normal",
+        "status": status,
+        "createdDateTime": "2024-01-25T10:00:00.0000000Z",
+        "lastModifiedDateTime": "2024-01-25T10:00:00.0000000Z",
+        "isReminderOn": False,
+    }
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(response=self)
+
+
+class FakeSession:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append(url)
+        body = self.pages[url]
+        if isinstance(body, int):
+            return FakeResponse({}, body)
+        return FakeResponse(body)
+
+
+class TestDeltaSync(unittest.TestCase):
+    """Test applying delta pages to a replica"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, "replica.json")
+        self.session = FakeSession({})
+        patcher = patch.object(wrapper, "get_oauth_session", return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_initial_sync(self):
+        """Test a first sync stores items and delta links"""
+        self.session.pages = {
+            delta_sync.LISTS_DELTA_URL: {
+                "value": [make_list("L1", "Work")],
+                "@odata.deltaLink": "lists-delta-1",
+            },
+            delta_sync.tasks_delta_url("L1"): {
+                "value": [make_task("T1", "a")],
+                "@odata.nextLink": "tasks-page-2",
+            },
+            "tasks-page-2": {
+                "value": [make_task("T2", "b", status="completed")],
+                "@odata.deltaLink": "tasks-delta-1",
+            },
+        }
+
+        replica, num_changes = delta_sync.sync(delta_sync.Replica(self.path))
+
+        self.assertEqual(num_changes, 3)
+        self.assertEqual([l.display_name for l in replica.get_lists()], ["Work"])
+        self.assertEqual([t.id for t in replica.get_tasks("L1")], ["T1"])
+        self.assertEqual(len(replica.get_tasks("L1", include_completed=True)), 2)
+
+        saved = delta_sync.Replica(self.path)
+        self.assertEqual(saved.list_state()["delta_link"], "lists-delta-1")
+        self.assertEqual(saved.task_state("L1")["delta_link"], "tasks-delta-1")
+
+    def test_incremental_sync_applies_changes(self):
+        """Test a later sync only requests the delta link and merges changes"""
+        replica = delta_sync.Replica(self.path)
+        replica.list_state().update(
+            delta_link="lists-delta-1", items={"L1": make_list("L1", "Work")}
+        )
+        replica.task_state("L1").update(
+            delta_link="tasks-delta-1",
+            items={"T1": make_task("T1", "a"), "T2": make_task("T2", "b")},
+        )
+        self.session.pages = {
+            "lists-delta-1": {"value": [], "@odata.deltaLink": "lists-delta-2"},
+            "tasks-delta-1": {
+                "value": [
+                    {"id": "T1", "title": "renamed"},
+                    {"id": "T2", "@removed": {"reason": "deleted"}},
+                ],
+                "@odata.deltaLink": "tasks-delta-2",
+            },
+        }
+
+        replica, num_changes = delta_sync.sync(replica)
+
+        self.assertEqual(num_changes, 2)
+        self.assertEqual(self.session.requests, ["lists-delta-1", "tasks-delta-1"])
+        self.assertEqual([t.title for t in replica.get_tasks("L1")], ["renamed"])
+
+    def test_expired_delta_link_resyncs(self):
+        """Test a 410 response restarts from a full sync"""
+        replica = delta_sync.Replica(self.path)
+        replica.list_state().update(
+            delta_link="expired", items={"OLD": make_list("OLD", "Gone")}
+        )
+        self.session.pages = {
+            "expired": 410,
+            delta_sync.LISTS_DELTA_URL: {
+                "value": [make_list("L1", "Work")],
+                "@odata.deltaLink": "lists-delta-1",
+            },
+        }
+
+        delta_sync.sync_lists(replica)
+
+        self.assertEqual([l.id for l in replica.get_lists()], ["L1"])
+        self.assertEqual(replica.list_state()["delta_link"], "lists-delta-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Unit tests for the columnar TaskTable"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from todocli.models.tasktable import TaskTable, numpy_available
+from todocli.models.todotask import Task, TaskImportance, TaskStatus
+
+# Wednesday
+NOW = datetime(2024, 1, 24, 12, 0)
+
+
+def utc_string(dt):
+    """Naive local datetime -> UTC dateTime string"""
+    return (
+        dt.astimezone().astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.0000000")
+    )
+
+
+def task_payload(
+    task_id, importance="normal", status="notStarted", due=None, reminder=None
+):
+    result = {
+        "id": task_id,
+        "title": f"Task {task_id}",
+        "importance": importance,
+        "status": status,
+        "createdDateTime": utc_string(NOW - timedelta(days=30)) + "Z",
+    }
+    if due is not None:
+        result["dueDateTime"] = {"dateTime": utc_string(due), "timeZone": "UTC"}
+    if reminder is not None:
+        result["reminderDateTime"] = {
+            "dateTime": utc_string(reminder),
+            "timeZone": "UTC",
+        }
+    return result
+
+
+PAYLOADS = [
+    task_payload("a", due=NOW - timedelta(days=2)),
+    task_payload("b", importance="high", due=NOW + timedelta(days=1)),
+    task_payload(
+        "c", importance="high", status="completed", due=NOW - timedelta(days=1)
+    ),
+    task_payload("d", importance="low"),
+    task_payload("e", reminder=NOW + timedelta(hours=1), due=NOW + timedelta(days=10)),
+]
+
+
+class TaskTableTests:
+    use_numpy = False
+
+    def table(self, payloads=PAYLOADS, list_id="list1"):
+        return TaskTable.from_payloads(payloads, list_id, use_numpy=self.use_numpy)
+
+    def test_filters(self):
+        """Test the overdue, this week and importance filters"""
+        table = self.table()
+        now = NOW.timestamp()
+
+        self.assertEqual(table.overdue(now).ids, ["a"])
+        self.assertEqual(table.due_this_week(now).ids, ["a", "b", "c"])
+        self.assertEqual(table.high_importance().ids, ["b", "c"])
+        self.assertEqual(
+            table.with_importance("normal", at_least=True).ids, ["a", "b", "c", "e"]
+        )
+        self.assertEqual(table.high_importance().not_completed().ids, ["b"])
+
+    def test_multi_key_sort(self):
+        """Test sorting by importance descending, then due date"""
+        table = self.table()
+        self.assertEqual(
+            table.sort("-importance", "due").ids, ["c", "b", "a", "e", "d"]
+        )
+        self.assertEqual(table.sort("due").ids, ["a", "c", "b", "e", "d"])
+        self.assertEqual(table.sort("-due").ids, ["e", "b", "c", "a", "d"])
+        self.assertEqual(table.sort("-title").ids, ["e", "d", "c", "b", "a"])
+
+    def test_sort_by_first_timestamp_set(self):
+        """Test the order used by the TUI: reminder, due, then created"""
+        table = self.table()
+        # d has only a creation time, 30 days ago
+        self.assertEqual(table.order("when"), [3, 0, 2, 4, 1])
+
+    def test_counts(self):
+        """Test counting rows by list, status and importance"""
+        table = TaskTable.concat(
+            [self.table(PAYLOADS[:3], "list1"), self.table(PAYLOADS[3:], "list2")],
+            use_numpy=self.use_numpy,
+        )
+
+        self.assertEqual(table.counts("list"), {"list1": 3, "list2": 2})
+        self.assertEqual(
+            table.counts("status"),
+            {TaskStatus.NOT_STARTED: 4, TaskStatus.COMPLETED: 1},
+        )
+        self.assertEqual(
+            table.high_importance().counts("importance"), {TaskImportance.HIGH: 2}
+        )
+
+    def test_row(self):
+        """Test reading one row back as Python values"""
+        row = self.table().row(1)
+
+        self.assertEqual(row["id"], "b")
+        self.assertEqual(row["importance"], TaskImportance.HIGH)
+        self.assertEqual(row["list_id"], "list1")
+        self.assertEqual(row["due"], (NOW + timedelta(days=1)).astimezone())
+        self.assertIsNone(row["reminder"])
+
+    def test_from_tasks(self):
+        """Test a table built from Task objects matches one built from payloads"""
+        tasks = [Task(p) for p in PAYLOADS]
+        table = TaskTable.from_tasks(tasks, "list1", use_numpy=self.use_numpy)
+
+        self.assertEqual(table.sort("when").ids, self.table().sort("when").ids)
+        # Building the table does not decode the timestamps of the tasks
+        self.assertIsInstance(tasks[0]._due_datetime, dict)
+
+    def test_missing_properties(self):
+        """Test partial payloads, e.g. from a $select projection"""
+        table = self.table([{"id": "x"}, {"id": "y", "importance": "high"}], None)
+
+        self.assertEqual(table.sort("importance").ids, ["y", "x"])
+        self.assertEqual(table.counts("importance"), {TaskImportance.HIGH: 1, None: 1})
+        self.assertEqual(table.overdue().ids, [])
+
+
+class TestTaskTable(TaskTableTests, unittest.TestCase):
+    """Test TaskTable backed by array.array"""
+
+
+@unittest.skipUnless(numpy_available(), "NumPy is not installed")
+class TestNumpyTaskTable(TaskTableTests, unittest.TestCase):
+    """Test TaskTable backed by NumPy arrays"""
+
+    use_numpy = True
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Unit tests for retrying throttled requests"""
+
+import unittest
+from unittest.mock import patch
+
+import todocli.graphapi.throttle as throttle
+
+
+class FakeResponse:
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {} if retry_after is None else {"Retry-After": retry_after}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    """Replaces time.monotonic and time.sleep with a virtual clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestThrottle(unittest.TestCase):
+    """Test the retry loop and shared cooldown"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        for name in ("monotonic", "sleep"):
+            patcher = patch.object(throttle.time, name, getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(throttle, "cooldown", throttle.Cooldown())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, responses, policy=throttle.DEFAULT_POLICY):
+        responses = list(responses)
+        return throttle.send(lambda: responses.pop(0), policy)
+
+    def test_success_is_not_retried(self):
+        """Test a successful response is returned immediately"""
+        response = self.send([FakeResponse(200)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_retry_after_is_honored(self):
+        """Test the Retry-After delay is waited before retrying"""
+        response = self.send([FakeResponse(429, "7"), FakeResponse(200)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.clock.sleeps, [7.0])
+
+    def test_backoff_without_retry_after(self):
+        """Test exponential backoff with jitter when no header is sent"""
+        with patch("random.uniform", side_effect=lambda a, b: b):
+            self.send([FakeResponse(503), FakeResponse(503), FakeResponse(200)])
+
+        self.assertEqual(self.clock.sleeps, [1.0, 2.0])
+
+    def test_gives_up_after_max_attempts(self):
+        """Test the last throttled response is returned after max attempts"""
+        policy = throttle.RetryPolicy(max_attempts=2)
+        response = self.send([FakeResponse(429, "1")] * 3, policy)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(self.clock.sleeps), 1)
+
+    def test_gives_up_past_deadline(self):
+        """Test no retry is attempted when it would exceed the deadline"""
+        policy = throttle.RetryPolicy(deadline=10)
+        response = self.send([FakeResponse(429, "30"), FakeResponse(200)], policy)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_throttled_responses_are_closed(self):
+        """Test a response that is retried releases its connection"""
+        throttled, ok = FakeResponse(429, "1"), FakeResponse(200)
+        self.send([throttled, ok])
+
+        self.assertTrue(throttled.closed)
+        self.assertFalse(ok.closed)
+
+    def test_cooldown_delays_other_requests(self):
+        """Test a cooldown set by one request delays the next one"""
+        throttle.cooldown.extend(5)
+        self.send([FakeResponse(200)])
+        self.assertEqual(self.clock.sleeps, [5.0])
+
+    def test_parse_retry_after_http_date(self):
+        """Test Retry-After given as an HTTP date"""
+        with patch.object(throttle.time, "time", return_value=0):
+            delay = throttle.parse_retry_after("Thu, 01 Jan 1970 00:00:30 GMT")
+        self.assertEqual(delay, 30)
+
+
+class TestGraphSession(unittest.TestCase):
+    """Test the defaults applied to every Graph request"""
+
+    def test_requests_time_out(self):
+        """Test requests get a timeout unless the caller gives one"""
+        from requests_oauthlib import OAuth2Session
+
+        from todocli.graphapi.session import REQUEST_TIMEOUT, GraphSession
+
+        session = GraphSession()
+        with patch.object(
+            OAuth2Session, "request", return_value=FakeResponse(200)
+        ) as request:
+            session.get("https://graph")
+            session.get("https://graph", timeout=1)
+
+        timeouts = [call.kwargs["timeout"] for call in request.call_args_list]
+        self.assertEqual(timeouts, [REQUEST_TIMEOUT, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Unit tests for the background update checker"""
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from unittest.mock import patch
+
+import todocli
+import todocli.utils.update_checker as update_checker
+from todocli.utils import state
+
+
+class TestUpdateChecker(unittest.TestCase):
+    """Test checking PyPI for a newer version"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patches = [(update_checker, "_thread", None)]
+        patches += [(state, "_stat", None), (state, "_state", None)]
+        patches += [
+            (state, name, os.path.join(tmp_dir.name, name))
+            for name in (
+                "config_dir",
+                "state_path",
+                "state_lock_path",
+                "legacy_keys_path",
+                "legacy_token_path",
+                "legacy_data_path",
+            )
+        ]
+        for target, name, value in patches:
+            patcher = patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def check(self, latest_version=None, error=None):
+        output = io.StringIO()
+        with patch.object(
+            update_checker,
+            "fetch_latest_version",
+            return_value=latest_version,
+            side_effect=error,
+        ) as fetch, redirect_stdout(output):
+            update_checker.check()
+        return fetch, output.getvalue()
+
+    def test_newer_version_is_reported_and_cached(self):
+        """Test a newer version prints a notice and is stored in the state file"""
+        fetch, output = self.check("99.0.0")
+
+        fetch.assert_called_once()
+        self.assertIn("Update available", output)
+        self.assertEqual(update_checker.read_data()["latest_version"], "99.0.0")
+
+    def test_current_version_is_not_reported(self):
+        """Test no notice when the installed version is the latest"""
+        _, output = self.check(todocli.__version__)
+        self.assertEqual(output, "")
+
+    def test_recent_check_is_not_repeated(self):
+        """Test PyPI is not queried again within a day, but the cache is used"""
+        update_checker.write_data(
+            {
+                "last_update_check": datetime.now().strftime(
+                    update_checker.DATE_FORMAT
+                ),
+                "latest_version": "99.0.0",
+            }
+        )
+
+        fetch, output = self.check()
+
+        fetch.assert_not_called()
+        self.assertIn("Update available", output)
+
+    def test_network_errors_are_silent(self):
+        """Test a failing check prints nothing"""
+        _, output = self.check(error=OSError("offline"))
+        self.assertEqual(output, "")
+
+    def test_parse_version(self):
+        """Test versions compare numerically"""
+        self.assertGreater(
+            update_checker.parse_version("0.10.0"),
+            update_checker.parse_version("0.9.1"),
+        )
+        self.assertEqual(update_checker.parse_version("1.2.0rc1"), (1, 2, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
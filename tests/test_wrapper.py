@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 """Unit tests for graph API wrapper module"""
 
+import json
 import unittest
+from unittest.mock import MagicMock, patch
+
+import todocli.graphapi.wrapper as wrapper
 from todocli.graphapi.wrapper import (
     ListNotFound,
     TaskNotFoundByName,
@@ -11,6 +15,87 @@ from todocli.graphapi.wrapper import (
 )
 
 
+def make_list(idx):
+    return {
+        "id": f"list{idx}",
+        "displayName": f"List {idx}",
+        "isOwner": True,
+        "isShared": False,
+        "wellknownListName": "none",
+    }
+
+
+def make_task(idx):
+    return {
+        "id": f"task{idx}",
+        "title": f"Task {idx}",
+        "importance": "normal",
+        "status": "notStarted",
+        "createdDateTime": "2024-01-25T10:00:00.0000000Z",
+        "lastModifiedDateTime": "2024-01-25T10:00:00.0000000Z",
+        "isReminderOn": False,
+    }
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.content = json.dumps(body).encode()
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise RuntimeError(self.status_code)
+
+    def iter_content(self, chunk_size=1):
+        # Small chunks exercise the incremental parser
+        for start in range(0, len(self.content), 7):
+            yield self.content[start : start + 7]
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Serves canned responses by URL and records every request"""
+
+    def __init__(self, pages=None):
+        self.pages = pages or {}
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append(("GET", url))
+        return FakeResponse(self.pages[url])
+
+    def patch(self, url, **kwargs):
+        self.requests.append(("PATCH", url))
+        return FakeResponse({})
+
+    def post(self, url, **kwargs):
+        self.requests.append(("POST", url))
+        return FakeResponse({})
+
+
+class FakeBatchSession:
+    """Answers $batch posts, failing items according to `statuses`"""
+
+    def __init__(self, statuses=None):
+        # Maps request id to the list of statuses returned on each attempt
+        self.statuses = statuses or {}
+        self.batches = []
+
+    def post(self, url, json=None, **kwargs):
+        self.batches.append(json["requests"])
+        responses = []
+        for request in json["requests"]:
+            attempts = self.statuses.get(request["id"], [200])
+            status = attempts.pop(0) if len(attempts) > 1 else attempts[0]
+            responses.append({"id": request["id"], "status": status, "headers": {}})
+        response = FakeResponse({"responses": responses})
+        response.json = lambda: {"responses": responses}
+        return response
+
+
 class TestWrapperExceptions(unittest.TestCase):
     """Test custom exception classes"""
 
@@ -57,5 +142,281 @@ class TestWrapperConstants(unittest.TestCase):
         self.assertIn("/$batch", BATCH_URL)
 
 
+class TestPagination(unittest.TestCase):
+    """Test that collections follow @odata.nextLink"""
+
+    def setUp(self):
+        self.session = FakeSession()
+        patcher = patch.object(wrapper, "get_oauth_session", return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_pages(self, first_url, items, page_size):
+        url = first_url
+        for start in range(0, len(items), page_size):
+            next_url = f"https://next/{start + page_size}"
+            page = {"value": items[start : start + page_size]}
+            if start + page_size < len(items):
+                page["@odata.nextLink"] = next_url
+            self.session.pages[url] = page
+            url = next_url
+
+    def test_get_lists_reads_all_pages(self):
+        """Test get_lists returns lists from every page"""
+        self.add_pages(BASE_URL, [make_list(i) for i in range(5)], 2)
+
+        lists = wrapper.get_lists()
+
+        self.assertEqual([l.id for l in lists], [f"list{i}" for i in range(5)])
+        self.assertEqual(len(self.session.requests), 3)
+
+    def test_iter_tasks_stops_at_limit(self):
+        """Test iter_tasks does not request pages beyond the limit"""
+        endpoint = f"{BASE_URL}/L/tasks?$filter=status ne 'completed'&$top=2"
+        self.add_pages(endpoint, [make_task(i) for i in range(6)], 2)
+
+        tasks = list(wrapper.iter_tasks(list_id="L", page_size=2, limit=3))
+
+        self.assertEqual([t.id for t in tasks], ["task0", "task1", "task2"])
+        self.assertEqual(len(self.session.requests), 2)
+
+    def test_iter_tasks_is_lazy(self):
+        """Test tasks are yielded before later pages are requested"""
+        endpoint = f"{BASE_URL}/L/tasks?$filter=status ne 'completed'&$top=2"
+        self.add_pages(endpoint, [make_task(i) for i in range(4)], 2)
+
+        tasks = wrapper.iter_tasks(list_id="L", page_size=2)
+        next(tasks)
+
+        self.assertEqual(len(self.session.requests), 1)
+
+    def test_tasks_of_lists_are_batched(self):
+        """Test the pages of every list are requested together, page by page"""
+        pages = {
+            "L1": {"value": [make_task(0)], "@odata.nextLink": f"{BASE_URL}/L1/next"},
+            "L1/next": {"value": [make_task(1)]},
+            "L2": {"value": []},
+        }
+        batches = []
+
+        def execute_batch(requests):
+            urls = [
+                r["url"][len("/me/todo/lists/") :].split("/tasks")[0] for r in requests
+            ]
+            batches.append(urls)
+            return [
+                {"id": str(i), "status": 200, "body": pages[u]}
+                for i, u in enumerate(urls)
+            ]
+
+        with patch.object(wrapper, "execute_batch", execute_batch):
+            tasks = wrapper.fetch_tasks_of_lists(["L1", "L2"], fields="titles")
+
+        self.assertEqual([t["id"] for t in tasks["L1"]], ["task0", "task1"])
+        self.assertEqual(tasks["L2"], [])
+        self.assertEqual(batches, [["L1", "L2"], ["L1/next"]])
+        self.assertEqual(self.session.requests, [])
+
+
+class TestBatch(unittest.TestCase):
+    """Test the $batch execution engine"""
+
+    def use_session(self, session):
+        patcher = patch.object(wrapper, "get_oauth_session", return_value=session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Keep retry delays from leaking into other tests
+        patcher = patch.object(
+            wrapper.throttle, "cooldown", wrapper.throttle.Cooldown()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_requests_are_chunked(self):
+        """Test no $batch holds more than BATCH_SIZE requests"""
+        session = FakeBatchSession()
+        self.use_session(session)
+        requests = [wrapper.batch_request("DELETE", f"/x/{i}") for i in range(45)]
+
+        responses = wrapper.execute_batch(requests)
+
+        self.assertEqual([len(b) for b in session.batches], [20, 20, 5])
+        self.assertEqual([r["id"] for r in responses], [str(i) for i in range(45)])
+
+    def test_dependent_requests_share_a_chunk(self):
+        """Test requests linked by dependsOn are never split"""
+        requests = [
+            wrapper.batch_request("GET", "/x", request_id=f"a{i}") for i in range(19)
+        ]
+        requests.append(wrapper.batch_request("GET", "/y", request_id="b0"))
+        requests.append(
+            wrapper.batch_request("GET", "/y", request_id="b1", depends_on=["b0"])
+        )
+
+        chunks = wrapper.chunk_batch(requests)
+
+        self.assertEqual([len(c) for c in chunks], [19, 2])
+
+    def test_only_failed_items_are_retried(self):
+        """Test retryable failures are resent and mapped back in order"""
+        session = FakeBatchSession({"1": [429, 200], "2": [404]})
+        self.use_session(session)
+        requests = [wrapper.batch_request("DELETE", f"/x/{i}") for i in range(3)]
+
+        responses = wrapper.execute_batch(requests)
+
+        self.assertEqual([r["status"] for r in responses], [200, 200, 404])
+        self.assertEqual([[r["id"] for r in b] for b in session.batches[1:]], [["1"]])
+
+    def test_server_errors_do_not_delay_other_requests(self):
+        """Test only throttled items extend the cooldown shared by every request"""
+        self.use_session(FakeBatchSession({"0": [500, 200]}))
+        requests = [wrapper.batch_request("DELETE", "/x/0")]
+
+        with patch.object(wrapper.time, "sleep") as sleep:
+            responses = wrapper.execute_batch(requests)
+
+        self.assertEqual(responses[0]["status"], 200)
+        sleep.assert_called_once()
+        self.assertEqual(wrapper.throttle.cooldown.remaining(), 0)
+
+    def test_throttled_items_delay_other_requests(self):
+        """Test a throttled item extends the cooldown shared by every request"""
+        self.use_session(FakeBatchSession({"0": [429, 200]}))
+        requests = [wrapper.batch_request("DELETE", "/x/0")]
+
+        with patch.object(wrapper.throttle, "backoff_delay", return_value=30):
+            with patch.object(wrapper.time, "sleep") as sleep:
+                wrapper.execute_batch(requests, max_retries=1)
+
+        sleep.assert_not_called()
+        self.assertGreater(wrapper.throttle.cooldown.remaining(), 0)
+
+    def test_dependents_of_retried_items_are_retried(self):
+        """Test a 424 caused by a retryable failure is retried with it"""
+        session = FakeBatchSession({"a": [503, 200], "b": [424, 200]})
+        self.use_session(session)
+        requests = [
+            wrapper.batch_request("POST", "/x", request_id="a"),
+            wrapper.batch_request("POST", "/y", request_id="b", depends_on=["a"]),
+        ]
+
+        responses = wrapper.execute_batch(requests)
+
+        self.assertEqual([r["status"] for r in responses], [200, 200])
+        self.assertEqual(session.batches[1][1]["dependsOn"], ["a"])
+
+    def test_complete_tasks_reports_failures(self):
+        """Test complete_tasks raises when an item fails"""
+        self.use_session(FakeBatchSession({"1": [404]}))
+
+        with patch.object(wrapper.cache, "invalidate"):
+            with self.assertRaises(wrapper.BatchRequestFailed) as ctx:
+                wrapper.complete_tasks("L", ["t0", "t1"])
+
+        self.assertEqual(len(ctx.exception.failed_responses), 1)
+        self.assertIn("404", ctx.exception.message)
+
+
+class TestResolver(unittest.TestCase):
+    """Test memoized name to ID resolution"""
+
+    def setUp(self):
+        self.lists_url = f"{BASE_URL}?$select=id,displayName"
+        self.session = FakeSession(
+            {
+                self.lists_url: {
+                    "value": [
+                        {"id": "L1", "displayName": "Work stuff"},
+                        {"id": "L2", "displayName": "Work"},
+                        {"id": "L3", "displayName": "Home"},
+                    ]
+                },
+                f"{BASE_URL}/L2/tasks?$filter=title eq 'report'": {
+                    "value": [make_task(1)]
+                },
+            }
+        )
+        for target, value in (
+            ("get_oauth_session", lambda: self.session),
+            ("cache", MagicMock()),
+        ):
+            patcher = patch.object(wrapper, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        wrapper.invalidate_list_ids()
+        self.addCleanup(wrapper.invalidate_list_ids)
+
+    def test_lists_resolved_from_one_snapshot(self):
+        """Test several list names are resolved with one request"""
+        self.assertEqual(wrapper.get_list_id_by_name("Work"), "L2")
+        self.assertEqual(wrapper.get_list_id_by_name("Home"), "L3")
+        self.assertEqual(wrapper.get_list_id_by_name("Ho"), "L3")
+        self.assertEqual(self.session.requests, [("GET", self.lists_url)])
+
+    def test_unknown_list_refreshes_snapshot(self):
+        """Test a missing name reloads the lists before failing"""
+        wrapper.get_list_id_by_name("Work")
+        with self.assertRaises(ListNotFound):
+            wrapper.get_list_id_by_name("Garden")
+        self.assertEqual(len(self.session.requests), 2)
+
+    def test_complete_task_by_name_round_trips(self):
+        """Test completing by name needs one list and one task lookup"""
+        wrapper.complete_task(list_name="Work", task_name="report")
+
+        self.assertEqual(
+            [method for method, _ in self.session.requests], ["GET", "GET", "PATCH"]
+        )
+        self.assertTrue(self.session.requests[2][1].endswith("/L2/tasks/task1"))
+
+    def test_task_ids_are_reused_until_invalidated(self):
+        """Test resolved task IDs are cached per list"""
+        wrapper.get_task_id_by_name("Work", "report")
+        wrapper.get_task_id_by_name("Work", "report")
+        self.assertEqual(len(self.session.requests), 2)
+
+        wrapper.invalidate_task_ids("L2")
+        wrapper.get_task_id_by_name("Work", "report")
+        self.assertEqual(len(self.session.requests), 3)
+
+    def test_create_list_invalidates_names(self):
+        """Test creating a list drops the resolved names"""
+        wrapper.get_list_id_by_name("Work")
+        wrapper.create_list("Garden")
+        wrapper.get_list_id_by_name("Work")
+
+        self.assertEqual(
+            [method for method, _ in self.session.requests], ["GET", "POST", "GET"]
+        )
+
+    def test_expired_names_are_reloaded(self):
+        """Test resolved names expire after the TTL"""
+        wrapper.get_list_id_by_name("Work")
+        later = wrapper.time.monotonic() + wrapper.RESOLVER_TTL + 1
+        with patch.object(wrapper.time, "monotonic", return_value=later):
+            wrapper.get_list_id_by_name("Work")
+        self.assertEqual(len(self.session.requests), 2)
+
+
+class TestFieldSets(unittest.TestCase):
+    """Test $select projections for named field sets"""
+
+    def test_titles_field_set(self):
+        """Test the titles field set selects only id and title"""
+        endpoint = wrapper.tasks_endpoint("L", fields="titles")
+        self.assertTrue(endpoint.endswith("&$top=100&$select=id,title"))
+
+    def test_full_field_set_has_no_select(self):
+        """Test the full field set fetches every property"""
+        self.assertNotIn("$select", wrapper.tasks_endpoint("L"))
+        self.assertEqual(wrapper.lists_endpoint(), BASE_URL)
+
+    def test_unknown_field_set(self):
+        """Test an unknown field set is rejected"""
+        with self.assertRaises(ValueError):
+            wrapper.tasks_endpoint("L", fields="everything")
+
+
 if __name__ == "__main__":
     unittest.main()
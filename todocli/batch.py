@@ -0,0 +1,190 @@
+"""
+Run many commands from a script, one per line, over one session.
+
+Lines hold new, complete, rm and newl commands as they would be given
+on the command line. Names are resolved once for the whole script:
+lists from one snapshot of their names, tasks from one listing of each
+list that is used. The writes are then sent as $batch requests, lists
+first so that tasks can be added to lists created by the same script.
+"""
+
+import contextlib
+import io
+import shlex
+import sys
+
+import todocli.graphapi.wrapper as wrapper
+from todocli import cli
+from todocli.graphapi import cache
+from todocli.utils.datetime_util import parse_datetime
+from todocli.utils.recurrence_util import parse_recurrence
+
+BATCHED_COMMANDS = (cli.new, cli.complete, cli.rm, cli.newl)
+
+
+class Line:
+    """One command of a script and its outcome"""
+
+    def __init__(self, number, text):
+        self.number = number
+        self.text = text
+        self.args = None
+        self.list_ids = []
+        self.requests = []
+        self.error = None
+
+
+def read_script(path):
+    """Lines of the script at `path`, '-' reads stdin"""
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(path, "r") as f:
+            text = f.read()
+
+    lines = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            lines.append(Line(number, line))
+    return lines
+
+
+def parse(line, parser):
+    try:
+        argv = shlex.split(line.text)
+    except ValueError as e:
+        line.error = str(e)
+        return
+
+    stderr = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(stderr):
+            args = parser.parse_args(argv)
+    except SystemExit:
+        # argparse prints the usage, then the error on the last line
+        output = stderr.getvalue().strip().splitlines()
+        line.error = output[-1] if output else "invalid command"
+        return
+
+    if args.func not in BATCHED_COMMANDS:
+        line.error = "only new, complete, rm and newl can be run in a batch"
+        return
+    line.args = args
+
+
+def optional_datetime(value):
+    return None if value is None else parse_datetime(value)
+
+
+def list_requests(line):
+    return [
+        wrapper.batch_request(
+            "POST", wrapper.BASE_RELATE_URL, {"displayName": line.args.list_name}
+        )
+    ]
+
+
+def task_requests(line, names, listings):
+    """Resolve the names of a task command and build its requests"""
+    args = line.args
+
+    def get_list_id(list_name):
+        list_id = wrapper.find_list_id(names, list_name)
+        if list_id is None:
+            raise wrapper.ListNotFound(list_name)
+        line.list_ids.append(list_id)
+        return list_id
+
+    def get_tasks(list_id):
+        if list_id not in listings:
+            listings[list_id] = wrapper.get_task_titles(list_id)
+        return listings[list_id]
+
+    if args.func is cli.new:
+        list_name, task_name = cli.parse_task_path(
+            args.task_name, getattr(args, "list", None)
+        )
+        body = wrapper.task_body(
+            task_name,
+            optional_datetime(args.reminder),
+            optional_datetime(args.due),
+            parse_recurrence(args.recurrence),
+        )
+        url = f"{wrapper.BASE_RELATE_URL}/{get_list_id(list_name)}/tasks"
+        return [wrapper.batch_request("POST", url, body)]
+
+    requests = []
+    for list_id, task_ids in cli.select_tasks(args, get_list_id, get_tasks).items():
+        url = f"{wrapper.BASE_RELATE_URL}/{list_id}/tasks"
+        for task_id in task_ids:
+            if args.func is cli.complete:
+                requests.append(
+                    wrapper.batch_request(
+                        "PATCH", f"{url}/{task_id}", wrapper.complete_body()
+                    )
+                )
+            else:
+                requests.append(wrapper.batch_request("DELETE", f"{url}/{task_id}"))
+    return requests
+
+
+def response_error(response):
+    body = response.get("body")
+    error = body.get("error", {}) if isinstance(body, dict) else {}
+    message = error.get("message") or "request failed"
+    return "{} (status {})".format(message, response["status"])
+
+
+def send(lines):
+    """Execute the requests of `lines` and record their failures"""
+    requests = [request for line in lines for request in line.requests]
+    if not requests:
+        return
+    responses = iter(wrapper.execute_batch(requests))
+    for line in lines:
+        for response in [next(responses) for _ in line.requests]:
+            if response["status"] >= 400 and line.error is None:
+                line.error = response_error(response)
+
+
+def report(line):
+    if line.error is None:
+        print(f"{line.number}\tok\t{line.text}")
+    else:
+        print(f"{line.number}\tfailed\t{line.text}\t{line.error}")
+
+
+def run(path, parser):
+    """Run the script at `path`, returns (failed lines, lines)"""
+    lines = read_script(path)
+    for line in lines:
+        parse(line, parser)
+    valid = [line for line in lines if line.error is None]
+
+    new_lists = [line for line in valid if line.args.func is cli.newl]
+    for line in new_lists:
+        line.requests = list_requests(line)
+    send(new_lists)
+    if new_lists:
+        cache.invalidate(cache.LISTS_KEY)
+        wrapper.invalidate_list_ids()
+
+    task_lines = [line for line in valid if line.args.func is not cli.newl]
+    if task_lines:
+        names = wrapper.load_list_ids()
+        listings = {}
+        for line in task_lines:
+            try:
+                line.requests = task_requests(line, names, listings)
+            except cli.COMMAND_ERRORS as e:
+                line.error = e.message
+        send([line for line in task_lines if line.error is None])
+
+        for list_id in {x for line in task_lines for x in line.list_ids}:
+            cache.invalidate(cache.tasks_key(list_id))
+            wrapper.invalidate_task_ids(list_id)
+
+    for line in lines:
+        report(line)
+    return sum(line.error is not None for line in lines), len(lines)
@@ -1,9 +1,12 @@
 import argparse
-import shlex
+import fnmatch
+import re
 import sys
 
 import todocli.graphapi.wrapper as wrapper
-from todocli.utils.update_checker import check as update_checker
+from todocli import daemon
+from todocli.graphapi import cache, oauth
+from todocli.utils import update_checker
 from todocli.utils.datetime_util import (
     parse_datetime,
     TimeExpressionNotRecognized,
@@ -24,6 +27,18 @@ class InvalidTaskPath(Exception):
         super(InvalidTaskPath, self).__init__(self.message)
 
 
+class NoTaskSpecified(Exception):
+    def __init__(self):
+        self.message = "Specify at least one task, or a --match/--match-regex pattern"
+        super(NoTaskSpecified, self).__init__(self.message)
+
+
+class BatchLinesFailed(Exception):
+    def __init__(self, num_failed, num_lines):
+        self.message = "{} of {} line(s) failed".format(num_failed, num_lines)
+        super(BatchLinesFailed, self).__init__(self.message)
+
+
 def parse_task_path(task_input, list_name=None):
     """Parse task input into list name and task name.
 
@@ -54,15 +69,49 @@ def print_list(item_list):
 
 
 def ls(args):
-    lists = wrapper.get_lists()
-    lists_names = [l.display_name for l in lists]
-    print_list(lists_names)
+    with wrapper.get_lists_snapshot() as lists:
+        print_list(lists.titles())
 
 
 def lst(args):
-    tasks = wrapper.get_tasks(list_name=args.list_name)
-    tasks_titles = [x.title for x in tasks]
-    print_list(tasks_titles)
+    if args.all:
+        lst_all(args.by_due)
+        return
+
+    list_id = wrapper.get_cached_list_id(args.list_name)
+    with wrapper.get_tasks_snapshot(list_id=list_id, fields="titles") as tasks:
+        print_list(tasks.titles())
+        # Task numbers given to complete and rm refer to this output
+        wrapper.save_task_listing(list_id, tasks)
+
+
+def lst_all(by_due=False):
+    """Tasks of every list, grouped by list or merged by due date"""
+    fields = "due" if by_due else "titles"
+    lists = wrapper.get_all_tasks_snapshots(fields)
+    try:
+        if by_due:
+            from todocli.models.tasktable import TaskTable
+
+            names = {list_id: list_name for list_id, list_name, _ in lists}
+            table = TaskTable.concat(
+                tasks.table(list_id) for list_id, _, tasks in lists
+            )
+            for i in table.order("due"):
+                row = table.row(i)
+                due = "" if row["due"] is None else row["due"].strftime("%Y-%m-%d")
+                print(f"{due}\t{names[row['list_id']]}/{row['title']}")
+            return
+
+        for num, (list_id, list_name, tasks) in enumerate(lists):
+            if num > 0:
+                print()
+            print(list_name)
+            print_list(tasks.titles())
+            wrapper.save_task_listing(list_id, tasks)
+    finally:
+        for _, _, tasks in lists:
+            tasks.close()
 
 
 def new(args):
@@ -94,6 +143,29 @@ def newl(args):
     wrapper.create_list(args.list_name)
 
 
+def sync(args):
+    import todocli.graphapi.sync as delta_sync
+
+    replica, num_changes = delta_sync.sync()
+    print(f"Synced {len(replica.get_lists())} lists, {num_changes} changes applied")
+
+
+def run_daemon(args):
+    if args.stop:
+        if not daemon.stop():
+            print("No daemon is running")
+        return
+    daemon.serve(lambda argv: run_command(setup_parser(), argv)[1])
+
+
+def run_batch(args):
+    from todocli import batch
+
+    num_failed, num_lines = batch.run(args.file, setup_parser())
+    if num_failed:
+        raise BatchLinesFailed(num_failed, num_lines)
+
+
 def try_parse_as_int(input_str: str):
     try:
         return int(input_str)
@@ -101,14 +173,102 @@ def try_parse_as_int(input_str: str):
         return input_str
 
 
+def glob_pattern(value):
+    """argparse type of --match, a shell-style pattern matching whole titles"""
+    return re.compile(r"\A" + fnmatch.translate(value))
+
+
+def regex_pattern(value):
+    """argparse type of --match-regex, searched for in titles"""
+    try:
+        return re.compile(value)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"invalid regular expression: {e}")
+
+
+def task_patterns(args):
+    return (getattr(args, "match", None) or []) + (
+        getattr(args, "match_regex", None) or []
+    )
+
+
+def task_targets(args):
+    """
+    Names and positions of the tasks given to complete/rm, grouped by list.
+    The list of --list, or the default list, is included when patterns
+    are given.
+    """
+    list_name = getattr(args, "list", None)
+    targets = {}
+    for task_input in args.task_name:
+        task_list, name = parse_task_path(task_input, list_name)
+        targets.setdefault(task_list, []).append(try_parse_as_int(name))
+    if task_patterns(args):
+        targets.setdefault(list_name or "Tasks", [])
+    if not targets:
+        raise NoTaskSpecified()
+    return targets
+
+
+def select_tasks(args, get_list_id=None, get_tasks=None):
+    """
+    Resolve the tasks given to complete/rm to {list_id: task ids}. Task
+    numbers are read from the output of the last `lst`, titles and
+    patterns are matched against one listing of the list. Patterns apply
+    to the list of --list.
+    """
+    get_list_id = get_list_id or wrapper.get_cached_list_id
+    get_tasks = get_tasks or wrapper.get_task_titles
+    pattern_list = getattr(args, "list", None) or "Tasks"
+    selected = {}
+    for list_name, names in task_targets(args).items():
+        list_id = get_list_id(list_name)
+        titles = [x for x in names if isinstance(x, str)]
+        patterns = task_patterns(args) if list_name == pattern_list else ()
+        task_ids = [
+            wrapper.get_task_id_by_index(list_name, x, list_id)
+            for x in names
+            if isinstance(x, int)
+        ]
+        if titles or patterns:
+            task_ids += wrapper.select_task_ids(
+                get_tasks(list_id), list_name, titles, patterns
+            )
+        selected[list_id] = list(dict.fromkeys(task_ids))
+    return selected
+
+
+def single_task_name(args):
+    """The task given to complete/rm if it is one task given by title"""
+    if len(args.task_name) != 1 or task_patterns(args):
+        return None
+    task_list, name = parse_task_path(args.task_name[0], getattr(args, "list", None))
+    return None if isinstance(try_parse_as_int(name), int) else (task_list, name)
+
+
 def complete(args):
-    task_list, name = parse_task_path(args.task_name, getattr(args, "list", None))
-    wrapper.complete_task(list_name=task_list, task_name=try_parse_as_int(name))
+    single = single_task_name(args)
+    if single is not None:
+        # Found with one query, without listing the tasks of the list
+        wrapper.complete_task(list_name=single[0], task_name=single[1])
+        return
+    for list_id, task_ids in select_tasks(args).items():
+        if len(task_ids) == 1:
+            wrapper.complete_task(list_id=list_id, task_id=task_ids[0])
+        else:
+            wrapper.complete_tasks(list_id, task_ids)
 
 
 def rm(args):
-    task_list, name = parse_task_path(args.task_name, getattr(args, "list", None))
-    wrapper.remove_task(task_list, try_parse_as_int(name))
+    single = single_task_name(args)
+    if single is not None:
+        wrapper.remove_task(*single)
+        return
+    for list_id, task_ids in select_tasks(args).items():
+        if len(task_ids) == 1:
+            wrapper.remove_task(list_id=list_id, task_id=task_ids[0])
+        else:
+            wrapper.remove_tasks(list_id, task_ids)
 
 
 helptext_task_name = """
@@ -123,6 +283,31 @@ helptext_task_name = """
         """
 
 
+helptext_task_names = helptext_task_name + """
+        Several tasks can be given, they are sent as batched requests.
+        """
+
+
+def add_match_arguments(subparser):
+    subparser.add_argument(
+        "-m",
+        "--match",
+        action="append",
+        type=glob_pattern,
+        metavar="GLOB",
+        help="Also select the open tasks of the list whose title matches "
+        "this shell-style pattern, e.g. 'milk*'. Can be repeated.",
+    )
+    subparser.add_argument(
+        "--match-regex",
+        action="append",
+        type=regex_pattern,
+        metavar="REGEX",
+        help="Also select the open tasks of the list whose title contains "
+        "a match of this regular expression. Can be repeated.",
+    )
+
+
 def setup_parser():
     parser = argparse.ArgumentParser(
         description="Command line interface for Microsoft ToDo"
@@ -147,6 +332,17 @@ def setup_parser():
         "If this parameter is omitted, \
                                 all tasks from the default task list will be displayed",
     )
+    subparser.add_argument(
+        "-a",
+        "--all",
+        action="store_true",
+        help="Display the tasks of every list, grouped by list",
+    )
+    subparser.add_argument(
+        "--by-due",
+        action="store_true",
+        help="With --all, display the tasks of all lists in one list sorted by due date",
+    )
     subparser.set_defaults(func=lst)
 
     # create parser for 'new' command
@@ -169,93 +365,137 @@ def setup_parser():
 
     # create parser for 'complete' command
     subparser = subparsers.add_parser("complete", help="Complete a Task")
-    subparser.add_argument("task_name", help=helptext_task_name)
+    subparser.add_argument("task_name", nargs="*", help=helptext_task_names)
     subparser.add_argument(
         "-l",
         "--list",
         help="Specify the list name explicitly (allows task names with slashes)",
     )
+    add_match_arguments(subparser)
     subparser.set_defaults(func=complete)
 
     # create parser for 'rm' command
     subparser = subparsers.add_parser("rm", help="Remove a Task")
-    subparser.add_argument("task_name", help=helptext_task_name)
+    subparser.add_argument("task_name", nargs="*", help=helptext_task_names)
     subparser.add_argument(
         "-l",
         "--list",
         help="Specify the list name explicitly (allows task names with slashes)",
     )
+    add_match_arguments(subparser)
     subparser.set_defaults(func=rm)
 
+    # create parser for 'batch' command
+    subparser = subparsers.add_parser(
+        "batch",
+        help="Run new, complete, rm and newl commands, one per line, "
+        "as batched requests",
+    )
+    subparser.add_argument(
+        "file",
+        nargs="?",
+        default="-",
+        help="Script with one command per line, read from stdin if omitted or '-'",
+    )
+    subparser.set_defaults(func=run_batch)
+
+    # create parser for 'daemon' command
+    subparser = subparsers.add_parser(
+        "daemon",
+        help="Serve commands from a background process that keeps "
+        "the session and caches warm",
+    )
+    subparser.add_argument(
+        "--stop", action="store_true", help="Stop the running daemon"
+    )
+    subparser.set_defaults(func=run_daemon)
+
+    # create parser for 'sync' command
+    subparser = subparsers.add_parser(
+        "sync", help="Update the local replica with changes since the last sync"
+    )
+    subparser.set_defaults(func=sync)
+
     return parser
 
 
+# Errors caused by user input, reported without a traceback
+COMMAND_ERRORS = (
+    wrapper.TaskNotFoundByName,
+    wrapper.ListNotFound,
+    wrapper.TaskNotFoundByIndex,
+    wrapper.TaskListingOutdated,
+    wrapper.NoTasksMatch,
+    wrapper.BatchRequestFailed,
+    InvalidTaskPath,
+    NoTaskSpecified,
+    BatchLinesFailed,
+    TimeExpressionNotRecognized,
+    ErrorParsingTime,
+    InvalidRecurrenceExpression,
+    daemon.DaemonAlreadyRunning,
+    oauth.AuthorizationRequired,
+)
+
+
+def run_command(parser, argv=None):
+    """
+    Parse and execute one command, printing errors caused by user input.
+    Returns (namespace, error_occurred), namespace is None if parsing failed.
+    """
+    namespace = None
+    try:
+        namespace, args = parser.parse_known_args(argv)
+        parser.parse_args(args, namespace)
+
+        if namespace.func is not None:
+            namespace.func(namespace)
+        else:
+            # No argument was provided
+            parser.print_usage()
+
+    except argparse.ArgumentError:
+        pass
+    except COMMAND_ERRORS as e:
+        print(e.message)
+        return namespace, True
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    return namespace, False
+
+
 def main():
     try:
+        argv = sys.argv[1:]
+        if daemon.should_forward(argv):
+            exit_code = daemon.forward(argv)
+            if exit_code is not None:
+                sys.exit(exit_code)
+
         parser = setup_parser()
-        first_run = True
-        interactive = False
-        error_occurred = False
-
-        while True:
-            try:
-                namespace, args = parser.parse_known_args()
-                parser.parse_args(args, namespace)
-
-                if namespace.func is not None:
-                    namespace.func(namespace)
-                else:
-                    # No argument was provided
-                    parser.print_usage()
-
-                if namespace.interactive and first_run:
-                    interactive = True
-                    first_run = False
-
-            except argparse.ArgumentError:
-                pass
-            except wrapper.TaskNotFoundByName as e:
-                print(e.message)
-                error_occurred = True
-            except wrapper.ListNotFound as e:
-                print(e.message)
-                error_occurred = True
-            except wrapper.TaskNotFoundByIndex as e:
-                print(e.message)
-                error_occurred = True
-            except InvalidTaskPath as e:
-                print(e.message)
-                error_occurred = True
-            except TimeExpressionNotRecognized as e:
-                print(e.message)
-                error_occurred = True
-            except ErrorParsingTime as e:
-                print(e.message)
-                error_occurred = True
-            except InvalidRecurrenceExpression as e:
-                print(e.message)
-                error_occurred = True
-            finally:
-                sys.stdout.flush()
-                sys.stderr.flush()
-
-            if not interactive:
-                break
-
-            arg = input("\nInput command: ")
-            args = shlex.split(arg)
-            sys.argv = sys.argv[:1]
-            sys.argv += args
+        namespace, error_occurred = run_command(parser)
 
+        if namespace is not None and namespace.interactive:
+            from todocli import repl
+
+            repl.run(parser, run_command)
         # Exit with non-zero code if an error occurred in non-interactive mode
-        if error_occurred and not interactive:
+        elif error_occurred:
             sys.exit(1)
 
     except KeyboardInterrupt:
         print("\n")
         exit(0)
+    finally:
+        # Cached output was already printed, don't wait long for its refresh
+        cache.wait_for_revalidation()
 
 
 if __name__ == "__main__":
-    update_checker()
-    main()
+    update_checker.start()
+    try:
+        main()
+    finally:
+        update_checker.notify()
@@ -0,0 +1,242 @@
+"""
+Background process serving todocli commands over a Unix socket.
+
+The daemon keeps the token, the pooled session and the name caches warm,
+so `todocli` invocations only have to forward their arguments to it and
+print what it sends back. When no daemon is running, commands run in
+the calling process as usual.
+
+Protocol: the client sends one JSON line, {"argv": [...]} or
+{"stop": true}. The daemon answers with JSON lines {"out": text} and
+{"err": text} while the command runs, followed by {"exit": code}.
+"""
+
+import json
+import os
+import sys
+import threading
+import traceback
+
+from todocli.graphapi.oauth import config_dir
+
+SOCKET_PATH = os.path.join(config_dir, "daemon.sock")
+# Seconds between checks for a stop request while waiting for clients
+ACCEPT_TIMEOUT = 0.5
+
+
+class DaemonAlreadyRunning(Exception):
+    def __init__(self, path):
+        self.message = "A daemon is already listening on {}".format(path)
+        super(DaemonAlreadyRunning, self).__init__(self.message)
+
+
+def should_forward(argv, path=None):
+    """Whether a command line can be sent to a running daemon"""
+    if os.environ.get("TOD0_NO_DAEMON"):
+        return False
+    if not os.path.exists(path or SOCKET_PATH):
+        return False
+    # A batch reads its script from the stdin of this process
+    if argv[:1] in (["daemon"], ["batch"]):
+        return False
+    # Interactive sessions read from the terminal
+    return "-i" not in argv and "--interactive" not in argv
+
+
+def connect(path):
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def send_message(sock, message):
+    sock.sendall((json.dumps(message) + "\n").encode())
+
+
+def forward(argv, path=None):
+    """
+    Run a command through the daemon, returns its exit code.
+    Returns None when no daemon answers, so the caller can run it directly.
+    """
+    path = path or SOCKET_PATH
+    if not os.path.exists(path):
+        return None
+    sock = connect(path)
+    if sock is None:
+        # Socket left behind by a daemon that is gone
+        return None
+
+    with sock:
+        send_message(sock, {"argv": list(argv)})
+        for line in sock.makefile("rb"):
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+                sys.stderr.flush()
+            elif "exit" in message:
+                return message["exit"]
+
+    # The command may have run partially, so do not run it again
+    print("Lost connection to the todocli daemon", file=sys.stderr)
+    return 1
+
+
+def stop(path=None):
+    """Ask a running daemon to exit, returns False if none is running"""
+    sock = connect(path or SOCKET_PATH)
+    if sock is None:
+        return False
+    with sock:
+        send_message(sock, {"stop": True})
+        sock.makefile("rb").readline()
+    return True
+
+
+class StreamRouter:
+    """Sends writes to the stream registered by the current thread"""
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def target(self):
+        return getattr(self.local, "stream", None) or self.default
+
+    def write(self, text):
+        return self.target().write(text)
+
+    def flush(self):
+        return self.target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target(), name)
+
+
+class SocketStream:
+    """Text stream forwarding each write to the client"""
+
+    def __init__(self, sock, key):
+        self.sock = sock
+        self.key = key
+
+    def write(self, text):
+        if text:
+            send_message(self.sock, {self.key: text})
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def exit_code(e: SystemExit):
+    if e.code is None:
+        return 0
+    return e.code if isinstance(e.code, int) else 1
+
+
+def handle(sock, run_command, stop_event):
+    with sock:
+        try:
+            request = json.loads(sock.makefile("rb").readline())
+        except ValueError:
+            # Empty when a client only checked that the daemon is running
+            return
+        if not isinstance(request, dict):
+            return
+        if request.get("stop"):
+            stop_event.set()
+            send_message(sock, {"exit": 0})
+            return
+
+        sys.stdout.local.stream = SocketStream(sock, "out")
+        sys.stderr.local.stream = SocketStream(sock, "err")
+        try:
+            code = 1 if run_command(request["argv"]) else 0
+        except SystemExit as e:
+            # argparse exits on --help and on invalid arguments
+            code = exit_code(e)
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.local.stream = None
+            sys.stderr.local.stream = None
+        send_message(sock, {"exit": code})
+
+
+def warm_up():
+    from todocli.graphapi import oauth, wrapper
+
+    # Authenticate in the foreground, later refreshes happen in the background
+    oauth.get_token()
+    oauth.start_background_refresh()
+    wrapper.load_list_ids()
+
+
+def serve(run_command, path=None, warm=True):
+    """
+    Serve commands until stopped, Unix only. `run_command(argv)` executes one command
+    and returns True if it failed.
+    """
+    import socket
+
+    from todocli.graphapi import oauth
+
+    path = path or SOCKET_PATH
+    if os.path.exists(path):
+        sock = connect(path)
+        if sock is not None:
+            sock.close()
+            raise DaemonAlreadyRunning(path)
+        # Socket left behind by a daemon that is gone
+        os.remove(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if warm:
+        warm_up()
+    # Commands must not wait for input on the daemon's terminal
+    oauth.interactive_auth = False
+
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StreamRouter(stdout), StreamRouter(stderr)
+    stop_event = threading.Event()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # Only the user may connect, from the moment the socket exists
+        umask = os.umask(0o077)
+        try:
+            server.bind(path)
+        finally:
+            os.umask(umask)
+        server.listen()
+        print("Serving todocli commands on {}".format(path), file=stdout, flush=True)
+        server.settimeout(ACCEPT_TIMEOUT)
+        while not stop_event.is_set():
+            try:
+                sock, _ = server.accept()
+            except socket.timeout:
+                continue
+            sock.settimeout(None)
+            threading.Thread(
+                target=handle, args=(sock, run_command, stop_event), daemon=True
+            ).start()
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+        sys.stdout, sys.stderr = stdout, stderr
+        oauth.interactive_auth = True
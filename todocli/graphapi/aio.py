@@ -0,0 +1,124 @@
+"""
+Coroutine versions of the list and task operations in wrapper.
+
+Each call runs the synchronous implementation on a bounded pool of
+worker threads that share the pooled Graph session, so an asyncio
+program (such as the prompt_toolkit interface) can keep many requests
+in flight without blocking its event loop.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from todocli.graphapi import wrapper
+from todocli.graphapi.oauth import POOL_MAXSIZE
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=POOL_MAXSIZE, thread_name_prefix="graphapi"
+            )
+        return _executor
+
+
+async def run(func, *args, **kwargs):
+    """Run a blocking wrapper function without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+async def get_lists(page_size=None, limit=None, fields="full"):
+    return await run(wrapper.get_lists, page_size, limit, fields)
+
+
+async def iter_lists(page_size=None, limit=None, fields="full"):
+    async for todo_list in iterate(wrapper.iter_lists(page_size, limit, fields)):
+        yield todo_list
+
+
+async def get_tasks(
+    list_name=None, list_id=None, num_tasks=None, page_size=100, fields="full"
+):
+    return await run(
+        wrapper.get_tasks, list_name, list_id, num_tasks, page_size, fields
+    )
+
+
+async def iter_tasks(
+    list_name=None, list_id=None, page_size=100, limit=None, fields="full"
+):
+    tasks = wrapper.iter_tasks(
+        list_name, list_id, page_size=page_size, limit=limit, fields=fields
+    )
+    async for task in iterate(tasks):
+        yield task
+
+
+async def get_tasks_of_lists(list_ids, fields="full"):
+    """Fetch the tasks of several lists concurrently, in the order given"""
+    return await asyncio.gather(
+        *(get_tasks(list_id=x, fields=fields) for x in list_ids)
+    )
+
+
+async def create_list(title):
+    return await run(wrapper.create_list, title)
+
+
+async def rename_list(old_title, new_title):
+    return await run(wrapper.rename_list, old_title, new_title)
+
+
+async def create_task(task_name, **kwargs):
+    return await run(wrapper.create_task, task_name, **kwargs)
+
+
+async def complete_task(**kwargs):
+    return await run(wrapper.complete_task, **kwargs)
+
+
+async def complete_tasks(list_id, task_ids=None):
+    return await run(wrapper.complete_tasks, list_id, task_ids)
+
+
+async def remove_task(list_name, task_name):
+    return await run(wrapper.remove_task, list_name, task_name)
+
+
+async def create_tasks(list_id, task_bodies):
+    return await run(wrapper.create_tasks, list_id, task_bodies)
+
+
+async def update_tasks(list_id, task_bodies):
+    return await run(wrapper.update_tasks, list_id, task_bodies)
+
+
+async def remove_tasks(list_id, task_ids):
+    return await run(wrapper.remove_tasks, list_id, task_ids)
+
+
+async def execute_batch(requests, **kwargs):
+    return await run(wrapper.execute_batch, requests, **kwargs)
+
+
+_DONE = object()
+
+
+async def iterate(iterator):
+    """Consume a blocking iterator (e.g. a paged collection) from a coroutine"""
+    while True:
+        item = await run(next, iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
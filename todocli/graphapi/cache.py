@@ -0,0 +1,237 @@
+"""
+On-disk cache of Graph API collections.
+
+Each entry is a binary snapshot file (see todocli.models.snapshot), which
+commands map in memory instead of parsing JSON. Entries are served
+immediately and refreshed in a background thread (stale-while-revalidate).
+Snapshots are replaced by renaming a complete file over them, so several
+todocli processes can read and write them at the same time.
+
+Invalidating a key also writes a marker file holding the time of the
+invalidation. A fetch that started before it, in any process, is not
+stored, as it may predate the write that invalidated the key.
+"""
+
+import os
+import threading
+import time
+from urllib.parse import quote
+
+from todocli.graphapi.oauth import config_dir
+from todocli.models import snapshot
+from todocli.utils.atomic_file import write_atomic
+
+SNAPSHOT_DIR = os.path.join(config_dir, "snapshots")
+
+# Entries younger than this are served without revalidating
+FRESH_SECONDS = 10
+# Entries older than this are refetched before being served
+MAX_AGE_SECONDS = 24 * 60 * 60
+# Seconds wait_for_revalidation gives refreshes still running when a command is done
+REVALIDATE_WAIT = 0.5
+
+LISTS_KEY = "lists"
+
+_threads = []
+
+
+def tasks_key(list_id, fields=None):
+    """Key of a list's tasks, invalidating it covers every field set"""
+    key = f"tasks:{list_id}"
+    return key if fields is None else f"{key}:{fields}"
+
+
+def listing_key(list_id):
+    """Key of the tasks of a list as last shown by `lst`, see wrapper.save_task_listing"""
+    return tasks_key(list_id, "listing")
+
+
+def snapshot_path(key):
+    return os.path.join(SNAPSHOT_DIR, quote(key, safe="") + ".snap")
+
+
+def marker_path(key):
+    return os.path.join(SNAPSHOT_DIR, quote(key, safe="") + ".invalidated")
+
+
+def invalidate(key):
+    """Drop the entry for key and all entries nested under it ('key:...')"""
+    # The marker comes first, so a fetch stored after the removal sees it
+    try:
+        write_atomic(marker_path(key), repr(time.time()))
+    except OSError:
+        pass
+    remove(key)
+
+
+def remove(key):
+    prefix = quote(f"{key}:", safe="")
+    try:
+        names = os.listdir(SNAPSHOT_DIR)
+    except OSError:
+        return
+    for name in names:
+        if name == os.path.basename(snapshot_path(key)) or (
+            name.startswith(prefix) and name.endswith(".snap")
+        ):
+            try:
+                os.remove(os.path.join(SNAPSHOT_DIR, name))
+            except OSError:
+                pass
+
+
+def invalidated_at(key):
+    """Time key was last invalidated by any process, or None"""
+    try:
+        with open(marker_path(key), "rb") as f:
+            return float(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def invalidated_since(key, started):
+    """Whether key, or a key it is nested under, was invalidated after `started`"""
+    parts = key.split(":")
+    for i in range(1, len(parts) + 1):
+        at = invalidated_at(":".join(parts[:i]))
+        if at is not None and at >= started:
+            return True
+    return False
+
+
+def store_snapshot(key, kind, items, updated_at=None):
+    """Write the snapshot of an entry, returns its bytes"""
+    data = snapshot.build(kind, items, updated_at)
+    try:
+        snapshot.write(snapshot_path(key), data)
+    except OSError:
+        pass
+    return data
+
+
+def save(key, items, started, kind):
+    """
+    Store the snapshot of the items of key fetched from `started` on,
+    returns its bytes. The snapshot is dated from the start of the fetch.
+    Items fetched before the key was invalidated are not stored, they
+    may predate the write that invalidated it.
+    """
+    if invalidated_since(key, started):
+        return snapshot.build(kind, items, started)
+    data = store_snapshot(key, kind, items, started)
+    # Invalidated by another process while the snapshot was written
+    if invalidated_since(key, started):
+        try:
+            os.remove(snapshot_path(key))
+        except OSError:
+            pass
+    return data
+
+
+def fetch_and_store(key, fetch, kind):
+    """Fetch the items of key and store their snapshot, returns it"""
+    started = time.time()
+    return snapshot.Snapshot(save(key, fetch(), started, kind))
+
+
+def revalidate(key, fetch, kind):
+    def run():
+        try:
+            fetch_and_store(key, fetch, kind).close()
+        except Exception:
+            # Cached data was already served, try again next time
+            pass
+
+    return start_revalidation(run, f"revalidate-{key}")
+
+
+def fetch_and_store_many(keys, fetch_many, kind):
+    """Fetch the items of several keys in one call, returns their snapshots by key"""
+    started = time.time()
+    fetched = fetch_many(keys)
+    return {
+        key: snapshot.Snapshot(save(key, fetched[key], started, kind)) for key in keys
+    }
+
+
+def revalidate_many(keys, fetch_many, kind):
+    def run():
+        try:
+            for x in fetch_and_store_many(keys, fetch_many, kind).values():
+                x.close()
+        except Exception:
+            pass
+
+    return start_revalidation(run, f"revalidate-{len(keys)}-keys")
+
+
+def start_revalidation(target, name):
+    # A daemon thread, so a slow refresh never keeps the process alive
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    _threads[:] = [x for x in _threads if x.is_alive()] + [thread]
+    thread.start()
+    return thread
+
+
+def wait_for_revalidation(timeout=REVALIDATE_WAIT):
+    """Give refreshes still running up to `timeout` seconds, call once the command is done"""
+    deadline = time.monotonic() + timeout
+    for thread in list(_threads):
+        thread.join(max(0, deadline - time.monotonic()))
+
+
+def open_snapshot(key, kind):
+    """The snapshot stored for key, or None"""
+    try:
+        return snapshot.open_snapshot(snapshot_path(key), kind)
+    except (OSError, snapshot.InvalidSnapshot):
+        return None
+
+
+def get_snapshot(key, fetch, kind):
+    """
+    Return the items of key as a snapshot of the given kind, calling
+    `fetch` to fill the cache when they are missing or too old. Cached
+    snapshots are mapped from disk and revalidated in the background.
+    Close it when done.
+    """
+    cached = open_snapshot(key, kind)
+    if cached is not None:
+        age = time.time() - cached.updated_at
+        if age <= MAX_AGE_SECONDS:
+            if age > FRESH_SECONDS:
+                revalidate(key, fetch, kind)
+            return cached
+        cached.close()
+
+    return fetch_and_store(key, fetch, kind)
+
+
+def get_snapshots(keys, fetch_many, kind):
+    """
+    Like get_snapshot for several keys, whose items `fetch_many(keys)`
+    fetches together and returns by key. Missing and expired entries are
+    fetched in one call, stale ones revalidated in one background thread.
+    Returns the snapshots in the order of `keys`, close them when done.
+    """
+    snapshots = {}
+    stale = []
+    now = time.time()
+    for key in keys:
+        cached = open_snapshot(key, kind)
+        if cached is None:
+            continue
+        age = now - cached.updated_at
+        if age > MAX_AGE_SECONDS:
+            cached.close()
+            continue
+        if age > FRESH_SECONDS:
+            stale.append(key)
+        snapshots[key] = cached
+
+    missing = [key for key in keys if key not in snapshots]
+    if missing:
+        snapshots.update(fetch_and_store_many(missing, fetch_many, kind))
+    if stale:
+        revalidate_many(stale, fetch_many, kind)
+    return [snapshots[key] for key in keys]
@@ -1,10 +1,13 @@
 # Oauth settings
 import os
-import pickle
+import threading
 import time
 
-import yaml
-from requests_oauthlib import OAuth2Session
+from todocli.utils import state
+from todocli.utils.file_lock import FileLock
+
+# requests_oauthlib is imported where it is used, so that
+# importing this module stays cheap and free of side effects
 
 settings = {
     "redirect": "https://localhost/login/authorized",
@@ -16,11 +19,6 @@ settings = {
 
 # Code taken from https://docs.microsoft.com/en-us/graph/tutorials/python?tutorial-step=3
 
-# This is necessary because Azure does not guarantee
-# to return scopes in the same case and order as requested
-os.environ["OAUTHLIB_RELAX_TOKEN_SCOPE"] = "1"
-os.environ["OAUTHLIB_IGNORE_SCOPE_CHANGE"] = "1"
-
 redirect = settings["redirect"]
 scope = settings["scopes"]
 
@@ -28,9 +26,13 @@ authorize_url = "{0}{1}".format(settings["authority"], settings["authorize_endpo
 token_url = "{0}{1}".format(settings["authority"], settings["token_endpoint"])
 
 # User settings location
-config_dir = "{}/.config/tod0".format(os.path.expanduser("~"))
-if not os.path.isdir(config_dir):
-    os.makedirs(config_dir)
+config_dir = state.config_dir
+
+
+def ensure_config_dir():
+    if not os.path.isdir(config_dir):
+        os.makedirs(config_dir)
+    return config_dir
 
 
 def check_keys(keys):
@@ -39,8 +41,8 @@ def check_keys(keys):
 
     if client_id == "" or client_secret == "":
         print(
-            "Please enter your client id and secret in {}".format(
-                os.path.join(config_dir, "keys.yml")
+            'Please enter your client id and secret under "keys" in {}'.format(
+                state.state_path
             )
         )
         print(
@@ -51,79 +53,196 @@ def check_keys(keys):
         exit()
 
 
-# Check for api keys
-keys_path = os.path.join(config_dir, "keys.yml")
-if not os.path.isfile(keys_path):
-    keys = {"client_id": "", "client_secret": ""}
-
-    with open(keys_path, "w") as f:
-        yaml.dump(keys, f)
+def get_keys():
+    """Return the api keys, asking the user for them if missing"""
+    keys = state.get("keys")
+    if keys is None:
+        # Leave empty keys for the user to fill in
+        keys = {"client_id": "", "client_secret": ""}
+        state.update("keys", keys)
     check_keys(keys)
-else:
-    # Load api keys
-    with open(keys_path) as f:
-        keys = yaml.load(f, yaml.SafeLoader)
-        check_keys(keys)
+    return keys
 
-client_id = keys["client_id"]
-client_secret = keys["client_secret"]
 
+def new_session(session_class=None, **kwargs):
+    if session_class is None:
+        from requests_oauthlib import OAuth2Session as session_class
 
-def get_token():
-    try:
-        # Try to load token from local
-        with open(os.path.join(config_dir, "token.pkl"), "rb") as f:
-            token = pickle.load(f)
+    # This is necessary because Azure does not guarantee
+    # to return scopes in the same case and order as requested
+    os.environ["OAUTHLIB_RELAX_TOKEN_SCOPE"] = "1"
+    os.environ["OAUTHLIB_IGNORE_SCOPE_CHANGE"] = "1"
 
-        token = refresh_token(token)
+    return session_class(get_keys()["client_id"], scope=scope, **kwargs)
 
-    except Exception:
-        # Authorize user to get token
-        outlook = OAuth2Session(client_id, scope=scope, redirect_uri=redirect)
 
-        # Redirect  the user owner to the OAuth provider
-        authorization_url, state = outlook.authorization_url(authorize_url)
-        print("Please go here and authorize:\n", authorization_url)
+# Number of keep-alive connections kept open to the Graph API
+POOL_MAXSIZE = 16
 
-        # Get the authorization verifier code from the callback url
-        redirect_response = input("Paste the full redirect URL below:\n")
+# Refresh tokens this many seconds before they expire, to allow for clock skew
+EXPIRY_MARGIN = 300
+# The background refresh starts earlier, so requests never wait for a refresh
+BACKGROUND_MARGIN = 600
+
+token_lock_path = os.path.join(config_dir, "token.lock")
+
+# Token and session shared by every request made in this process
+_token = None
+_session = None
+_refresher = None
+_lock = threading.RLock()
+# Held while a token is refreshed, so only one thread refreshes at a time
+_refresh_lock = threading.Lock()
+# Whether get_token may ask the user to authorize, False where there is
+# no terminal to ask from (see daemon.serve)
+interactive_auth = True
 
-        # Fetch the access token
-        token = outlook.fetch_token(
-            token_url,
-            client_secret=client_secret,
-            authorization_response=redirect_response,
-        )
 
-    store_token(token)
+class AuthorizationRequired(Exception):
+    def __init__(self, reason):
+        self.message = (
+            "Could not refresh the sign-in ({}). Run a command directly to "
+            "sign in again: stop the daemon with 'todocli daemon --stop', "
+            "or set TOD0_NO_DAEMON=1".format(reason)
+        )
+        super(AuthorizationRequired, self).__init__(self.message)
+
+
+def expires_within(token, seconds):
+    return time.time() >= token["expires_at"] - seconds
+
+
+def get_token(margin=EXPIRY_MARGIN, interactive=None):
+    """
+    Return a token valid for at least `margin` seconds. If it cannot be
+    refreshed, the user is asked to authorize again, unless `interactive`
+    (by default `interactive_auth`) is False.
+
+    The token is kept in memory; it is only read from and written to disk
+    when it has to be refreshed. A file lock makes sure only one process
+    refreshes it, the others pick up the refreshed token from disk.
+    """
+    global _token
+
+    if interactive is None:
+        interactive = interactive_auth
+    token = _token
+    if token is not None and not expires_within(token, margin):
+        return token
+
+    with _refresh_lock:
+        # Another thread may have refreshed it while we waited
+        token = _token
+        if token is not None and not expires_within(token, margin):
+            return token
+
+        ensure_config_dir()
+        with FileLock(token_lock_path):
+            # Another process may have refreshed it while we waited
+            stored = load_token()
+            if stored is not None and (
+                token is None or stored["expires_at"] > token["expires_at"]
+            ):
+                token = stored
+
+            if token is None or expires_within(token, margin):
+                try:
+                    token = refresh_token(token)
+                except Exception as e:
+                    if not interactive:
+                        raise AuthorizationRequired(e) from e
+                    token = authorize()
+                store_token(token)
+
+        _token = token
+        return token
+
+
+def start_background_refresh():
+    """Keep the token fresh from a background thread, for long-running sessions"""
+    global _refresher
+
+    with _lock:
+        if _refresher is None:
+            _refresher = threading.Thread(
+                target=refresh_loop, name="token-refresh", daemon=True
+            )
+            _refresher.start()
+
+
+def refresh_loop():
+    while True:
+        token = _token
+        if token is None:
+            delay = 60
+        else:
+            delay = token["expires_at"] - BACKGROUND_MARGIN - time.time()
+        time.sleep(max(delay, 1))
+        try:
+            get_token(margin=BACKGROUND_MARGIN, interactive=False)
+        except Exception:
+            # Requests will refresh (or ask to authorize) when they need to
+            pass
+
+
+def authorize():
+    # Authorize user to get token
+    outlook = new_session(redirect_uri=redirect)
+
+    # Redirect  the user owner to the OAuth provider
+    authorization_url, state = outlook.authorization_url(authorize_url)
+    print("Please go here and authorize:\n", authorization_url)
+
+    # Get the authorization verifier code from the callback url
+    redirect_response = input("Paste the full redirect URL below:\n")
+
+    # Fetch the access token
+    token = outlook.fetch_token(
+        token_url,
+        client_secret=get_keys()["client_secret"],
+        authorization_response=redirect_response,
+    )
     return token
 
 
+def load_token():
+    try:
+        return state.get("token")
+    except Exception:
+        return None
+
+
 def store_token(token):
-    with open(os.path.join(config_dir, "token.pkl"), "wb") as f:
-        pickle.dump(token, f)
+    state.update("token", dict(token))
 
 
 def refresh_token(token):
-    # Check expiration
-    now = time.time()
-    # Subtract 5 minutes from expiration to account for clock skew
-    expire_time = token["expires_at"] - 300
-    if now >= expire_time:
-        # Refresh the token
-        aad_auth = OAuth2Session(
-            client_id, token=token, scope=scope, redirect_uri=redirect
-        )
+    keys = get_keys()
+    aad_auth = new_session(token=token, redirect_uri=redirect)
 
-        refresh_params = {"client_id": client_id, "client_secret": client_secret}
+    refresh_params = {
+        "client_id": keys["client_id"],
+        "client_secret": keys["client_secret"],
+    }
 
-        new_token = aad_auth.refresh_token(token_url, **refresh_params)
-        return new_token
-
-    # Token still valid, just return it
-    return token
+    return aad_auth.refresh_token(token_url, **refresh_params)
 
 
 def get_oauth_session():
+    """Return the process-wide session, keeping its connection pool warm"""
+    global _session
+
     token = get_token()
-    return OAuth2Session(client_id, scope=scope, token=token)
+    with _lock:
+        if _session is None:
+            from requests.adapters import HTTPAdapter
+            from todocli.graphapi.session import GraphSession
+
+            _session = new_session(token=token, session_class=GraphSession)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+            _session.mount("https://", adapter)
+            # Responses are decoded transparently by requests
+            _session.headers["Accept-Encoding"] = "gzip, deflate"
+        elif _session.token is not token:
+            _session.token = token
+        return _session
@@ -0,0 +1,16 @@
+from requests_oauthlib import OAuth2Session
+
+from todocli.graphapi import throttle
+
+# Seconds to wait for a connection and for each read, so a network that
+# never answers fails the request instead of hanging the command
+REQUEST_TIMEOUT = (10, 60)
+
+
+class GraphSession(OAuth2Session):
+    """OAuth2Session that waits and retries when Graph throttles a request"""
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        parent = super(GraphSession, self)
+        return throttle.send(lambda: parent.request(method, url, *args, **kwargs))
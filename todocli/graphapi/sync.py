@@ -0,0 +1,131 @@
+"""
+Incremental synchronization of lists and tasks into a local replica.
+
+Uses the delta queries of the Graph API, see:
+https://learn.microsoft.com/en-us/graph/api/todotasklist-delta?view=graph-rest-1.0
+https://learn.microsoft.com/en-us/graph/api/todotask-delta?view=graph-rest-1.0
+"""
+
+import json
+import os
+
+from requests import HTTPError
+
+from todocli.graphapi.oauth import config_dir
+from todocli.graphapi.wrapper import BASE_URL, iter_pages
+from todocli.models.todolist import TodoList
+from todocli.models.todotask import Task, TaskStatus
+from todocli.utils.atomic_file import write_atomic
+
+REPLICA_PATH = os.path.join(config_dir, "replica.json")
+LISTS_DELTA_URL = f"{BASE_URL}/delta"
+
+
+def tasks_delta_url(list_id):
+    return f"{BASE_URL}/{list_id}/tasks/delta"
+
+
+class Replica:
+    """
+    Local copy of lists and tasks together with the delta links
+    needed to fetch only what changed since the last sync.
+    """
+
+    def __init__(self, path=REPLICA_PATH):
+        self.path = path
+        self.data = {"lists": {"delta_link": None, "items": {}}, "tasks": {}}
+        if os.path.isfile(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def save(self):
+        # Overlapping syncs (e.g. from cron) each replace the file as a whole
+        write_atomic(self.path, json.dumps(self.data))
+
+    def get_lists(self):
+        return [TodoList(x) for x in self.data["lists"]["items"].values()]
+
+    def get_tasks(self, list_id, include_completed=False):
+        state = self.data["tasks"].get(list_id, {"items": {}})
+        return [
+            Task(x)
+            for x in state["items"].values()
+            if include_completed or x.get("status") != TaskStatus.COMPLETED
+        ]
+
+    def list_state(self):
+        return self.data["lists"]
+
+    def task_state(self, list_id):
+        return self.data["tasks"].setdefault(list_id, {"delta_link": None, "items": {}})
+
+    def drop_tasks(self, list_id):
+        self.data["tasks"].pop(list_id, None)
+
+
+def apply_delta(state, initial_url):
+    """
+    Apply the changes since the stored delta link to `state`.
+    Returns (changed_ids, removed_ids).
+    """
+    url = state["delta_link"] or initial_url
+    try:
+        return _apply_pages(state, url)
+    except HTTPError as e:
+        # The delta link expired, start over with a full sync
+        if state["delta_link"] is None or e.response.status_code != 410:
+            raise
+        state["delta_link"] = None
+        state["items"] = {}
+        return _apply_pages(state, initial_url)
+
+
+def _apply_pages(state, url):
+    changed = []
+    removed = []
+    items = state["items"]
+    for page in iter_pages(url):
+        for item in page["value"]:
+            if "@removed" in item:
+                items.pop(item["id"], None)
+                removed.append(item["id"])
+            else:
+                # Delta responses may only contain the changed properties
+                items[item["id"]] = {**items.get(item["id"], {}), **item}
+                changed.append(item["id"])
+        if "@odata.deltaLink" in page:
+            state["delta_link"] = page["@odata.deltaLink"]
+    return changed, removed
+
+
+def sync_lists(replica):
+    changed, removed = apply_delta(replica.list_state(), LISTS_DELTA_URL)
+    for list_id in removed:
+        replica.drop_tasks(list_id)
+    return len(changed) + len(removed)
+
+
+def sync_tasks(replica, list_id):
+    changed, removed = apply_delta(
+        replica.task_state(list_id), tasks_delta_url(list_id)
+    )
+    return len(changed) + len(removed)
+
+
+def sync(replica=None, list_ids=None):
+    """
+    Bring the replica up to date and save it.
+    Tasks of every list are synced unless `list_ids` is given.
+    Returns the replica and the number of changes applied.
+    """
+    if replica is None:
+        replica = Replica()
+
+    num_changes = sync_lists(replica)
+    if list_ids is None:
+        list_ids = list(replica.list_state()["items"])
+    for list_id in list_ids:
+        num_changes += sync_tasks(replica, list_id)
+
+    replica.save()
+    return replica, num_changes
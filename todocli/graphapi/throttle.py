@@ -0,0 +1,106 @@
+"""
+Retrying of throttled Graph API requests.
+
+Graph answers with 429 (or 503) and a Retry-After header when a client
+sends too many requests, see:
+https://learn.microsoft.com/en-us/graph/throttling
+
+A process only talks to one account, so a single cooldown is shared by
+every thread: once any request is throttled, all requests wait.
+"""
+
+import threading
+import time
+
+RETRY_STATUS = {429, 503}
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=6, deadline=120.0, base_delay=1.0, max_delay=60.0):
+        # Total number of times a request is sent
+        self.max_attempts = max_attempts
+        # Seconds after which a throttled request is not retried anymore
+        self.deadline = deadline
+        # Backoff is base_delay * 2**attempt, capped at max_delay
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+class Cooldown:
+    """Point in time before which no request should be sent"""
+
+    def __init__(self):
+        self._until = 0.0
+        self._lock = threading.Lock()
+
+    def extend(self, seconds):
+        with self._lock:
+            self._until = max(self._until, time.monotonic() + seconds)
+
+    def remaining(self):
+        with self._lock:
+            return max(0.0, self._until - time.monotonic())
+
+    def wait(self):
+        delay = self.remaining()
+        while delay > 0:
+            time.sleep(delay)
+            delay = self.remaining()
+
+
+cooldown = Cooldown()
+
+
+def parse_retry_after(value):
+    """Return the delay in seconds given by a Retry-After header, or None"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def backoff_delay(attempt, policy=DEFAULT_POLICY, retry_after=None):
+    """Delay before retry number `attempt`, honoring Retry-After when given"""
+    import random
+
+    if retry_after is not None:
+        return retry_after
+    # Full jitter, so throttled threads do not retry in lockstep
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * 2**attempt))
+
+
+def send(request, policy=DEFAULT_POLICY):
+    """
+    Call `request()` until it is not throttled, the policy gives up, or
+    the deadline would be exceeded. Returns the last response.
+    """
+    start = time.monotonic()
+    attempt = 0
+    while True:
+        cooldown.wait()
+        response = request()
+        if response.status_code not in RETRY_STATUS:
+            return response
+
+        attempt += 1
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        delay = backoff_delay(attempt - 1, policy, retry_after)
+        elapsed = time.monotonic() - start
+        if attempt >= policy.max_attempts or elapsed + delay > policy.deadline:
+            return response
+
+        # Streamed responses hold their connection until closed
+        response.close()
+        cooldown.extend(delay)
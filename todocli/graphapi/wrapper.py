@@ -4,20 +4,61 @@ https://docs.microsoft.com/en-us/graph/api/resources/todo-overview?view=graph-re
 """
 
 import json
+import os
+import threading
+import time
 from datetime import datetime
 from typing import Union
 
+from todocli.models import snapshot
 from todocli.models.todolist import TodoList
 from todocli.models.todotask import Task, TaskStatus
 from todocli.graphapi.oauth import get_oauth_session
+from todocli.graphapi import cache, throttle
 
 from todocli.utils.datetime_util import datetime_to_api_timestamp
+from todocli.utils.json_stream import ValueStream
 
-BASE_API = "https://graph.microsoft.com/v1.0"
+# Can point to a local stand-in for Graph, e.g. for benchmarks
+BASE_API = os.environ.get("TOD0_GRAPH_URL", "https://graph.microsoft.com/v1.0")
 BASE_RELATE_URL = "/me/todo/lists"
 BASE_URL = f"{BASE_API}{BASE_RELATE_URL}"
 BATCH_URL = f"{BASE_API}/$batch"
 
+# Bytes read at a time when parsing a streamed response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Properties fetched for each named field set, None fetches all of them
+TASK_FIELD_SETS = {
+    "titles": ("id", "title"),
+    "tui": (
+        "id",
+        "title",
+        "status",
+        "importance",
+        "isReminderOn",
+        "createdDateTime",
+        "dueDateTime",
+        "reminderDateTime",
+    ),
+    "due": ("id", "title", "dueDateTime"),
+    "full": None,
+}
+LIST_FIELD_SETS = {
+    "names": ("id", "displayName"),
+    "full": None,
+}
+
+# Graph accepts at most 20 requests in a single $batch
+BATCH_SIZE = 20
+# Number of $batch requests sent at the same time
+BATCH_WORKERS = 4
+# Number of times failed items of a batch are sent again
+BATCH_RETRIES = 3
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Status given to an item whose dependency failed
+FAILED_DEPENDENCY = 424
+
 
 class ListNotFound(Exception):
     def __init__(self, list_name):
@@ -41,21 +82,147 @@ class TaskNotFoundByIndex(Exception):
         super(TaskNotFoundByIndex, self).__init__(self.message)
 
 
+class TaskListingOutdated(Exception):
+    def __init__(self, list_name):
+        self.message = (
+            "Task numbers of list '{}' are out of date, "
+            "run 'todocli lst {}' to see the current ones".format(list_name, list_name)
+        )
+        super(TaskListingOutdated, self).__init__(self.message)
+
+
+class NoTasksMatch(Exception):
+    def __init__(self, list_name):
+        self.message = "No task in list '{}' matches the given patterns".format(
+            list_name
+        )
+        super(NoTasksMatch, self).__init__(self.message)
+
+
+class BatchRequestFailed(Exception):
+    def __init__(self, failed_responses):
+        self.failed_responses = failed_responses
+        statuses = sorted({r["status"] for r in failed_responses})
+        self.message = "{} batched request(s) failed with status {}".format(
+            len(failed_responses), ", ".join(map(str, statuses))
+        )
+        super(BatchRequestFailed, self).__init__(self.message)
+
+
 def parse_response(response):
-    return json.loads(response.content.decode())["value"]
+    # json decodes bytes directly, without an intermediate str copy
+    return json.loads(response.content)["value"]
 
 
-def get_lists():
+def iter_pages(url: str):
+    """Yield each page of a collection, following @odata.nextLink"""
+    session = get_oauth_session()
+    while url is not None:
+        response = session.get(url)
+        response.raise_for_status()
+        page = json.loads(response.content)
+        yield page
+        url = page.get("@odata.nextLink")
+
+
+def iter_values(url: str, limit: int | None = None):
+    """
+    Yield the raw items of a collection across all of its pages.
+    Each page is parsed while it downloads, so items are yielded before
+    the rest of the page has arrived.
+    """
     session = get_oauth_session()
-    response = session.get(BASE_URL)
-    response_value = parse_response(response)
-    return [TodoList(x) for x in response_value]
+    count = 0
+    while url is not None:
+        response = session.get(url, stream=True)
+        try:
+            response.raise_for_status()
+            page = ValueStream(response.iter_content(STREAM_CHUNK_SIZE))
+            for item in page:
+                if limit is not None and count >= limit:
+                    return
+                yield item
+                count += 1
+        finally:
+            response.close()
+        url = page.members.get("@odata.nextLink")
+
+
+def page_query(page_size: int | None, limit: int | None):
+    """Build the $top parameter for a paged request"""
+    if limit is not None:
+        page_size = limit if page_size is None else min(page_size, limit)
+    return "" if page_size is None else f"$top={page_size}"
+
+
+def select_query(field_sets: dict, fields: str):
+    """Build the $select parameter for a named field set"""
+    if fields not in field_sets:
+        raise ValueError(
+            "Unknown field set '{}', expected one of: {}".format(
+                fields, ", ".join(field_sets)
+            )
+        )
+    properties = field_sets[fields]
+    return "" if properties is None else "$select=" + ",".join(properties)
+
+
+def with_query(endpoint: str, *params: str):
+    query = "&".join(p for p in params if p)
+    if not query:
+        return endpoint
+    return f"{endpoint}{'&' if '?' in endpoint else '?'}{query}"
+
+
+def lists_endpoint(
+    page_size: int | None = None, limit: int | None = None, fields: str = "full"
+):
+    return with_query(
+        BASE_URL,
+        page_query(page_size, limit),
+        select_query(LIST_FIELD_SETS, fields),
+    )
+
+
+def iter_lists(
+    page_size: int | None = None, limit: int | None = None, fields: str = "full"
+):
+    for x in iter_values(lists_endpoint(page_size, limit, fields), limit):
+        yield TodoList(x)
+
+
+def get_lists(
+    page_size: int | None = None, limit: int | None = None, fields: str = "full"
+):
+    return list(iter_lists(page_size, limit, fields))
+
+
+def get_cached_list_id(list_name: str):
+    """Like get_list_id_by_name, but resolved from the local cache when possible"""
+    with get_lists_snapshot() as lists:
+        list_id = lists.id_of(list_name)
+    return list_id if list_id is not None else get_list_id_by_name(list_name)
+
+
+def get_lists_snapshot():
+    """The lists as a Snapshot, served from the local cache when possible"""
+    return cache.get_snapshot(
+        cache.LISTS_KEY, lambda: list(iter_values(BASE_URL)), snapshot.LISTS
+    )
+
+
+def get_cached_lists():
+    """Like get_lists, but served from the local cache when possible"""
+    with get_lists_snapshot() as lists:
+        return lists.lists()
 
 
 def create_list(title: str):
     request_body = {"displayName": title}
     session = get_oauth_session()
     response = session.post(BASE_URL, json=request_body)
+    cache.invalidate(cache.LISTS_KEY)
+    invalidate_list_ids()
     return True if response.ok else response.raise_for_status()
 
 
@@ -65,10 +232,22 @@ def rename_list(old_title: str, new_title: str):
     request_body = {"title": new_title}
     session = get_oauth_session()
     response = session.patch(f"{BASE_URL}/{list_id}", json=request_body)
+    cache.invalidate(cache.LISTS_KEY)
+    invalidate_list_ids()
     return True if response.ok else response.raise_for_status()
 
 
-def get_tasks(list_name: str = None, list_id: str = None, num_tasks: int = 100):
+def iter_tasks(
+    list_name: str = None,
+    list_id: str = None,
+    page_size: int | None = 100,
+    limit: int | None = None,
+    fields: str = "full",
+):
+    """
+    Yield the open tasks of a list page by page as they arrive.
+    `fields` names an entry of TASK_FIELD_SETS to limit the properties fetched.
+    """
     assert (list_name is not None) or (
         list_id is not None
     ), "You must provide list_name or list_id"
@@ -77,13 +256,104 @@ def get_tasks(list_name: str = None, list_id: str = None, num_tasks: int = 100):
     if list_id is None:
         list_id = get_list_id_by_name(list_name)
 
-    endpoint = (
-        f"{BASE_URL}/{list_id}/tasks?$filter=status ne 'completed'&$top={num_tasks}"
+    endpoint = tasks_endpoint(list_id, page_size, limit, fields)
+    for x in iter_values(endpoint, limit):
+        yield Task(x)
+
+
+def tasks_endpoint(
+    list_id: str,
+    page_size: int | None = 100,
+    limit: int | None = None,
+    fields: str = "full",
+):
+    return with_query(
+        f"{BASE_URL}/{list_id}/tasks?$filter=status ne 'completed'",
+        page_query(page_size, limit),
+        select_query(TASK_FIELD_SETS, fields),
     )
-    session = get_oauth_session()
-    response = session.get(endpoint)
-    response_value = parse_response(response)
-    return [Task(x) for x in response_value]
+
+
+def get_tasks(
+    list_name: str = None,
+    list_id: str = None,
+    num_tasks: int | None = None,
+    page_size: int | None = 100,
+    fields: str = "full",
+):
+    tasks = iter_tasks(
+        list_name, list_id, page_size=page_size, limit=num_tasks, fields=fields
+    )
+    return list(tasks)
+
+
+def get_tasks_snapshot(
+    list_name: str = None, list_id: str = None, fields: str = "full"
+):
+    """The tasks as a Snapshot, served from the local cache when possible"""
+    assert (list_name is not None) or (
+        list_id is not None
+    ), "You must provide list_name or list_id"
+
+    if list_id is None:
+        list_id = get_cached_list_id(list_name)
+
+    endpoint = tasks_endpoint(list_id, fields=fields)
+    return cache.get_snapshot(
+        cache.tasks_key(list_id, fields),
+        lambda: list(iter_values(endpoint)),
+        snapshot.TASKS,
+    )
+
+
+def fetch_tasks_of_lists(list_ids: list, fields: str = "full"):
+    """
+    Raw open tasks of several lists by list id. The pages of all lists
+    are requested through $batch, one page of every list at a time, so
+    many lists take about as long as the longest of them.
+    """
+    tasks = {list_id: [] for list_id in list_ids}
+    urls = {list_id: tasks_endpoint(list_id, fields=fields) for list_id in list_ids}
+    while urls:
+        requests = [batch_request("GET", url[len(BASE_API) :]) for url in urls.values()]
+        responses = execute_batch(requests)
+        raise_for_batch(responses)
+
+        next_urls = {}
+        for list_id, response in zip(urls, responses):
+            tasks[list_id] += response["body"]["value"]
+            next_url = response["body"].get("@odata.nextLink")
+            if next_url is not None:
+                next_urls[list_id] = next_url
+        urls = next_urls
+    return tasks
+
+
+def get_all_tasks_snapshots(fields: str = "titles"):
+    """
+    The tasks of every list as (list id, list name, Snapshot) tuples, in
+    the order of the lists. Served from the local cache when possible,
+    the other lists are fetched together. Close the snapshots when done.
+    """
+    with get_lists_snapshot() as lists:
+        entries = list(zip(lists.ids(), lists.titles()))
+    list_ids = {cache.tasks_key(list_id, fields): list_id for list_id, _ in entries}
+
+    def fetch_many(keys):
+        tasks = fetch_tasks_of_lists([list_ids[key] for key in keys], fields)
+        return {key: tasks[list_ids[key]] for key in keys}
+
+    snapshots = cache.get_snapshots(list(list_ids), fetch_many, snapshot.TASKS)
+    return [
+        (list_id, list_name, tasks)
+        for (list_id, list_name), tasks in zip(entries, snapshots)
+    ]
+
+
+def get_cached_tasks(list_name: str = None, list_id: str = None, fields: str = "full"):
+    """Like get_tasks, but served from the local cache when possible"""
+    with get_tasks_snapshot(list_name, list_id, fields) as tasks:
+        return tasks.tasks()
 
 
 def create_task(
@@ -102,20 +372,30 @@ def create_task(
     if list_id is None:
         list_id = get_list_id_by_name(list_name)
 
+    endpoint = f"{BASE_URL}/{list_id}/tasks"
+    request_body = task_body(task_name, reminder_datetime, due_datetime, recurrence)
+    session = get_oauth_session()
+    response = session.post(endpoint, json=request_body)
+    cache.invalidate(cache.tasks_key(list_id))
+    return True if response.ok else response.raise_for_status()
+
+
+def task_body(
+    task_name: str,
+    reminder_datetime: datetime | None = None,
+    due_datetime: datetime | None = None,
+    recurrence: dict | None = None,
+):
     # The Graph API requires dueDateTime when recurrence is set
     if due_datetime is None and recurrence is not None:
         due_datetime = datetime.now()
 
-    endpoint = f"{BASE_URL}/{list_id}/tasks"
-    request_body = {
+    return {
         "title": task_name,
         "reminderDateTime": datetime_to_api_timestamp(reminder_datetime),
         "dueDateTime": datetime_to_api_timestamp(due_datetime),
         "recurrence": recurrence,
     }
-    session = get_oauth_session()
-    response = session.post(endpoint, json=request_body)
-    return True if response.ok else response.raise_for_status()
 
 
 def complete_task(
@@ -135,76 +415,430 @@ def complete_task(
     if list_id is None:
         list_id = get_list_id_by_name(list_name)
     if task_id is None:
-        task_id = get_task_id_by_name(list_name, task_name)
+        task_id = get_task_id_by_name(list_name, task_name, list_id=list_id)
 
     endpoint = f"{BASE_URL}/{list_id}/tasks/{task_id}"
-    request_body = {
-        "status": TaskStatus.COMPLETED,
-        "completedDateTime": datetime_to_api_timestamp(datetime.now()),
-    }
+    request_body = complete_body()
     session = get_oauth_session()
     response = session.patch(endpoint, json=request_body)
+    cache.invalidate(cache.tasks_key(list_id))
+    invalidate_task_ids(list_id)
     return True if response.ok else response.raise_for_status()
 
 
 def complete_tasks(list_id, task_ids=None):
     if task_ids is None:
         task_ids = []
-    body = {"requests": []}
-    for task_id in task_ids:
-        body["requests"].append(
-            {
-                "id": task_id,
-                "method": "PATCH",
-                "url": f"{BASE_RELATE_URL}/{list_id}/tasks/{task_id}",
-                "headers": {"Content-Type": "application/json"},
-                "body": {
-                    "status": TaskStatus.COMPLETED,
-                    "completedDateTime": datetime_to_api_timestamp(datetime.now()),
-                },
-            }
-        )
-    session = get_oauth_session()
-    response = session.post(BATCH_URL, json=body)
-    return True if response.ok else response.raise_for_status()
+    return update_tasks(list_id, {task_id: complete_body() for task_id in task_ids})
+
 
+def complete_body():
+    return {
+        "status": TaskStatus.COMPLETED,
+        "completedDateTime": datetime_to_api_timestamp(datetime.now()),
+    }
 
-def remove_task(list_name: str, task_name: Union[str, int]):
-    list_id = get_list_id_by_name(list_name)
-    task_id = get_task_id_by_name(list_name, task_name)
+
+def create_tasks(list_id: str, task_bodies: list):
+    """Create many tasks in one list; bodies are built with task_body()"""
+    requests = [
+        batch_request("POST", f"{BASE_RELATE_URL}/{list_id}/tasks", body)
+        for body in task_bodies
+    ]
+    responses = execute_batch(requests)
+    cache.invalidate(cache.tasks_key(list_id))
+    raise_for_batch(responses)
+    return True
+
+
+def update_tasks(list_id: str, task_bodies: dict):
+    """PATCH many tasks of one list, `task_bodies` maps task id to body"""
+    requests = [
+        batch_request("PATCH", f"{BASE_RELATE_URL}/{list_id}/tasks/{task_id}", body)
+        for task_id, body in task_bodies.items()
+    ]
+    responses = execute_batch(requests)
+    cache.invalidate(cache.tasks_key(list_id))
+    invalidate_task_ids(list_id)
+    raise_for_batch(responses)
+    return True
+
+
+def remove_tasks(list_id: str, task_ids: list):
+    requests = [
+        batch_request("DELETE", f"{BASE_RELATE_URL}/{list_id}/tasks/{task_id}")
+        for task_id in task_ids
+    ]
+    responses = execute_batch(requests)
+    cache.invalidate(cache.tasks_key(list_id))
+    invalidate_task_ids(list_id)
+    raise_for_batch(responses)
+    return True
+
+
+def remove_task(
+    list_name: str = None,
+    task_name: Union[str, int] = None,
+    list_id: str = None,
+    task_id: str = None,
+):
+    assert (list_name is not None) or (
+        list_id is not None
+    ), "You must provide list_name or list_id"
+    assert (task_name is not None) or (
+        task_id is not None
+    ), "You must provide task_name or task_id"
+
+    if list_id is None:
+        list_id = get_list_id_by_name(list_name)
+    if task_id is None:
+        task_id = get_task_id_by_name(list_name, task_name, list_id=list_id)
     endpoint = f"{BASE_URL}/{list_id}/tasks/{task_id}"
     session = get_oauth_session()
     response = session.delete(endpoint)
+    cache.invalidate(cache.tasks_key(list_id))
+    invalidate_task_ids(list_id)
     return True if response.ok else response.raise_for_status()
 
 
+class IdCache:
+    """Name to ID lookups that expire after `ttl` seconds"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+
+    def invalidate(self, match=None):
+        """Drop all entries, or those whose key satisfies `match`"""
+        with self.lock:
+            if match is None:
+                self.entries.clear()
+            else:
+                for key in [k for k in self.entries if match(k)]:
+                    del self.entries[key]
+
+
+# Seconds for which resolved IDs are reused
+RESOLVER_TTL = 60
+
+list_ids = IdCache(RESOLVER_TTL)
+task_ids = IdCache(RESOLVER_TTL)
+
+
+def invalidate_list_ids():
+    list_ids.invalidate()
+    task_ids.invalidate()
+
+
+def invalidate_task_ids(list_id: str):
+    task_ids.invalidate(lambda key: key[0] == list_id)
+
+
+def find_list_id(names: dict, list_name: str):
+    if list_name in names:
+        return names[list_name]
+    # Fall back to prefix matching, as earlier versions did
+    for name, list_id in names.items():
+        if name.startswith(list_name):
+            return list_id
+    return None
+
+
+def load_list_ids():
+    """Resolve every list from one snapshot so later lookups are free"""
+    names = {}
+    for x in iter_values(lists_endpoint(fields="names")):
+        names.setdefault(x["displayName"], x["id"])
+    list_ids.set("names", names)
+    return names
+
+
 def get_list_id_by_name(list_name):
-    endpoint = f"{BASE_URL}?$filter=startswith(displayName,'{list_name}')"
-    session = get_oauth_session()
-    response = session.get(endpoint)
-    response_value = parse_response(response)
-    try:
-        return response_value[0]["id"]
-    except IndexError:
+    names = list_ids.get("names")
+    if names is not None:
+        list_id = find_list_id(names, list_name)
+        if list_id is not None:
+            return list_id
+
+    names = load_list_ids()
+    list_id = find_list_id(names, list_name)
+    if list_id is None:
         raise ListNotFound(list_name)
+    return list_id
+
+
+def get_task_titles(list_id: str):
+    """Ids and titles of the open tasks of a list, in the order `lst` shows them"""
+    return list(iter_values(tasks_endpoint(list_id, fields="titles")))
+
+
+def find_task_id(tasks: list, list_name: str, task_name: str):
+    """Id of the first task of `tasks` with the title `task_name`"""
+    for task in tasks:
+        if task.get("title") == task_name:
+            return task["id"]
+    raise TaskNotFoundByName(task_name, list_name)
+
+
+def select_task_ids(tasks: list, list_name: str, names=(), patterns=()):
+    """
+    Ids of the tasks given by title, then of those whose title
+    matches one of `patterns` (compiled regular expressions), without
+    duplicates. Matching is done locally, against `tasks`.
+    """
+    selected = [find_task_id(tasks, list_name, name) for name in names]
+    if patterns:
+        matched = [
+            t["id"]
+            for t in tasks
+            if t.get("title") is not None
+            and any(p.search(t["title"]) for p in patterns)
+        ]
+        if not matched:
+            raise NoTasksMatch(list_name)
+        selected += matched
+    return list(dict.fromkeys(selected))
+
+
+# Seconds for which task numbers shown by `lst` can be used
+LISTING_MAX_AGE = 15 * 60
+
+
+def save_task_listing(list_id: str, tasks: snapshot.Snapshot):
+    """Keep the tasks shown by `lst`, task numbers refer to their order"""
+    try:
+        snapshot.write(cache.snapshot_path(cache.listing_key(list_id)), tasks.buffer[:])
+    except OSError:
+        pass
+
+
+def get_task_id_by_index(list_name: str, task_index: int, list_id: str):
+    """
+    Id of the task shown at `task_index` by the last `lst` of the list,
+    read locally. Writes to the list remove the listing, and so does a
+    refresh of the cached tasks that finds them changed.
+    """
+    key = cache.listing_key(list_id)
+    listing = cache.open_snapshot(key, snapshot.TASKS)
+    if listing is None:
+        raise TaskListingOutdated(list_name)
+    with listing:
+        ids = listing.ids()
+    try:
+        listed_at = os.stat(cache.snapshot_path(key)).st_mtime
+    except OSError:
+        raise TaskListingOutdated(list_name)
+    if time.time() - listed_at > LISTING_MAX_AGE:
+        raise TaskListingOutdated(list_name)
+
+    current = cache.open_snapshot(cache.tasks_key(list_id, "titles"), snapshot.TASKS)
+    if current is not None:
+        with current:
+            if current.updated_at > listed_at and current.ids() != ids:
+                raise TaskListingOutdated(list_name)
+
+    if not 0 <= task_index < len(ids):
+        raise TaskNotFoundByIndex(task_index, list_name)
+    return ids[task_index]
 
 
-def get_task_id_by_name(list_name: str, task_name: str):
+def get_task_id_by_name(list_name: str, task_name: str, list_id: str = None):
     if isinstance(task_name, str):
-        try:
+        if list_id is None:
             list_id = get_list_id_by_name(list_name)
-            endpoint = f"{BASE_URL}/{list_id}/tasks?$filter=title eq '{task_name}'"
-            session = get_oauth_session()
-            response = session.get(endpoint)
-            response_value = parse_response(response)
-            return [Task(x) for x in response_value][0].id
+        task_id = task_ids.get((list_id, task_name))
+        if task_id is not None:
+            return task_id
+
+        endpoint = f"{BASE_URL}/{list_id}/tasks?$filter=title eq '{task_name}'"
+        session = get_oauth_session()
+        response = session.get(endpoint)
+        response_value = parse_response(response)
+        try:
+            task_id = [Task(x) for x in response_value][0].id
         except IndexError:
             raise TaskNotFoundByName(task_name, list_name)
-    # elif isinstance(task_name, int):
-    #    tasks = get_tasks(list_name, task_list_position + 1)
-    #    try:
-    #        return tasks[task_list_position].id
-    #    except IndexError:
-    #        raise TaskNotFoundByIndex(task_list_position, list_name)
+        task_ids.set((list_id, task_name), task_id)
+        return task_id
+    elif isinstance(task_name, int):
+        if list_id is None:
+            list_id = get_list_id_by_name(list_name)
+        return get_task_id_by_index(list_name, task_name, list_id)
     else:
-        raise
+        raise TypeError(f"Task name must be str or int, not {type(task_name)}")
+
+
+def batch_request(
+    method: str,
+    url: str,
+    body: dict | None = None,
+    depends_on: list | None = None,
+    request_id: str | None = None,
+):
+    """
+    Build one item of a $batch request, `url` is relative to the API root
+    (e.g. '/me/todo/lists'). Ids are assigned by execute_batch when omitted.
+    """
+    request = {"id": request_id, "method": method, "url": url}
+    if body is not None:
+        request["body"] = body
+        request["headers"] = {"Content-Type": "application/json"}
+    if depends_on:
+        request["dependsOn"] = list(depends_on)
+    return request
+
+
+def chunk_batch(requests: list, size: int = BATCH_SIZE):
+    """
+    Split requests into chunks of at most `size`, keeping every request in
+    the same chunk as the requests it depends on
+    """
+    # Group requests connected through dependsOn
+    group_of = {}
+    groups = []
+    for request in requests:
+        group = None
+        for dep in request.get("dependsOn", []):
+            dep_group = group_of.get(dep)
+            if dep_group is None:
+                continue
+            if group is None:
+                group = dep_group
+            elif dep_group is not group:
+                group.extend(dep_group)
+                for r in dep_group:
+                    group_of[r["id"]] = group
+                groups.remove(dep_group)
+        if group is None:
+            group = []
+            groups.append(group)
+        group.append(request)
+        group_of[request["id"]] = group
+
+    chunks = []
+    for group in groups:
+        if len(group) > size:
+            raise ValueError(
+                "{} requests depend on each other, a batch holds at most {}".format(
+                    len(group), size
+                )
+            )
+        if not chunks or len(chunks[-1]) + len(group) > size:
+            chunks.append([])
+        chunks[-1].extend(group)
+    return chunks
+
+
+def send_batch(chunk: list):
+    """Send one $batch request, returns sub-responses by id"""
+    session = get_oauth_session()
+    response = session.post(BATCH_URL, json={"requests": chunk})
+    if not response.ok:
+        # The whole envelope failed, report it for every item
+        return {
+            r["id"]: {"id": r["id"], "status": response.status_code, "headers": {}}
+            for r in chunk
+        }
+    return {r["id"]: r for r in response.json()["responses"]}
+
+
+def is_throttled(response: dict):
+    return response["status"] in throttle.RETRY_STATUS or "Retry-After" in response.get(
+        "headers", {}
+    )
+
+
+def retry_delay(responses: list, attempt: int):
+    delays = [
+        throttle.parse_retry_after(r.get("headers", {}).get("Retry-After"))
+        for r in responses
+    ]
+    delays = [d for d in delays if d is not None]
+    return max(delays) if delays else throttle.backoff_delay(attempt)
+
+
+def execute_batch(
+    requests: list,
+    max_workers: int = BATCH_WORKERS,
+    max_retries: int = BATCH_RETRIES,
+):
+    """
+    Execute requests built with batch_request() through $batch.
+
+    Requests are sent in chunks of BATCH_SIZE, several chunks at a time.
+    Items that fail with a retryable status (and items that failed only
+    because they depend on one of them) are sent again up to `max_retries`
+    times. Returns the sub-responses in the same order as `requests`.
+    """
+    from concurrent import futures
+
+    requests = [dict(r) for r in requests]
+    for idx, request in enumerate(requests):
+        if request["id"] is None:
+            request["id"] = str(idx)
+
+    by_id = {r["id"]: r for r in requests}
+    order = {request_id: idx for idx, request_id in enumerate(by_id)}
+    results = {}
+    pending = requests
+    attempt = 0
+    while pending:
+        chunks = chunk_batch(pending)
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for responses in executor.map(send_batch, chunks):
+                results.update(responses)
+
+        if attempt >= max_retries:
+            break
+
+        retry_ids = set()
+        for request in pending:
+            status = results[request["id"]]["status"]
+            if status in RETRYABLE_STATUS:
+                retry_ids.add(request["id"])
+            elif status == FAILED_DEPENDENCY and any(
+                dep in retry_ids for dep in request.get("dependsOn", [])
+            ):
+                retry_ids.add(request["id"])
+        if not retry_ids:
+            break
+
+        retried = [results[i] for i in retry_ids]
+        delay = retry_delay(retried, attempt)
+        if any(is_throttled(r) for r in retried):
+            # Throttled items slow down every request, not only this batch
+            throttle.cooldown.extend(delay)
+        else:
+            # A server error only concerns the requests that got it
+            time.sleep(delay)
+        attempt += 1
+
+        # Dependencies that already succeeded are no longer part of the batch
+        pending = []
+        for request_id in sorted(retry_ids, key=order.get):
+            request = dict(by_id[request_id])
+            if "dependsOn" in request:
+                request["dependsOn"] = [
+                    d for d in request["dependsOn"] if d in retry_ids
+                ]
+            pending.append(request)
+
+    return [results[r["id"]] for r in requests]
+
+
+def raise_for_batch(responses: list):
+    failed = [r for r in responses if r["status"] >= 400]
+    if failed:
+        raise BatchRequestFailed(failed)
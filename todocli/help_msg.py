@@ -10,6 +10,8 @@ SYNOPSIS
 
         lst <list_name>     Display all tasks from list
             list_name       Name of the list
+            -a, --all       Display the tasks of every list, grouped by list
+            --by-due        With --all, display the tasks of all lists sorted by due date
 
         new <task> [-r time]
                             Create a new task
@@ -38,7 +40,8 @@ Specifying a task:
     list_name/task_number
 
     If 'list_name' is omitted, the default task list will be used. 
-    'task_number' is the position displayed when specifying option '-n'. 
+    'task_number' is the number shown for the task by the last 'lst' of the list.
+    Numbers can be used for 15 minutes, and until the list is changed.
 
 Specifying time:
     For options which take 'time' as a parameter, 'time' can be one of the following:
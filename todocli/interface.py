@@ -87,11 +87,12 @@ class Tod0GUI:
     is_waiting_prompt = False
 
     def __init__(self):
-        # Check for updates
-        update_checker.check()
+        # Check for updates in the background, reported once the UI exits
+        update_checker.start()
 
         # Check if user is authenticated
         oauth.get_token()
+        oauth.start_background_refresh()
 
         # Tracking where focus is
         self.list_focus_idx = 0
@@ -140,6 +141,7 @@ class Tod0GUI:
             pass
 
         self.application.run()
+        update_checker.notify()
 
     def create_layout(self):
         body = VSplit(
@@ -179,7 +181,7 @@ class Tod0GUI:
 
         # Retrieve folder data
         with yaspin(text="Loading lists") as sp:
-            self.lists = wrapper.get_lists()
+            self.lists = wrapper.get_cached_lists()
 
         # Layout interface
         self.left_window.content.children = [
@@ -201,12 +203,12 @@ class Tod0GUI:
         selected_list = self.lists[self.list_focus_idx]
 
         with yaspin(text="Loading tasks") as sp:
-            self.tasks = wrapper.get_tasks(list_id=selected_list.id, num_tasks=100)
-            self.tasks.sort(
-                key=lambda x: x.reminder_datetime
-                or x.due_datetime
-                or x.created_datetime
-            )
+            with wrapper.get_tasks_snapshot(
+                list_id=selected_list.id, fields="tui"
+            ) as tasks:
+                # By reminder, due or creation time, tasks without any come last
+                order = tasks.table().order("when")
+                self.tasks = [tasks.task(i) for i in order]
 
         self.tasks_ui.clear()
         for idx, t in enumerate(self.tasks):
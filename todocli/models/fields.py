@@ -0,0 +1,3 @@
+def optional(convert, value):
+    """Convert a property that may be missing from a $select projection"""
+    return None if value is None else convert(value)
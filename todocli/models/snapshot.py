@@ -0,0 +1,261 @@
+"""
+Binary snapshot of a collection of lists or tasks, read through mmap.
+
+A snapshot holds one fixed-width record per item followed by a pool of
+UTF-8 strings. Records refer to their strings by (offset, length) in
+the pool, so a single title or id is read without parsing the others,
+and reading a collection never goes through JSON. Each record also
+keeps the payload received from the API, to build the full model.
+
+    header   magic, version, kind, count, record size, pool size, updated_at
+    records  count * record size bytes
+    pool     pool size bytes
+
+Integers are little-endian. Timestamps are POSIX seconds, NaN when
+unset. Status, importance and well-known list name are the codes used
+by TaskTable, MISSING when unknown.
+"""
+
+import json
+import mmap
+import struct
+import time
+
+from todocli.models.tasktable import (
+    IMPORTANCE_CODES,
+    MISSING,
+    STATUS_CODES,
+    TIMESTAMP_COLUMNS,
+    TaskTable,
+)
+from todocli.models.todolist import TodoList
+from todocli.models.todotask import Task
+from todocli.utils.atomic_file import write_atomic
+from todocli.utils.datetime_util import api_timestamp_to_epoch
+
+MAGIC = b"TD0S"
+SNAPSHOT_VERSION = 1
+
+LISTS = 1
+TASKS = 2
+
+HEADER = struct.Struct("<4sHHIIId")
+# id, title and payload as (offset, length) in the string pool
+STRINGS = "3I3I"
+NUMBER_OF_STRINGS = 3
+LIST_RECORD = struct.Struct(f"<{STRINGS}bbbx")
+TASK_RECORD = struct.Struct(f"<{STRINGS}bb2x{len(TIMESTAMP_COLUMNS)}d")
+RECORDS = {LISTS: LIST_RECORD, TASKS: TASK_RECORD}
+
+# Length of a string that is not set
+NONE = 0xFFFFFFFF
+
+WELL_KNOWN_LIST_NAMES = tuple(TodoList.WellKnownListName)
+WELL_KNOWN_LIST_CODES = {x.value: i for i, x in enumerate(WELL_KNOWN_LIST_NAMES)}
+
+
+class InvalidSnapshot(Exception):
+    def __init__(self, reason):
+        self.message = f"Invalid snapshot: {reason}"
+        super(InvalidSnapshot, self).__init__(self.message)
+
+
+def flag(value):
+    return MISSING if value is None else int(bool(value))
+
+
+def list_fields(payload):
+    return (
+        flag(payload.get("isOwner")),
+        flag(payload.get("isShared")),
+        WELL_KNOWN_LIST_CODES.get(payload.get("wellknownListName"), MISSING),
+    )
+
+
+def task_fields(payload):
+    return (
+        STATUS_CODES.get(payload.get("status"), MISSING),
+        IMPORTANCE_CODES.get(payload.get("importance"), MISSING),
+        *(
+            api_timestamp_to_epoch(payload.get(key))
+            for key, _ in TIMESTAMP_COLUMNS.values()
+        ),
+    )
+
+
+def build(kind, items, updated_at=None):
+    """
+    Snapshot bytes of `items`: payloads as returned by the API, or
+    TodoList / Task objects created with keep_raw=True
+    """
+    record = RECORDS[kind]
+    fields = list_fields if kind == LISTS else task_fields
+    title_key = "displayName" if kind == LISTS else "title"
+
+    records = bytearray()
+    pool = bytearray()
+
+    def add_string(value):
+        if value is None:
+            return 0, NONE
+        data = value.encode()
+        offset = len(pool)
+        pool.extend(data)
+        return offset, len(data)
+
+    count = 0
+    for item in items:
+        payload = item.raw if isinstance(item, (TodoList, Task)) else item
+        if payload is None:
+            raise ValueError("Models need keep_raw=True to be snapshotted")
+        strings = (
+            payload["id"],
+            payload.get(title_key),
+            json.dumps(payload, separators=(",", ":")),
+        )
+        refs = [x for value in strings for x in add_string(value)]
+        # Offsets first, then lengths, as laid out by STRINGS
+        records.extend(record.pack(*refs[0::2], *refs[1::2], *fields(payload)))
+        count += 1
+
+    header = HEADER.pack(
+        MAGIC,
+        SNAPSHOT_VERSION,
+        kind,
+        count,
+        record.size,
+        len(pool),
+        time.time() if updated_at is None else updated_at,
+    )
+    return b"".join((header, records, pool))
+
+
+def write(path, data):
+    # Readers never map a partial file
+    write_atomic(path, data)
+
+
+def open_snapshot(path, kind=None):
+    """Map the snapshot at `path`, raises OSError if there is none"""
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file, mmap refuses to map it
+            raise InvalidSnapshot(f"{path} is empty")
+    try:
+        return Snapshot(buffer, kind)
+    except InvalidSnapshot:
+        buffer.close()
+        raise
+
+
+class Snapshot:
+    """Read access to snapshot bytes, or a snapshot file mapped in memory"""
+
+    def __init__(self, buffer, kind=None):
+        if len(buffer) < HEADER.size:
+            raise InvalidSnapshot("truncated header")
+        magic, version, self.kind, count, record_size, pool_size, updated_at = (
+            HEADER.unpack_from(buffer)
+        )
+        if magic != MAGIC:
+            raise InvalidSnapshot("not a snapshot")
+        # Snapshots are rebuilt from the API, so other versions are not read
+        if version != SNAPSHOT_VERSION:
+            raise InvalidSnapshot(f"version {version}")
+        if kind is not None and self.kind != kind:
+            raise InvalidSnapshot(f"kind {self.kind}, expected {kind}")
+        self.record = RECORDS.get(self.kind)
+        if self.record is None or record_size != self.record.size:
+            raise InvalidSnapshot(f"record size {record_size}")
+        self.pool_offset = HEADER.size + count * record_size
+        if len(buffer) != self.pool_offset + pool_size:
+            raise InvalidSnapshot("truncated data")
+
+        self.buffer = buffer
+        self.count = count
+        self.updated_at = updated_at
+        self._records = None
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def records(self):
+        """All records as tuples, unpacked once"""
+        if self._records is None:
+            # A copy, a view would keep the mapping from being closed
+            data = self.buffer[HEADER.size : self.pool_offset]
+            self._records = list(self.record.iter_unpack(data))
+        return self._records
+
+    def string(self, offset, length):
+        if length == NONE:
+            return None
+        start = self.pool_offset + offset
+        return self.buffer[start : start + length].decode()
+
+    def strings(self, index):
+        """Values of string `index` (0 id, 1 title, 2 payload) of all records"""
+        return [
+            self.string(r[index], r[index + NUMBER_OF_STRINGS]) for r in self.records()
+        ]
+
+    def ids(self):
+        return self.strings(0)
+
+    def titles(self):
+        """Titles of tasks, or display names of lists"""
+        return self.strings(1)
+
+    def id_of(self, title):
+        """Id of the first item with `title`, or None"""
+        data = title.encode()
+        for r in self.records():
+            if r[4] == len(data) and self.string(r[1], r[4]) == title:
+                return self.string(r[0], r[3])
+        return None
+
+    def payload(self, index):
+        r = self.records()[index]
+        return json.loads(self.string(r[2], r[5]))
+
+    def lists(self):
+        return [TodoList(x) for x in map(json.loads, self.strings(2))]
+
+    def task(self, index):
+        return Task(self.payload(index))
+
+    def tasks(self):
+        return [Task(x) for x in map(json.loads, self.strings(2))]
+
+    def table(self, list_id=None, use_numpy=None):
+        """TaskTable of the tasks, built from the records alone"""
+        if self.kind != TASKS:
+            raise InvalidSnapshot("not a snapshot of tasks")
+        records = self.records()
+        first = 2 * NUMBER_OF_STRINGS
+        status, importance, *timestamps = (
+            [r[i] for r in records]
+            for i in range(first, first + 2 + len(TIMESTAMP_COLUMNS))
+        )
+        return TaskTable(
+            self.ids(),
+            self.titles(),
+            status,
+            importance,
+            lists=[] if list_id is None else [list_id],
+            list_codes=[MISSING if list_id is None else 0] * len(records),
+            use_numpy=use_numpy,
+            **dict(zip(TIMESTAMP_COLUMNS, timestamps)),
+        )
@@ -0,0 +1,362 @@
+"""
+Column-oriented collection of tasks, for filtering, sorting and counting
+many tasks without building a Task object per row.
+
+Every property is kept in its own array. Timestamps are POSIX seconds,
+NaN where a task has none. Status, importance and list are small integer
+codes, MISSING where unknown. Columns are array.array, or NumPy arrays
+for large tables when NumPy is installed.
+"""
+
+import importlib.util
+import math
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+
+from todocli.models.todotask import Task, TaskImportance, TaskStatus
+from todocli.utils.datetime_util import api_timestamp_to_epoch
+
+MISSING = -1
+
+STATUSES = tuple(TaskStatus)
+# Ordered by importance, so codes can be compared
+IMPORTANCES = (TaskImportance.LOW, TaskImportance.NORMAL, TaskImportance.HIGH)
+STATUS_CODES = {x.value: i for i, x in enumerate(STATUSES)}
+IMPORTANCE_CODES = {x.value: i for i, x in enumerate(IMPORTANCES)}
+
+TIMESTAMP_COLUMNS = {
+    "due": ("dueDateTime", Task.due_datetime.slot),
+    "reminder": ("reminderDateTime", Task.reminder_datetime.slot),
+    "created": ("createdDateTime", Task.created_datetime.slot),
+}
+CODE_COLUMNS = ("status", "importance", "list")
+# Columns computed from others: the first of them that is set
+DERIVED_COLUMNS = {"when": ("reminder", "due", "created")}
+
+# Below this many rows importing NumPy costs more than it saves
+NUMPY_MIN_ROWS = 10_000
+NUMPY_TYPES = {"b": "int8", "i": "int32", "d": "float64"}
+
+_numpy_available = None
+
+
+def numpy_available():
+    global _numpy_available
+
+    if _numpy_available is None:
+        _numpy_available = importlib.util.find_spec("numpy") is not None
+    return _numpy_available
+
+
+def is_unset(value):
+    # NaN is the only value not equal to itself
+    return value is None or value != value
+
+
+class TaskTable:
+    def __init__(
+        self,
+        ids,
+        titles,
+        status,
+        importance,
+        due,
+        reminder,
+        created,
+        list_codes,
+        lists,
+        use_numpy=None,
+    ):
+        if use_numpy is None:
+            use_numpy = len(ids) >= NUMPY_MIN_ROWS and numpy_available()
+        if use_numpy:
+            import numpy
+
+            self.numpy = numpy
+        else:
+            self.numpy = None
+
+        self.ids = list(ids)
+        self.titles = list(titles)
+        # List id of each code in the list column
+        self.lists = list(lists)
+        self.status = self.column_of("b", status)
+        self.importance = self.column_of("b", importance)
+        self.due = self.column_of("d", due)
+        self.reminder = self.column_of("d", reminder)
+        self.created = self.column_of("d", created)
+        self.list = self.column_of("i", list_codes)
+
+    def column_of(self, typecode, values):
+        if self.numpy is not None:
+            return self.numpy.asarray(values, dtype=NUMPY_TYPES[typecode])
+        if isinstance(values, array) and values.typecode == typecode:
+            return values
+        return array(typecode, values)
+
+    @classmethod
+    def from_payloads(cls, payloads, list_id=None, use_numpy=None):
+        """Build from task payloads as returned by the API"""
+        payloads = list(payloads)
+        timestamps = {
+            name: [api_timestamp_to_epoch(p.get(key)) for p in payloads]
+            for name, (key, _) in TIMESTAMP_COLUMNS.items()
+        }
+        return cls(
+            [p["id"] for p in payloads],
+            [p.get("title") for p in payloads],
+            [STATUS_CODES.get(p.get("status"), MISSING) for p in payloads],
+            [IMPORTANCE_CODES.get(p.get("importance"), MISSING) for p in payloads],
+            lists=[] if list_id is None else [list_id],
+            list_codes=[MISSING if list_id is None else 0] * len(payloads),
+            use_numpy=use_numpy,
+            **timestamps,
+        )
+
+    @classmethod
+    def from_tasks(cls, tasks, list_id=None, use_numpy=None):
+        """Build from Task objects, without decoding their timestamps"""
+        tasks = list(tasks)
+        timestamps = {
+            name: [api_timestamp_to_epoch(getattr(t, slot)) for t in tasks]
+            for name, (_, slot) in TIMESTAMP_COLUMNS.items()
+        }
+        return cls(
+            [t.id for t in tasks],
+            [t.title for t in tasks],
+            [MISSING if t.status is None else STATUSES.index(t.status) for t in tasks],
+            [
+                MISSING if t.importance is None else IMPORTANCES.index(t.importance)
+                for t in tasks
+            ],
+            lists=[] if list_id is None else [list_id],
+            list_codes=[MISSING if list_id is None else 0] * len(tasks),
+            use_numpy=use_numpy,
+            **timestamps,
+        )
+
+    @classmethod
+    def concat(cls, tables, use_numpy=None):
+        """One table holding the rows of all `tables`, e.g. one per list"""
+        tables = list(tables)
+        lists = []
+        list_codes = []
+        for table in tables:
+            codes = []
+            for list_id in table.lists:
+                if list_id not in lists:
+                    lists.append(list_id)
+                codes.append(lists.index(list_id))
+            list_codes += [MISSING if c == MISSING else codes[c] for c in table.list]
+
+        def joined(name):
+            return [x for table in tables for x in getattr(table, name)]
+
+        return cls(
+            joined("ids"),
+            joined("titles"),
+            joined("status"),
+            joined("importance"),
+            joined("due"),
+            joined("reminder"),
+            joined("created"),
+            list_codes,
+            lists,
+            use_numpy,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, index):
+        """Values of one row, with enums and local datetimes"""
+
+        def timestamp(value):
+            return (
+                None if value != value else datetime.fromtimestamp(value).astimezone()
+            )
+
+        status = int(self.status[index])
+        importance = int(self.importance[index])
+        list_code = int(self.list[index])
+        return {
+            "id": self.ids[index],
+            "title": self.titles[index],
+            "status": None if status == MISSING else STATUSES[status],
+            "importance": None if importance == MISSING else IMPORTANCES[importance],
+            "due": timestamp(self.due[index]),
+            "reminder": timestamp(self.reminder[index]),
+            "created": timestamp(self.created[index]),
+            "list_id": None if list_code == MISSING else self.lists[list_code],
+        }
+
+    def column(self, name):
+        if name in DERIVED_COLUMNS:
+            return self.coalesce(*DERIVED_COLUMNS[name])
+        if name == "title":
+            return self.titles
+        if name in TIMESTAMP_COLUMNS or name in CODE_COLUMNS:
+            return getattr(self, name)
+        raise KeyError(f"Unknown column: {name}")
+
+    def coalesce(self, *names):
+        """Timestamp column holding the first of `names` that is set"""
+        columns = [self.column(name) for name in names]
+        if self.numpy is not None:
+            result = columns[0].copy()
+            for column in columns[1:]:
+                missing = self.numpy.isnan(result)
+                result[missing] = column[missing]
+            return result
+
+        result = array("d", columns[0])
+        for column in columns[1:]:
+            for i, value in enumerate(result):
+                if value != value:
+                    result[i] = column[i]
+        return result
+
+    def take(self, indices):
+        """Table with the rows at `indices`, in that order"""
+        if self.numpy is not None:
+            indices = self.numpy.asarray(indices, dtype="int64")
+
+            def pick(column):
+                return column[indices]
+
+        else:
+
+            def pick(column):
+                return [column[i] for i in indices]
+
+        return TaskTable(
+            [self.ids[i] for i in indices],
+            [self.titles[i] for i in indices],
+            pick(self.status),
+            pick(self.importance),
+            pick(self.due),
+            pick(self.reminder),
+            pick(self.created),
+            pick(self.list),
+            self.lists,
+            use_numpy=self.numpy is not None,
+        )
+
+    def where(self, mask):
+        """Table with the rows for which `mask` is true"""
+        if self.numpy is not None:
+            return self.take(self.numpy.flatnonzero(mask))
+        return self.take([i for i, keep in enumerate(mask) if keep])
+
+    # Filters
+
+    def not_completed(self):
+        completed = STATUS_CODES[TaskStatus.COMPLETED.value]
+        if self.numpy is not None:
+            return self.where(self.status != completed)
+        return self.where([s != completed for s in self.status])
+
+    def due_between(self, start: float, end: float):
+        """Tasks due at or after `start` and before `end`, as POSIX timestamps"""
+        if self.numpy is not None:
+            return self.where((self.due >= start) & (self.due < end))
+        # Comparisons with NaN are false, so tasks without due date drop out
+        return self.where([start <= d < end for d in self.due])
+
+    def overdue(self, now: float | None = None):
+        """Tasks not completed and due before `now`"""
+        now = time.time() if now is None else now
+        return self.not_completed().due_between(-math.inf, now)
+
+    def due_this_week(self, now: float | None = None):
+        """Tasks due in the local week, Monday to Sunday, containing `now`"""
+        today = datetime.fromtimestamp(time.time() if now is None else now)
+        monday = (today - timedelta(days=today.weekday())).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        return self.due_between(
+            monday.timestamp(), (monday + timedelta(days=7)).timestamp()
+        )
+
+    def with_importance(self, importance, at_least=False):
+        code = IMPORTANCE_CODES[TaskImportance(importance).value]
+        if self.numpy is not None:
+            mask = self.importance >= code if at_least else self.importance == code
+            return self.where(mask)
+        if at_least:
+            return self.where([x >= code for x in self.importance])
+        return self.where([x == code for x in self.importance])
+
+    def high_importance(self):
+        return self.with_importance(TaskImportance.HIGH)
+
+    # Sorting and aggregation
+
+    def order(self, *keys):
+        """
+        Row indices sorted by the columns named in `keys`, a leading "-"
+        sorts a column in descending order. Missing values come last.
+        """
+        numpy = self.numpy
+        order = list(range(len(self))) if numpy is None else numpy.arange(len(self))
+
+        # Stable sorts from the last key to the first give a multi-key sort
+        for key in reversed(keys):
+            descending = key.startswith("-")
+            name = key.lstrip("-")
+            values = self.column(name)
+            is_missing = MISSING.__eq__ if name in CODE_COLUMNS else is_unset
+
+            if numpy is not None and name != "title":
+                values = values[order].astype("float64")
+                if name in CODE_COLUMNS:
+                    values[values == MISSING] = math.nan
+                # NaN is sorted last either way
+                values = -values if descending else values
+                order = order[numpy.argsort(values, kind="stable")]
+            elif descending:
+                order = sorted(
+                    order,
+                    key=lambda i: (
+                        (False, 0) if is_missing(values[i]) else (True, values[i])
+                    ),
+                    reverse=True,
+                )
+            else:
+                order = sorted(
+                    order,
+                    key=lambda i: (
+                        (True, 0) if is_missing(values[i]) else (False, values[i])
+                    ),
+                )
+            if numpy is not None:
+                order = numpy.asarray(order)
+        return order if numpy is None else order.tolist()
+
+    def sort(self, *keys):
+        return self.take(self.order(*keys))
+
+    def counts(self, column="list"):
+        """Number of rows by list id, TaskStatus or TaskImportance"""
+        labels = {
+            "list": self.lists,
+            "status": STATUSES,
+            "importance": IMPORTANCES,
+        }[column]
+        codes = getattr(self, column)
+
+        if self.numpy is not None:
+            present = codes[codes != MISSING]
+            totals = self.numpy.bincount(present, minlength=len(labels)).tolist()
+            missing = len(codes) - len(present)
+        else:
+            counter = Counter(codes)
+            totals = [counter[i] for i in range(len(labels))]
+            missing = counter[MISSING]
+
+        result = {label: n for label, n in zip(labels, totals) if n}
+        if missing:
+            result[None] = missing
+        return result
@@ -1,17 +1,30 @@
 from enum import Enum
+from todocli.models.fields import optional
 
 
 class TodoList:
+    __slots__ = (
+        "id",
+        "display_name",
+        "is_owner",
+        "is_shared",
+        "well_known_list_name",
+        "raw",
+    )
+
     class WellKnownListName(Enum):
         none = "none"
         DefaultList = "defaultList"
         FlaggedEmails = "flaggedEmails"
 
-    def __init__(self, query_result_list):
+    def __init__(self, query_result_list, keep_raw=False):
+        # Properties missing from a $select projection are set to None
         self.id: str = query_result_list["id"]
-        self.display_name: str = query_result_list["displayName"]
-        self.is_owner = bool(query_result_list["isOwner"])
-        self.is_shared = bool(query_result_list["isShared"])
-        self.well_known_list_name = TodoList.WellKnownListName(
-            query_result_list["wellknownListName"]
+        self.display_name: str = query_result_list.get("displayName")
+        self.is_owner = optional(bool, query_result_list.get("isOwner"))
+        self.is_shared = optional(bool, query_result_list.get("isShared"))
+        self.well_known_list_name = optional(
+            TodoList.WellKnownListName, query_result_list.get("wellknownListName")
         )
+        # The payload as received, e.g. to send it back unchanged
+        self.raw = query_result_list if keep_raw else None
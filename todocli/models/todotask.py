@@ -1,4 +1,5 @@
 from enum import Enum
+from todocli.models.fields import optional
 from todocli.utils.datetime_util import api_timestamp_to_datetime
 
 
@@ -35,44 +36,62 @@ class DayOfWeek(str, Enum):
     SUNDAY = "sunday"
 
 
+class LazyTimestamp:
+    """Datetime attribute decoded from the API value on first access"""
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if isinstance(value, (str, dict)):
+            value = api_timestamp_to_datetime(value)
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+
 class Task:
-    def __init__(self, query_result):
-        self.title = query_result["title"]
+    __slots__ = (
+        "title",
+        "id",
+        "importance",
+        "status",
+        "is_reminder_on",
+        "raw",
+        "_created_datetime",
+        "_completed_datetime",
+        "_due_datetime",
+        "_reminder_datetime",
+        "_last_modified_datetime",
+        "_body_last_modified_datetime",
+    )
+
+    created_datetime = LazyTimestamp("_created_datetime")
+    completed_datetime = LazyTimestamp("_completed_datetime")
+    due_datetime = LazyTimestamp("_due_datetime")
+    reminder_datetime = LazyTimestamp("_reminder_datetime")
+    last_modified_datetime = LazyTimestamp("_last_modified_datetime")
+    body_last_modified_datetime = LazyTimestamp("_body_last_modified_datetime")
+
+    def __init__(self, query_result, keep_raw=False):
+        # Properties missing from a $select projection are set to None
+        self.title = query_result.get("title")
         self.id = query_result["id"]
-        self.importance = TaskImportance(query_result["importance"])
-        self.status = TaskStatus(query_result["status"])
-        self.created_datetime = api_timestamp_to_datetime(
-            query_result["createdDateTime"]
-        )
-
-        if "completedDateTime" in query_result:
-            self.completed_datetime = api_timestamp_to_datetime(
-                query_result["completedDateTime"]
-            )
-        else:
-            self.completed_datetime = None
-
-        self.is_reminder_on: bool = bool(query_result["isReminderOn"])
-
-        if "dueDateTime" in query_result:
-            self.due_datetime = api_timestamp_to_datetime(query_result["dueDateTime"])
-        else:
-            self.due_datetime = None
-
-        if "reminderDateTime" in query_result:
-            self.reminder_datetime = api_timestamp_to_datetime(
-                query_result["reminderDateTime"]
-            )
-        else:
-            self.reminder_datetime = None
-
-        self.last_modified_datetime = api_timestamp_to_datetime(
-            query_result["lastModifiedDateTime"]
-        )
-
-        if "bodyLastModifiedDateTime" in query_result:
-            self.body_last_modified_datetime = api_timestamp_to_datetime(
-                query_result["bodyLastModifiedDateTime"]
-            )
-        else:
-            self.body_last_modified_datetime = None
+        self.importance = optional(TaskImportance, query_result.get("importance"))
+        self.status = optional(TaskStatus, query_result.get("status"))
+        self.is_reminder_on = optional(bool, query_result.get("isReminderOn"))
+        # The payload as received, e.g. to send it back unchanged
+        self.raw = query_result if keep_raw else None
+
+        # Timestamps are only parsed when they are read
+        self._created_datetime = query_result.get("createdDateTime")
+        self._completed_datetime = query_result.get("completedDateTime")
+        self._due_datetime = query_result.get("dueDateTime")
+        self._reminder_datetime = query_result.get("reminderDateTime")
+        self._last_modified_datetime = query_result.get("lastModifiedDateTime")
+        self._body_last_modified_datetime = query_result.get("bodyLastModifiedDateTime")
@@ -0,0 +1,187 @@
+"""
+Interactive session for `todocli -i`.
+
+Commands run in this process one after the other, so the session, the
+token and the resolved names stay warm between them. Lists and the
+titles of the default list are prefetched in the background, and tab
+completion reads them from the local cache without any request.
+"""
+
+import argparse
+import os
+import shlex
+import threading
+import traceback
+
+import requests
+
+from prompt_toolkit.completion import Completer, Completion
+
+from todocli.graphapi import cache, oauth, wrapper
+from todocli.models import snapshot
+
+HISTORY_PATH = os.path.join(oauth.config_dir, "history")
+PROMPT = "todocli> "
+EXIT_COMMANDS = ("exit", "quit")
+DEFAULT_LIST = "Tasks"
+
+# Arguments completed with the names of lists or tasks
+LIST_COMMANDS = ("lst",)
+TASK_COMMANDS = ("complete", "rm")
+LIST_OPTIONS = ("-l", "--list")
+
+
+def command_names(parser):
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            return list(action.choices)
+    return []
+
+
+def cached_list_names():
+    """Names of the cached lists, without any request"""
+    lists = cache.open_snapshot(cache.LISTS_KEY, snapshot.LISTS)
+    if lists is None:
+        return []
+    with lists:
+        return [x for x in lists.titles() if x is not None]
+
+
+def cached_task_titles(list_name):
+    """Titles of the cached open tasks of a list, without any request"""
+    lists = cache.open_snapshot(cache.LISTS_KEY, snapshot.LISTS)
+    if lists is None:
+        return []
+    with lists:
+        list_id = lists.id_of(list_name)
+    if list_id is None:
+        return []
+    tasks = cache.open_snapshot(cache.tasks_key(list_id, "titles"), snapshot.TASKS)
+    if tasks is None:
+        return []
+    with tasks:
+        return [x for x in tasks.titles() if x is not None]
+
+
+class CommandCompleter(Completer):
+    """Completes commands, list names and task titles from the local cache"""
+
+    def __init__(self, commands):
+        self.commands = commands
+
+    def candidates(self, previous, prefix):
+        if not previous:
+            return [x for x in self.commands + list(EXIT_COMMANDS)]
+        if previous[-1] in LIST_OPTIONS or (
+            previous[0] in LIST_COMMANDS and len(previous) == 1
+        ):
+            return cached_list_names()
+        if previous[0] not in TASK_COMMANDS:
+            return []
+
+        if "/" in prefix:
+            list_name = prefix.split("/", 1)[0]
+            return [f"{list_name}/{x}" for x in cached_task_titles(list_name)]
+        for option in LIST_OPTIONS:
+            if option in previous[:-1]:
+                list_name = previous[previous.index(option) + 1]
+                return cached_task_titles(list_name)
+        return cached_task_titles(DEFAULT_LIST) + [f"{x}/" for x in cached_list_names()]
+
+    def get_completions(self, document, complete_event):
+        word = document.get_word_before_cursor(WORD=True)
+        words = document.text_before_cursor.split()
+        previous = words[:-1] if word else words
+        # Typed inside an opening quote
+        prefix = word.lstrip("'\"")
+
+        for candidate in self.candidates(previous, prefix):
+            if candidate.startswith(prefix):
+                text = candidate if candidate.endswith("/") else shlex.quote(candidate)
+                yield Completion(text, start_position=-len(word))
+
+
+class Prefetcher:
+    """Refreshes what commands and completion need, in a background thread"""
+
+    def __init__(self):
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=prefetch, name="prefetch", daemon=True)
+        self.thread.start()
+
+
+def prefetch():
+    try:
+        # Names resolved less than RESOLVER_TTL ago are still used as they are
+        if wrapper.list_ids.get("names") is None:
+            wrapper.load_list_ids()
+        with wrapper.get_lists_snapshot():
+            pass
+        with wrapper.get_tasks_snapshot(list_name=DEFAULT_LIST, fields="titles"):
+            pass
+    except Exception:
+        # Commands load what they need themselves
+        pass
+
+
+def new_session(parser):
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.history import FileHistory
+
+    oauth.ensure_config_dir()
+    return PromptSession(
+        history=FileHistory(HISTORY_PATH),
+        completer=CommandCompleter(command_names(parser)),
+        complete_while_typing=False,
+    )
+
+
+def run(parser, run_command, session=None, warm=True):
+    """
+    Read and run commands until exit, quit or end of input.
+    `run_command(parser, argv)` executes one command.
+    """
+    session = session or new_session(parser)
+    prefetcher = Prefetcher()
+    if warm:
+        # Authenticate in the foreground, later refreshes happen in the background
+        oauth.get_token()
+        oauth.start_background_refresh()
+        prefetcher.start()
+
+    while True:
+        try:
+            line = session.prompt(PROMPT)
+        except KeyboardInterrupt:
+            continue
+        except EOFError:
+            break
+
+        try:
+            argv = shlex.split(line)
+        except ValueError as e:
+            print(e)
+            continue
+        if not argv:
+            continue
+        if argv[0] in EXIT_COMMANDS:
+            break
+
+        try:
+            run_command(parser, argv)
+        except KeyboardInterrupt:
+            print()
+        except SystemExit:
+            # argparse already printed the usage or the error
+            pass
+        except requests.RequestException as e:
+            # e.g. no connection, keep the session for the next command
+            print(e)
+        except Exception:
+            traceback.print_exc()
+        if warm:
+            prefetcher.start()
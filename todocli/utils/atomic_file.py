@@ -0,0 +1,31 @@
+"""
+Files replaced as a whole, so other threads and processes reading them
+never see a partial write.
+"""
+
+import os
+import threading
+
+
+def write_atomic(path, data, mode=None):
+    """
+    Write `data` (bytes or str) to `path` through a temporary file that
+    is renamed over it. `mode` sets the permissions of the new file.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    # Unique per writer, so concurrent writes never share a temporary file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        if mode is not None and os.name == "posix":
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
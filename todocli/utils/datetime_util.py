@@ -1,4 +1,8 @@
+import functools
+import math
 import re
+import sys
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Union
 
@@ -209,26 +213,292 @@ def datetime_to_api_timestamp(dt: datetime | None):
     return api_dt
 
 
-def api_timestamp_to_datetime(api_dt: Union[str, dict]):
-    """Converts the datetime string returned by the API to python datetime object"""
+# timeZone values of dateTimeTimeZone meaning UTC
+UTC_NAMES = {None, "", "UTC", "Etc/UTC", "GMT", "Coordinated Universal Time"}
+# Windows names of time zones, which Graph may use instead of IANA names.
+# This is the "001" territory of the CLDR windowsZones mapping.
+WINDOWS_ZONES = {
+    "Dateline Standard Time": "Etc/GMT+12",
+    "UTC-11": "Etc/GMT+11",
+    "Aleutian Standard Time": "America/Adak",
+    "Hawaiian Standard Time": "Pacific/Honolulu",
+    "Marquesas Standard Time": "Pacific/Marquesas",
+    "Alaskan Standard Time": "America/Anchorage",
+    "UTC-09": "Etc/GMT+9",
+    "Pacific Standard Time (Mexico)": "America/Tijuana",
+    "UTC-08": "Etc/GMT+8",
+    "Pacific Standard Time": "America/Los_Angeles",
+    "US Mountain Standard Time": "America/Phoenix",
+    "Mountain Standard Time (Mexico)": "America/Mazatlan",
+    "Mountain Standard Time": "America/Denver",
+    "Yukon Standard Time": "America/Whitehorse",
+    "Central America Standard Time": "America/Guatemala",
+    "Central Standard Time": "America/Chicago",
+    "Easter Island Standard Time": "Pacific/Easter",
+    "Central Standard Time (Mexico)": "America/Mexico_City",
+    "Canada Central Standard Time": "America/Regina",
+    "SA Pacific Standard Time": "America/Bogota",
+    "Eastern Standard Time (Mexico)": "America/Cancun",
+    "Eastern Standard Time": "America/New_York",
+    "Haiti Standard Time": "America/Port-au-Prince",
+    "Cuba Standard Time": "America/Havana",
+    "US Eastern Standard Time": "America/Indiana/Indianapolis",
+    "Turks And Caicos Standard Time": "America/Grand_Turk",
+    "Paraguay Standard Time": "America/Asuncion",
+    "Atlantic Standard Time": "America/Halifax",
+    "Venezuela Standard Time": "America/Caracas",
+    "Central Brazilian Standard Time": "America/Cuiaba",
+    "SA Western Standard Time": "America/La_Paz",
+    "Pacific SA Standard Time": "America/Santiago",
+    "Newfoundland Standard Time": "America/St_Johns",
+    "Tocantins Standard Time": "America/Araguaina",
+    "E. South America Standard Time": "America/Sao_Paulo",
+    "SA Eastern Standard Time": "America/Cayenne",
+    "Argentina Standard Time": "America/Argentina/Buenos_Aires",
+    "Greenland Standard Time": "America/Nuuk",
+    "Montevideo Standard Time": "America/Montevideo",
+    "Magallanes Standard Time": "America/Punta_Arenas",
+    "Saint Pierre Standard Time": "America/Miquelon",
+    "Bahia Standard Time": "America/Bahia",
+    "UTC-02": "Etc/GMT+2",
+    "Azores Standard Time": "Atlantic/Azores",
+    "Cape Verde Standard Time": "Atlantic/Cape_Verde",
+    "GMT Standard Time": "Europe/London",
+    "Greenwich Standard Time": "Atlantic/Reykjavik",
+    "Sao Tome Standard Time": "Africa/Sao_Tome",
+    "Morocco Standard Time": "Africa/Casablanca",
+    "W. Europe Standard Time": "Europe/Berlin",
+    "Central Europe Standard Time": "Europe/Budapest",
+    "Romance Standard Time": "Europe/Paris",
+    "Central European Standard Time": "Europe/Warsaw",
+    "W. Central Africa Standard Time": "Africa/Lagos",
+    "Jordan Standard Time": "Asia/Amman",
+    "GTB Standard Time": "Europe/Bucharest",
+    "Middle East Standard Time": "Asia/Beirut",
+    "Egypt Standard Time": "Africa/Cairo",
+    "E. Europe Standard Time": "Europe/Chisinau",
+    "Syria Standard Time": "Asia/Damascus",
+    "West Bank Standard Time": "Asia/Hebron",
+    "South Africa Standard Time": "Africa/Johannesburg",
+    "FLE Standard Time": "Europe/Kiev",
+    "Israel Standard Time": "Asia/Jerusalem",
+    "South Sudan Standard Time": "Africa/Juba",
+    "Kaliningrad Standard Time": "Europe/Kaliningrad",
+    "Sudan Standard Time": "Africa/Khartoum",
+    "Libya Standard Time": "Africa/Tripoli",
+    "Namibia Standard Time": "Africa/Windhoek",
+    "Arabic Standard Time": "Asia/Baghdad",
+    "Turkey Standard Time": "Europe/Istanbul",
+    "Arab Standard Time": "Asia/Riyadh",
+    "Belarus Standard Time": "Europe/Minsk",
+    "Russian Standard Time": "Europe/Moscow",
+    "E. Africa Standard Time": "Africa/Nairobi",
+    "Volgograd Standard Time": "Europe/Volgograd",
+    "Iran Standard Time": "Asia/Tehran",
+    "Arabian Standard Time": "Asia/Dubai",
+    "Astrakhan Standard Time": "Europe/Astrakhan",
+    "Azerbaijan Standard Time": "Asia/Baku",
+    "Russia Time Zone 3": "Europe/Samara",
+    "Mauritius Standard Time": "Indian/Mauritius",
+    "Saratov Standard Time": "Europe/Saratov",
+    "Georgian Standard Time": "Asia/Tbilisi",
+    "Caucasus Standard Time": "Asia/Yerevan",
+    "Afghanistan Standard Time": "Asia/Kabul",
+    "West Asia Standard Time": "Asia/Tashkent",
+    "Ekaterinburg Standard Time": "Asia/Yekaterinburg",
+    "Pakistan Standard Time": "Asia/Karachi",
+    "Qyzylorda Standard Time": "Asia/Qyzylorda",
+    "India Standard Time": "Asia/Kolkata",
+    "Sri Lanka Standard Time": "Asia/Colombo",
+    "Nepal Standard Time": "Asia/Kathmandu",
+    "Central Asia Standard Time": "Asia/Bishkek",
+    "Bangladesh Standard Time": "Asia/Dhaka",
+    "Omsk Standard Time": "Asia/Omsk",
+    "Myanmar Standard Time": "Asia/Yangon",
+    "SE Asia Standard Time": "Asia/Bangkok",
+    "Altai Standard Time": "Asia/Barnaul",
+    "W. Mongolia Standard Time": "Asia/Hovd",
+    "North Asia Standard Time": "Asia/Krasnoyarsk",
+    "N. Central Asia Standard Time": "Asia/Novosibirsk",
+    "Tomsk Standard Time": "Asia/Tomsk",
+    "China Standard Time": "Asia/Shanghai",
+    "North Asia East Standard Time": "Asia/Irkutsk",
+    "Singapore Standard Time": "Asia/Singapore",
+    "W. Australia Standard Time": "Australia/Perth",
+    "Taipei Standard Time": "Asia/Taipei",
+    "Ulaanbaatar Standard Time": "Asia/Ulaanbaatar",
+    "Aus Central W. Standard Time": "Australia/Eucla",
+    "Transbaikal Standard Time": "Asia/Chita",
+    "Tokyo Standard Time": "Asia/Tokyo",
+    "North Korea Standard Time": "Asia/Pyongyang",
+    "Korea Standard Time": "Asia/Seoul",
+    "Yakutsk Standard Time": "Asia/Yakutsk",
+    "Cen. Australia Standard Time": "Australia/Adelaide",
+    "AUS Central Standard Time": "Australia/Darwin",
+    "E. Australia Standard Time": "Australia/Brisbane",
+    "AUS Eastern Standard Time": "Australia/Sydney",
+    "West Pacific Standard Time": "Pacific/Port_Moresby",
+    "Tasmania Standard Time": "Australia/Hobart",
+    "Vladivostok Standard Time": "Asia/Vladivostok",
+    "Lord Howe Standard Time": "Australia/Lord_Howe",
+    "Bougainville Standard Time": "Pacific/Bougainville",
+    "Russia Time Zone 10": "Asia/Srednekolymsk",
+    "Magadan Standard Time": "Asia/Magadan",
+    "Norfolk Standard Time": "Pacific/Norfolk",
+    "Sakhalin Standard Time": "Asia/Sakhalin",
+    "Central Pacific Standard Time": "Pacific/Guadalcanal",
+    "Russia Time Zone 11": "Asia/Kamchatka",
+    "New Zealand Standard Time": "Pacific/Auckland",
+    "UTC+12": "Etc/GMT-12",
+    "Fiji Standard Time": "Pacific/Fiji",
+    "Chatham Islands Standard Time": "Pacific/Chatham",
+    "UTC+13": "Etc/GMT-13",
+    "Tonga Standard Time": "Pacific/Tongatapu",
+    "Samoa Standard Time": "Pacific/Apia",
+    "Line Islands Standard Time": "Pacific/Kiritimati",
+}
+
+# Local timezone by hour since the epoch, see local_timezone()
+_local_timezones = {}
+
+
+def local_timezone(timestamp: float):
+    """
+    Fixed-offset local timezone at a POSIX timestamp. The system timezone
+    is looked up once per hour of timestamps, not once per conversion.
+    """
+    hour = int(timestamp // 3600)
+    tz = _local_timezones.get(hour)
+    if tz is None:
+        start = time.localtime(hour * 3600)
+        end = time.localtime(hour * 3600 + 3599)
+        if start.tm_gmtoff != end.tm_gmtoff:
+            # The offset changes within this hour, so it is not cached
+            local = time.localtime(timestamp)
+            return timezone(timedelta(seconds=local.tm_gmtoff), local.tm_zone)
+        tz = timezone(timedelta(seconds=start.tm_gmtoff), start.tm_zone)
+        _local_timezones[hour] = tz
+    return tz
+
+
+@functools.lru_cache(maxsize=None)
+def api_timezone(name: str | None):
+    """
+    Timezone of a dateTimeTimeZone value, UTC if it is not known. Being
+    cached, the warning about an unknown name is printed once per name.
+    """
+    if name in UTC_NAMES:
+        return timezone.utc
+    from zoneinfo import ZoneInfo
 
+    try:
+        return ZoneInfo(WINDOWS_ZONES.get(name, name))
+    except (ValueError, LookupError):
+        print(f"Unknown time zone {name!r}, assuming UTC", file=sys.stderr)
+        return timezone.utc
+
+
+def parse_api_timestamp(value: str, tz=timezone.utc):
     """
-    Somehow this string is formatted with 7 digits for 'microsecond' resolution, so crop the last digit (and trailing Z)
-    The cropped string will be written into api_dt_str_mod
+    '2024-01-25T10:00:00.1234567Z' -> aware datetime, in `tz` unless the
+    value ends with Z. Graph sends 7 fractional digits, the 7th is dropped.
     """
-    api_dt_str_mod = None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        # fromisoformat only accepts 7 digits and "Z" since Python 3.11
+        dt = parse_fixed_timestamp(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz)
+    return dt
+
+
+def parse_fixed_timestamp(value: str):
+    if value[4:5] + value[7:8] + value[10:11] + value[13:14] + value[16:17] != (
+        "--T::"
+    ):
+        raise ValueError(f"Unrecognized timestamp: {value}")
+
+    fraction = value[19:]
+    tz = None
+    if fraction.endswith("Z"):
+        fraction = fraction[:-1]
+        tz = timezone.utc
+    microsecond = 0
+    if fraction:
+        if fraction[0] != "." or not fraction[1:].isdigit():
+            raise ValueError(f"Unrecognized timestamp: {value}")
+        microsecond = int(fraction[1:7].ljust(6, "0"))
+
+    return datetime(
+        int(value[0:4]),
+        int(value[5:7]),
+        int(value[8:10]),
+        int(value[11:13]),
+        int(value[14:16]),
+        int(value[17:19]),
+        microsecond,
+        tz,
+    )
+
+
+def to_local(dt: datetime):
+    try:
+        tz = local_timezone(dt.timestamp())
+    except (OverflowError, OSError, ValueError):
+        # Outside the range of the platform's localtime()
+        return dt.astimezone(tz=None)
+    return dt.astimezone(tz)
 
+
+def api_timestamp_to_datetime(api_dt: Union[str, dict]):
+    """Converts a timestamp or dateTimeTimeZone returned by the API to local time"""
     if isinstance(api_dt, str):
-        api_dt_str_mod = api_dt[:-2]
+        dt = parse_api_timestamp(api_dt)
     elif isinstance(api_dt, dict):
-        api_dt_str_mod = api_dt["dateTime"][:-2]
+        dt = parse_api_timestamp(
+            api_dt["dateTime"], api_timezone(api_dt.get("timeZone"))
+        )
     else:
-        raise
-
-    dt = datetime.strptime(api_dt_str_mod, "%Y-%m-%dT%H:%M:%S.%f")
-    dt = utc_to_local(dt)
-    return dt
+        raise TypeError(f"Not an API timestamp: {api_dt!r}")
+    return to_local(dt)
+
+
+def api_timestamps_to_datetimes(values):
+    """api_timestamp_to_datetime for a whole column, None stays None"""
+    results = []
+    append = results.append
+    fromisoformat = datetime.fromisoformat
+    utc = timezone.utc
+    local_timezones = _local_timezones
+    for value in values:
+        if value.__class__ is not str:
+            append(None if value is None else api_timestamp_to_datetime(value))
+            continue
+        # Inlined parse_api_timestamp() and to_local() for the common case
+        try:
+            dt = fromisoformat(value)
+        except ValueError:
+            dt = parse_fixed_timestamp(value)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=utc)
+        tz = local_timezones.get(int(dt.timestamp() // 3600))
+        append(to_local(dt) if tz is None else dt.astimezone(tz))
+    return results
+
+
+def api_timestamp_to_epoch(api_dt: Union[str, dict, datetime, None]):
+    """POSIX timestamp of an API timestamp or datetime, NaN if it is None"""
+    if api_dt is None:
+        return math.nan
+    if isinstance(api_dt, datetime):
+        return api_dt.timestamp()
+    if isinstance(api_dt, dict):
+        return parse_api_timestamp(
+            api_dt["dateTime"], api_timezone(api_dt.get("timeZone"))
+        ).timestamp()
+    return parse_api_timestamp(api_dt).timestamp()
 
 
 def utc_to_local(_dt):
-    return _dt.replace(tzinfo=timezone.utc).astimezone(tz=None)
+    return to_local(_dt.replace(tzinfo=timezone.utc))
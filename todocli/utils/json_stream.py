@@ -0,0 +1,98 @@
+import codecs
+import json
+
+# Consumed input is dropped from the buffer once it grows beyond this
+COMPACT_THRESHOLD = 64 * 1024
+
+
+class ValueStream:
+    """
+    Incrementally parses a JSON object read in chunks of bytes and yields
+    the items of its top-level `array_key` array one by one, so a page of
+    the API never has to be held in memory as a whole.
+
+    The other top-level members (e.g. '@odata.nextLink') are collected in
+    `members`, which is complete once iteration has finished.
+    """
+
+    def __init__(self, chunks, array_key="value"):
+        self.chunks = iter(chunks)
+        self.array_key = array_key
+        self.members = {}
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def read_more(self):
+        for chunk in self.chunks:
+            text = self.text_decoder.decode(chunk)
+            if text:
+                if self.pos > COMPACT_THRESHOLD:
+                    self.buffer = self.buffer[self.pos :]
+                    self.pos = 0
+                self.buffer += text
+                return True
+        if not self.exhausted:
+            self.buffer += self.text_decoder.decode(b"", final=True)
+            self.exhausted = True
+        return False
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                raise json.JSONDecodeError(
+                    "Unexpected end of data", self.buffer, self.pos
+                )
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise json.JSONDecodeError(
+                "Expected one of {!r}".format(chars), self.buffer, self.pos
+            )
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.read_more():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self.read_more():
+                continue
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(":")
+            if key == self.array_key and self.peek() == "[":
+                self.pos += 1
+                if self.peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield self.decode_value()
+                        if self.expect(",]") == "]":
+                            break
+            else:
+                self.members[key] = self.decode_value()
+            if self.expect(",}") == "}":
+                return
@@ -0,0 +1,162 @@
+"""
+Persistent state shared by all todocli processes: the api keys, the
+OAuth token and the last update check, in ~/.config/tod0/state.json.
+
+The file is read once and kept in memory until its modification time
+changes, so reading a value is a stat() call. Updates are written to a
+temporary file that is renamed over the old one, so other processes
+never see a partially written file.
+"""
+
+import json
+import os
+import threading
+
+from todocli.utils.atomic_file import write_atomic
+from todocli.utils.file_lock import FileLock
+
+STATE_VERSION = 1
+
+config_dir = "{}/.config/tod0".format(os.path.expanduser("~"))
+state_path = os.path.join(config_dir, "state.json")
+state_lock_path = os.path.join(config_dir, "state.lock")
+
+# Files used before the state store, imported once when it is created
+legacy_keys_path = os.path.join(config_dir, "keys.yml")
+legacy_token_path = os.path.join(config_dir, "token.pkl")
+legacy_data_path = os.path.join(config_dir, "data.yml")
+
+# (st_ino, st_mtime_ns, st_size) of the file the cached state was read from
+_stat = None
+_state = None
+_lock = threading.RLock()
+
+
+class UnsupportedStateVersion(Exception):
+    def __init__(self, version):
+        self.message = (
+            "{} was written by a newer version of tod0 (state version {}), "
+            'please update with "pip install --upgrade tod0"'.format(
+                state_path, version
+            )
+        )
+        super(UnsupportedStateVersion, self).__init__(self.message)
+
+
+def file_stat():
+    try:
+        st = os.stat(state_path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def read():
+    with open(state_path, "r") as f:
+        state = json.load(f)
+    version = state.get("version", STATE_VERSION)
+    if version > STATE_VERSION:
+        raise UnsupportedStateVersion(version)
+    return state
+
+
+def write(state):
+    # Holds the token, keep it private
+    write_atomic(state_path, json.dumps(state, indent=2), mode=0o600)
+
+
+def load():
+    """The whole state, re-read only when the file changed on disk"""
+    global _stat, _state
+
+    with _lock:
+        stat = file_stat()
+        if stat is None:
+            if _state is None or _stat is not None:
+                _state = import_legacy()
+                _stat = file_stat()
+        elif stat != _stat:
+            _state = read()
+            _stat = stat
+        return _state
+
+
+def get(section, default=None):
+    """Value stored under `section`, do not modify it in place"""
+    return load().get(section, default)
+
+
+def update(section, value):
+    """Store `value` under `section`, keeping the other sections as they are"""
+    global _stat, _state
+
+    with _lock:
+        if not os.path.isdir(config_dir):
+            os.makedirs(config_dir)
+        # Another process may have updated a different section meanwhile
+        with FileLock(state_lock_path):
+            state = read() if file_stat() is not None else legacy_state()
+            state["version"] = STATE_VERSION
+            state[section] = value
+            write(state)
+            remove_legacy()
+        _state = state
+        _stat = file_stat()
+
+
+def legacy_state():
+    """State imported from the files used by earlier versions"""
+    state = {"version": STATE_VERSION}
+
+    if os.path.isfile(legacy_keys_path):
+        import yaml
+
+        with open(legacy_keys_path) as f:
+            keys = yaml.load(f, yaml.SafeLoader)
+        if keys:
+            state["keys"] = keys
+
+    if os.path.isfile(legacy_token_path):
+        import pickle
+
+        # Read once so users do not have to authorize again, never written
+        try:
+            with open(legacy_token_path, "rb") as f:
+                state["token"] = pickle.load(f)
+        except Exception:
+            pass
+
+    if os.path.isfile(legacy_data_path):
+        import yaml
+
+        try:
+            with open(legacy_data_path) as f:
+                data = yaml.load(f, yaml.SafeLoader)
+            if data:
+                state["update_check"] = data
+        except Exception:
+            pass
+
+    return state
+
+
+def remove_legacy():
+    # keys.yml was written by the user, so it is left in place
+    for path in (legacy_token_path, legacy_data_path):
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def import_legacy():
+    state = legacy_state()
+    if len(state) == 1:
+        # Nothing to import, the file is created on the first update
+        return state
+
+    with FileLock(state_lock_path):
+        # Another process may have imported them while we read
+        if file_stat() is not None:
+            return read()
+        write(state)
+        remove_legacy()
+    return state
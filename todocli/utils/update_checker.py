@@ -1,54 +1,100 @@
-import os
-import yaml
-import requests
+import re
+import threading
 import todocli
+from todocli.utils import state
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
 
 DATE_FORMAT = "%Y%m%d"
+PYPI_URL = "https://pypi.org/pypi/tod0/json"
+# Seconds to wait for PyPI; the check is skipped if it does not answer in time
+REQUEST_TIMEOUT = 3
+# Seconds notify() waits for a check still running when the command is done
+NOTIFY_TIMEOUT = 0.5
+CHECK_INTERVAL = timedelta(days=1)
+
+_thread = None
+
+
+def parse_version(version):
+    """'1.2.0rc1' -> (1, 2, 0), pre-release suffixes are ignored"""
+    parts = []
+    for part in version.split("."):
+        match = re.match(r"\d+", part)
+        if match is None:
+            break
+        parts.append(int(match.group()))
+        if match.end() < len(part):
+            break
+    return tuple(parts)
+
+
+def read_data():
+    return state.get("update_check") or {}
+
+
+def write_data(data):
+    state.update("update_check", data)
+
+
+def fetch_latest_version():
+    import requests
+
+    response = requests.get(PYPI_URL, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["info"]["version"]
+
+
+def is_due(data):
+    if "last_update_check" not in data:
+        return True
+    last_update_check = datetime.strptime(data["last_update_check"], DATE_FORMAT)
+    return last_update_check + CHECK_INTERVAL < datetime.now()
+
+
+def run_check():
+    try:
+        latest_version = fetch_latest_version()
+        write_data(
+            {
+                "last_update_check": datetime.now().strftime(DATE_FORMAT),
+                "latest_version": latest_version,
+            }
+        )
+    except Exception:
+        # Never let an update check get in the way, try again next time
+        pass
+
+
+def start():
+    """Check for updates in the background if it has been a day since last check"""
+    global _thread
+
+    try:
+        data = read_data()
+    except Exception:
+        data = {}
+
+    if _thread is None and is_due(data):
+        _thread = threading.Thread(target=run_check, name="update-check", daemon=True)
+        _thread.start()
+
+
+def notify():
+    """Print a notice if a newer version is known, call once the command is done"""
+    if _thread is not None:
+        _thread.join(NOTIFY_TIMEOUT)
+
+    try:
+        latest_version = read_data().get("latest_version")
+    except Exception:
+        return
+
+    if latest_version and parse_version(latest_version) > parse_version(
+        todocli.__version__
+    ):
+        print('Update available. You can update with "pip install --upgrade tod0"')
 
 
 def check():
-    # Check last time we checked for updates
-    config_dir = "{}/.config/tod0".format(os.path.expanduser("~"))
-    if not os.path.isdir(config_dir):
-        os.makedirs(config_dir)
-
-    last_update_check = datetime(1990, 1, 1)
-    file_path = os.path.join(config_dir, "data.yml")
-    if os.path.isfile(file_path):
-        with open(file_path, "r") as f:
-            data = yaml.load(f, yaml.SafeLoader)
-            if data and "last_update_check" in data:
-                last_update_check = datetime.strptime(
-                    data["last_update_check"], DATE_FORMAT
-                )
-
-    # Check for updates if it has been a day since last check
-    if last_update_check + timedelta(days=1) < datetime.now():
-        try:
-            page = requests.get("https://pypi.org/simple/tod0/")
-            soup = BeautifulSoup(page.text, features="html.parser")
-            text_lines = soup.get_text().splitlines(keepends=False)
-
-            # Look at the last 5 lines from the webpage
-            for _line in text_lines[::-1][0:5]:
-                if _line == "":
-                    continue
-                else:
-                    latest_version = tuple(map(int, _line[5:10].split(".")))
-                    break
-
-            current_version = tuple(map(int, todocli.__version__.split(".")))
-
-            if latest_version > current_version:
-                print(
-                    'Update available. You can update with "pip install --upgrade tod0"'
-                )
-
-            with open(file_path, "w") as f:
-                yaml.dump(
-                    {"last_update_check": datetime.now().strftime(DATE_FORMAT)}, f
-                )
-        except:
-            print("Error getting update information")
+    start()
+    notify()